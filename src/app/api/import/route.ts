@@ -4,7 +4,7 @@ import { ImportService } from '@/services/importService';
 export async function POST(request: Request) {
     try {
         const body = await request.json();
-        const { examName, examDate, data } = body;
+        const { examName, examDate, data, deleted, fullScores } = body;
 
         if (!examName || !data || !Array.isArray(data)) {
             return NextResponse.json({ error: '无效的数据格式' }, { status: 400 });
@@ -15,7 +15,7 @@ export async function POST(request: Request) {
             ImportService.backupDatabase();
 
             // 2. 执行导入
-            ImportService.importExamData(examName, examDate, data);
+            ImportService.importExamData(examName, examDate, data, Array.isArray(deleted) ? deleted : [], fullScores || null);
 
             return NextResponse.json({ success: true, message: `成功导入考试: ${examName}` });
         } catch (err: any) {
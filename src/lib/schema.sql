@@ -56,6 +56,19 @@ CREATE TABLE IF NOT EXISTS subject_scores (
     UNIQUE(result_id, subject)
 );
 
+-- 考试统计表（由 tools/db_loader.py / tools/exam_stats.py 预计算）
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id INTEGER NOT NULL,
+    subject TEXT NOT NULL, -- 科目，'总分' 为考试总分
+    class TEXT NOT NULL DEFAULT '', -- 考试时所在班级，'' 为年级整体
+    avg_score REAL,
+    std_score REAL, -- 总体标准差
+    max_grade_rank INTEGER, -- 最大年级名次（年级实考人数）
+    participants INTEGER, -- 有成绩的人数
+    FOREIGN KEY (exam_id) REFERENCES exams(id),
+    UNIQUE(exam_id, subject, class)
+);
+
 -- AI 诊断缓存表
 CREATE TABLE IF NOT EXISTS ai_diagnoses (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -19,7 +19,14 @@ export const ImportService = {
   },
 
   // 执行导入事务
-  importExamData: (examName: string, examDate: string | null, data: any[]) => {
+  // deleted / fullScores 来自增量导入包：data 只含新增或变化的学生
+  importExamData: (
+    examName: string,
+    examDate: string | null,
+    data: any[],
+    deleted: string[] = [],
+    fullScores: Record<string, number> | null = null
+  ) => {
     const db = getDb();
 
     const transaction = db.transaction(() => {
@@ -45,6 +52,25 @@ export const ImportService = {
         }
       }
 
+      // 增量包只含部分学生，满分以包内按全部学生判定的结果为准
+      const fullScoreOf = (subject: string) =>
+        fullScores?.[subject] ?? ((subjectMaxMap[subject] || 0) > 100 ? 150 : 100);
+
+      // 2.1 删除增量包中已移除学生的本次成绩（学生信息保留）
+      for (const studentId of deleted) {
+        const removed = db.prepare('SELECT id FROM exam_results WHERE student_id = ? AND exam_id = ?').get(String(studentId), examId) as any;
+        if (removed) {
+          db.prepare('DELETE FROM subject_scores WHERE result_id = ?').run(removed.id);
+          db.prepare('DELETE FROM exam_results WHERE id = ?').run(removed.id);
+        }
+      }
+
+      // 2.2 本次考试的预计算统计 (exam_stats) 已过期，删除后由查询回退实时聚合
+      const hasStats = db.prepare(`SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'exam_stats'`).get();
+      if (hasStats) {
+        db.prepare('DELETE FROM exam_stats WHERE exam_id = ?').run(examId);
+      }
+
       // 3. 遍历数据进行导入
       for (const item of data) {
         const { student_info, exam_result, subjects } = item;
@@ -77,7 +103,7 @@ export const ImportService = {
         let totalFullScore = 0;
         const processedSubjects = (subjects || []).map((sub: any) => {
           const hasScore = sub.score !== null && sub.score !== undefined && sub.score !== '';
-          const fullScore = (subjectMaxMap[sub.subject] || 0) > 100 ? 150 : 100;
+          const fullScore = fullScoreOf(sub.subject);
           if (hasScore) {
             totalFullScore += fullScore;
           }
@@ -1,5 +1,20 @@
 import { getDb } from '@/lib/db';
 
+// 读取预计算的考试统计 (exam_stats，由 tools/db_loader.py 写入)
+// 表不存在或该考试尚无统计时返回 null，调用方回退到实时聚合
+const loadExamStats = (db: any, examId: number): any[] | null => {
+    try {
+        const rows = db.prepare(`
+            SELECT subject, class, avg_score, max_grade_rank
+            FROM exam_stats
+            WHERE exam_id = ?
+        `).all(examId) as any[];
+        return rows.length > 0 ? rows : null;
+    } catch {
+        return null;
+    }
+};
+
 export const ScoreService = {
     // 获取学生单次考试详情（包含科目成绩、班级平均分补全）
     getStudentExamResult: (studentId: string, examId?: string) => {
@@ -41,8 +56,12 @@ export const ScoreService = {
         // 3. 实时计算班级平均分（分阶段逻辑：ID >= 5 的考试统一以 15 班为基准，历史数据维持原样）
         const examIdNum = Number(latestExam.exam_id);
         const useFixedClass = examIdNum >= 5;
+        const stats = loadExamStats(db, examIdNum);
+        const statsClass = useFixedClass ? '15班' : latestExam.class_at_exam;
 
-        const classAvgData = db.prepare(`
+        const classAvgData = stats
+            ? stats.filter(s => s.class === statsClass).map(s => ({ subject: s.subject, avg_score: s.avg_score }))
+            : db.prepare(`
             SELECT ss.subject, AVG(ss.score) as avg_score
             FROM subject_scores ss
             JOIN exam_results er ON ss.result_id = er.id
@@ -52,8 +71,10 @@ export const ScoreService = {
             GROUP BY ss.subject
         `).all(...(useFixedClass ? [examIdNum] : [examIdNum, studentId, examIdNum])) as any[];
 
-        // 4. 实时计算年级平均分 (难度系数)
-        const gradeAvgData = db.prepare(`
+        // 4. 年级平均分 (难度系数)，无预计算统计时实时计算
+        const gradeAvgData = stats
+            ? stats.filter(s => s.class === '').map(s => ({ subject: s.subject, avg_grade: s.avg_score }))
+            : db.prepare(`
             SELECT ss.subject, AVG(ss.score) as avg_grade
             FROM subject_scores ss
             JOIN exam_results er ON ss.result_id = er.id
@@ -61,8 +82,10 @@ export const ScoreService = {
             GROUP BY ss.subject
         `).all(Number(latestExam.exam_id)) as any[];
 
-        // 5. 实时计算本次考试各科的年级总人数 (MAX rank) 作为分母
-        const gradeTotals = db.prepare(`
+        // 5. 本次考试各科的年级总人数 (MAX rank) 作为分母，无预计算统计时实时计算
+        const gradeTotals = stats
+            ? stats.filter(s => s.class === '').map(s => ({ subject: s.subject, max_rank: s.max_grade_rank }))
+            : db.prepare(`
             SELECT ss.subject, MAX(ss.grade_rank) as max_rank
             FROM subject_scores ss
             JOIN exam_results er ON ss.result_id = er.id
@@ -112,7 +135,10 @@ export const ScoreService = {
             `).all(exam.result_id) as any[];
 
             // 为趋势数据获取各科实考总人数
-            const gradeTotals = db.prepare(`
+            const stats = loadExamStats(db, Number(exam.exam_id));
+            const gradeTotals = stats
+                ? stats.filter(s => s.class === '').map(s => ({ subject: s.subject, max_rank: s.max_grade_rank }))
+                : db.prepare(`
                 SELECT ss.subject, MAX(ss.grade_rank) as max_rank
                 FROM subject_scores ss
                 JOIN exam_results er ON ss.result_id = er.id
@@ -121,7 +147,9 @@ export const ScoreService = {
             `).all(Number(exam.exam_id)) as any[];
 
             // 为趋势数据也补全平均分 (用于波动率计算)
-            const gAvgs = db.prepare(`
+            const gAvgs = stats
+                ? stats.filter(s => s.class === '').map(s => ({ subject: s.subject, avg_grade: s.avg_score }))
+                : db.prepare(`
                 SELECT ss.subject, AVG(ss.score) as avg_grade
                 FROM subject_scores ss
                 JOIN exam_results er ON ss.result_id = er.id
@@ -345,7 +373,10 @@ export const ScoreService = {
         });
 
         // 3. 获取全年级各科平均分作为难度系数
-        const gradeAvgData = db.prepare(`
+        const stats = loadExamStats(db, Number(examId));
+        const gradeAvgData = stats
+            ? stats.filter(s => s.class === '').map(s => ({ subject: s.subject, avg_grade: s.avg_score }))
+            : db.prepare(`
             SELECT ss.subject, AVG(ss.score) as avg_grade
             FROM subject_scores ss
             JOIN exam_results er ON ss.result_id = er.id
@@ -0,0 +1,391 @@
+"""
+爬虫离线基准测试
+
+在本机启动一个模拟学校成绩服务器 (/xs/cjcx/index.asp)：
+- GB18030 编码的登录表单 (adminname / adminpwd)
+- 登录后页面包含考试名称与“返回首页”，以及 50+ 列的 table.a2 成绩表
+- 可配置响应延迟、抖动、5xx 错误注入与错误密码比例
+分别测量 scrape_for_user 逐个抓取与 scrape_scores_with_exam_name 完整流程的
+每秒学生数、分阶段耗时 (GET / POST / 解析 / 数值转换) 与峰值内存，不访问真实服务器。
+
+用法 (在 tools 目录下运行):
+    python bench_scraper.py --students 200 --latency 0.05 --error-rate 0.02
+    python bench_scraper.py --module scrape_scores_json --scenario loop --json 基准结果.json
+"""
+import argparse
+import contextlib
+import http.server
+import importlib
+import io
+import json
+import os
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+import requests
+
+from login_cache import LoginFormCache
+
+EXAM_TITLE = "2025-2026学年下学期4月考试"
+SCHOOL_NAME = "无锡市辅仁高级中学"
+VALID_PASSWORD = "pw"
+
+# 与真实站点一致的 61 列表头（部分表头带制表符）
+SCORE_COLUMNS = [
+    "姓名", "报到号\t", "选考科目", "考号", "考籍号\t", "班级", "班序\t", "性别", "学籍", "缺考门次",
+    "总分\t", "总分年名\t\t", "总分班名", "文理名次", "选科名次\t", "考生号",
+    "语文", "语文年名", "语文班名", "语文文理名次", "数学", "数学年名", "数学班名", "数学文理名次",
+    "英语", "英语年名", "英语班名", "英语文理名次", "物理", "物理年名", "物理班名",
+    "化学", "化学年名", "化学班名", "生物", "生物年名", "生物班名", "政治", "政治年名", "政治班名",
+    "历史", "历史年名", "历史班名", "地理", "地理年名", "地理班名",
+    "化学赋分", "生物赋分", "地理赋分", "政治赋分", "备注",
+    "理综卷1", "理综卷2", "理综卷3", "文综卷1", "文综卷2", "文综卷3",
+    "其他总分", "其他总分年名", "其他总分班名", "其它总分文理名次",
+]
+_BLANK_COLUMNS = ("选考科目", "考籍号", "缺考门次", "文理名次", "考生号", "备注", "理综", "文综")
+
+LOGIN_PAGE = """<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+<title>成绩查询</title></head><body>
+<form name="form1" action="index.asp" method="post">
+<input type="hidden" name="action" value="login">
+姓名：<input type="text" name="adminname">
+密码：<input type="password" name="adminpwd">
+<input type="submit" value="登录">
+</form></body></html>"""
+
+
+def _score_values(name: str) -> List[str]:
+    """按姓名生成确定的成绩行"""
+    rnd = random.Random(name)
+    values = []
+    for col in SCORE_COLUMNS:
+        if col == "姓名":
+            values.append(name)
+        elif col == "班级":
+            values.append("19班")
+        elif col.strip().startswith(_BLANK_COLUMNS):
+            values.append("")
+        elif "名" in col or col.strip() in ("报到号", "考号", "班序"):
+            values.append(str(rnd.randint(1, 900)))
+        else:
+            score = rnd.randint(30, 149)
+            values.append(f"{score}.5" if rnd.random() < 0.2 else str(score))
+    return values
+
+
+def score_page(name: str) -> str:
+    head = "".join(f"<td>{c}</td>" for c in SCORE_COLUMNS)
+    data = "".join(f"<td>{v}</td>" for v in _score_values(name))
+    return (
+        "<html><head><meta http-equiv=\"Content-Type\" content=\"text/html; charset=gb2312\"></head><body>"
+        f"<table width=\"100%\"><tr><td>{SCHOOL_NAME} 【{EXAM_TITLE}】 <a href=\"index.asp\">返回首页</a></td></tr>"
+        f"<tr><td><table class=\"a2\" border=\"1\"><tr>{head}</tr><tr>{data}</tr></table></td></tr>"
+        "</table></body></html>"
+    )
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """模拟成绩服务器的请求处理。配置与计数保存在 server 对象上。"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _delay(self) -> None:
+        cfg = self.server
+        delay = cfg.latency + (random.uniform(0, cfg.jitter) if cfg.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _send(self, body: str, status: int = 200) -> None:
+        data = body.encode("gb18030")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _count(self, method: str) -> None:
+        with self.server.lock:
+            self.server.counts[method] += 1
+
+    def _maybe_fail(self) -> bool:
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            with self.server.lock:
+                self.server.counts["errors"] += 1
+            self._send("Service Unavailable", 503)
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        self._count("GET")
+        self._delay()
+        if self._maybe_fail():
+            return
+        self._send(LOGIN_PAGE)
+
+    def do_POST(self) -> None:
+        self._count("POST")
+        length = int(self.headers.get("Content-Length", 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode("ascii"), encoding="gb18030")
+        self._delay()
+        if self._maybe_fail():
+            return
+        name = form.get("adminname", [""])[0]
+        if form.get("adminpwd", [""])[0] != VALID_PASSWORD:
+            # 密码错误时返回登录页
+            self._send(LOGIN_PAGE)
+            return
+        self._send(score_page(name))
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """在后台线程运行的模拟成绩服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, *, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.counts = {"GET": 0, "POST": 0, "errors": 0}
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def login_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/xs/cjcx/index.asp"
+
+    def __enter__(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class StageTimer:
+    """按阶段累计耗时，可在多个抓取线程间共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage: Callable[..., str], func: Callable) -> Callable:
+        """包装函数，按 stage(*args) 返回的阶段名记录每次调用耗时"""
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage(*args), time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[stage] = {
+                "count": len(ordered),
+                "total_s": round(sum(ordered), 4),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+            }
+        return result
+
+
+@contextlib.contextmanager
+def instrument(module: Any, timer: StageTimer) -> Iterator[None]:
+    """临时替换网络请求与解析函数，按 GET / POST / 解析 / 数值转换 分阶段计时"""
+    patches = [
+        # 只统计真正的网络往返，不含限速器等待与主机预算排队
+        (requests.Session, "request", lambda self, method, *a, **k: str(method).upper()),
+        (module, "is_login_success", lambda *a: "parse"),
+        (module, "extract_exam_name_from_page", lambda *a: "parse"),
+        (module, "extract_score_table", lambda *a: "parse"),
+        (module, "coerce_numeric_like", lambda *a: "coerce"),
+    ]
+    originals = []
+    for owner, attr, stage in patches:
+        original = getattr(owner, attr)
+        originals.append((owner, attr, original))
+        setattr(owner, attr, timer.wrap(stage, original))
+    try:
+        yield
+    finally:
+        for owner, attr, original in reversed(originals):
+            setattr(owner, attr, original)
+
+
+@contextlib.contextmanager
+def measure_memory(enabled: bool) -> Iterator[Dict[str, Optional[float]]]:
+    """统计 Python 堆峰值 (tracemalloc) 与进程峰值 RSS"""
+    stats: Dict[str, Optional[float]] = {"peak_heap_mb": None, "peak_rss_mb": None}
+    if enabled:
+        tracemalloc.start()
+    try:
+        yield stats
+    finally:
+        if enabled:
+            stats["peak_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux 单位为 KB，macOS 为字节
+            stats["peak_rss_mb"] = round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 2)
+        except ImportError:
+            pass
+
+
+def student_names(count: int) -> List[str]:
+    return [f"测试学生{i:04d}" for i in range(count)]
+
+
+def student_password(idx: int, bad_every: int) -> str:
+    return "wrong" if bad_every and idx % bad_every == bad_every - 1 else VALID_PASSWORD
+
+
+def bench_scrape_for_user(module: Any, server: StandInServer, names: List[str], bad_every: int,
+                          trace_memory: bool) -> Dict[str, Any]:
+    """单线程逐个调用 scrape_for_user，最后对全部成绩表统一做一次数值转换"""
+    module._login_form_cache = LoginFormCache(module.LOGIN_FORM_REVALIDATE_EVERY)
+    timer = StageTimer()
+    frames = []
+    session = requests.Session()
+    with measure_memory(trace_memory) as memory, instrument(module, timer):
+        start = time.perf_counter()
+        for idx, name in enumerate(names):
+            try:
+                df, _ = module.scrape_for_user(session, name, student_password(idx, bad_every))
+            except requests.RequestException:
+                continue
+            if df is not None:
+                frames.append(df)
+        if frames:
+            module.coerce_numeric_like(pd.concat(frames, ignore_index=True), exclude_cols=module.NON_NUMERIC_COLS)
+        elapsed = time.perf_counter() - start
+    session.close()
+    return _report("scrape_for_user", len(names), len(frames), elapsed, timer, memory)
+
+
+def bench_full_loop(module: Any, server: StandInServer, names: List[str], bad_every: int,
+                    trace_memory: bool, verbose: bool) -> Dict[str, Any]:
+    """在临时目录中运行完整的 scrape_scores_with_exam_name 流程"""
+    module._login_form_cache = LoginFormCache(module.LOGIN_FORM_REVALIDATE_EVERY)
+    timer = StageTimer()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_scraper_") as workdir:
+        os.chdir(workdir)
+        try:
+            passwords = [student_password(i, bad_every) for i in range(len(names))]
+            if hasattr(module, "INPUT_JSON"):
+                with open(module.INPUT_JSON, "w", encoding="utf-8") as f:
+                    json.dump([{"姓名": n, "密码": p} for n, p in zip(names, passwords)], f, ensure_ascii=False)
+            else:
+                pd.DataFrame({"姓名": names, "密码": passwords}).to_excel(
+                    module.INPUT_EXCEL, sheet_name=module.SHEET_USERS, index=False)
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with measure_memory(trace_memory) as memory, instrument(module, timer), output:
+                start = time.perf_counter()
+                success, _ = module.scrape_scores_with_exam_name(archive=False)
+                elapsed = time.perf_counter() - start
+            ok = len(pd.read_excel(module.OUTPUT_EXCEL, sheet_name="汇总")) if success else 0
+        finally:
+            os.chdir(cwd)
+    return _report("scrape_scores_with_exam_name", len(names), ok, elapsed, timer, memory)
+
+
+def _report(scenario: str, students: int, ok: int, elapsed: float, timer: StageTimer,
+            memory: Dict[str, Optional[float]]) -> Dict[str, Any]:
+    return {
+        "scenario": scenario,
+        "students": students,
+        "succeeded": ok,
+        "elapsed_s": round(elapsed, 3),
+        "students_per_s": round(students / elapsed, 2) if elapsed > 0 else None,
+        "stages": timer.summary(),
+        **memory,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n=== {report['scenario']} ===")
+    print(f"学生数: {report['students']}  成功: {report['succeeded']}  "
+          f"耗时: {report['elapsed_s']:.2f}s  吞吐: {report['students_per_s']} 人/秒")
+    print(f"{'阶段':<8}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}")
+    for stage in ("GET", "POST", "parse", "coerce"):
+        s = report["stages"].get(stage)
+        if s:
+            print(f"{stage:<8}{s['count']:>8}{s['total_s']:>12.3f}{s['mean_ms']:>12.2f}{s['p50_ms']:>12.2f}{s['p95_ms']:>12.2f}")
+    if report["peak_heap_mb"] is not None:
+        print(f"Python 堆峰值: {report['peak_heap_mb']} MB")
+    if report["peak_rss_mb"] is not None:
+        print(f"进程峰值 RSS: {report['peak_rss_mb']} MB")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="爬虫离线基准测试（本机模拟成绩服务器）")
+    parser.add_argument("--module", default="scrape_scores", choices=["scrape_scores", "scrape_scores_json"],
+                        help="被测脚本")
+    parser.add_argument("--scenario", default="all", choices=["all", "user", "loop"],
+                        help="user: 逐个调用 scrape_for_user；loop: 完整抓取流程")
+    parser.add_argument("--students", type=int, default=100, help="模拟学生人数")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个响应的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="每个响应额外的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--bad-every", type=int, default=0, help="每 N 名学生中有 1 名密码错误，0 表示全部正确")
+    parser.add_argument("--concurrency", type=int, default=None, help="覆盖 SCRAPE_CONCURRENCY")
+    parser.add_argument("--no-rate-limit", action="store_true", help="放开自适应限速，只测抓取本身的吞吐")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="用 tracemalloc 统计 Python 堆峰值（会拖慢计时）")
+    parser.add_argument("--verbose", action="store_true", help="显示完整流程的抓取日志")
+    parser.add_argument("--json", metavar="PATH", help="把结果另存为 JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    module = importlib.import_module(args.module)
+    if args.concurrency is not None:
+        module.SCRAPE_CONCURRENCY = args.concurrency
+    if args.no_rate_limit:
+        module.RATE_INITIAL = module.RATE_MAX = 1000.0
+    names = student_names(args.students)
+
+    reports = []
+    with StandInServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as server:
+        module.LOGIN_URL = server.login_url
+        print(f"模拟服务器: {server.login_url}  延迟 {args.latency}s  抖动 {args.jitter}s  错误率 {args.error_rate}")
+        if args.scenario in ("all", "user"):
+            reports.append(bench_scrape_for_user(module, server, names, args.bad_every, args.trace_memory))
+            print_report(reports[-1])
+        if args.scenario in ("all", "loop"):
+            reports.append(bench_full_loop(module, server, names, args.bad_every, args.trace_memory, args.verbose))
+            print_report(reports[-1])
+        print(f"\n服务器请求计数: {server.counts}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "reports": reports}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
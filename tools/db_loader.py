@@ -0,0 +1,267 @@
+"""
+成绩数据库批量导入工具
+
+把考试 Excel（历次成绩/*.xlsx）或结构化导入 JSON（*_import.json）直接写入
+src/lib/schema.sql 定义的 students / exams / exam_results / subject_scores 四张表，
+不再经由网页端 /api/import 逐行“先查再改”：
+
+- 每张表一次 executemany，整个导入在同一个事务中完成
+- 导入期间使用 WAL 日志与 synchronous=OFF，结束后恢复原日志模式
+- 按已有的 UNIQUE 键 upsert，重复导入同一考试结果不变
+- 满分与总满分的判定规则与 ImportService 一致
+- 导入后刷新该次考试的预计算统计 (exam_stats，见 exam_stats.py)
+
+用法:
+    python db_loader.py 历次成绩/某次考试.xlsx [更多文件...]
+    python db_loader.py --all            # 回填 历次成绩 目录下全部考试
+    python db_loader.py --db 路径 ...     # 默认使用环境变量 DB_PATH 或 ../data/scores.db
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from exam_cache import read_exam_sheet
+from exam_stats import refresh_exam_stats
+from import_json import full_scores, structured_records
+
+DB_PATH = os.environ.get("DB_PATH") or os.path.join("..", "data", "scores.db")
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "lib", "schema.sql")
+EXAMS_DIR = os.path.join("..", "历次成绩")
+
+# 线上库已有、schema.sql 中尚未声明的列
+EXTRA_COLUMNS = {
+    "exam_results": [("total_full_score", "REAL")],
+    "subject_scores": [("grade_avg", "REAL"), ("class_avg", "REAL"), ("full_score", "REAL")],
+}
+
+STUDENT_UPSERT = """
+    INSERT INTO students (id, name, class, report_id, gender, class_order, student_status)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name, class = excluded.class, report_id = excluded.report_id,
+        gender = excluded.gender, class_order = excluded.class_order, student_status = excluded.student_status
+"""
+
+RESULT_UPSERT = """
+    INSERT INTO exam_results (
+        student_id, exam_id, total_score, total_full_score,
+        grade_rank, class_rank, elective_rank,
+        other_total_score, other_total_grade_rank, other_total_class_rank,
+        missing_count, remarks, class_at_exam
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(exam_id, student_id) DO UPDATE SET
+        total_score = excluded.total_score, total_full_score = excluded.total_full_score,
+        grade_rank = excluded.grade_rank, class_rank = excluded.class_rank, elective_rank = excluded.elective_rank,
+        other_total_score = excluded.other_total_score, other_total_grade_rank = excluded.other_total_grade_rank,
+        other_total_class_rank = excluded.other_total_class_rank, missing_count = excluded.missing_count,
+        remarks = excluded.remarks, class_at_exam = excluded.class_at_exam
+"""
+
+SUBJECT_UPSERT = """
+    INSERT INTO subject_scores (
+        result_id, subject, score, full_score,
+        grade_rank, class_rank,
+        scaled_score, arts_science_rank
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(result_id, subject) DO UPDATE SET
+        score = excluded.score, full_score = excluded.full_score,
+        grade_rank = excluded.grade_rank, class_rank = excluded.class_rank,
+        scaled_score = excluded.scaled_score, arts_science_rank = excluded.arts_science_rank
+"""
+
+# 增量包中已删除的学生：移除其本次考试成绩（学生信息保留）
+SUBJECT_DELETE = """
+    DELETE FROM subject_scores
+    WHERE result_id IN (SELECT id FROM exam_results WHERE exam_id = ? AND student_id = ?)
+"""
+RESULT_DELETE = "DELETE FROM exam_results WHERE exam_id = ? AND student_id = ?"
+
+# 重新导入时删除本次数据中已不存在的科目（ImportService 先删后插的效果）
+SUBJECT_PRUNE = """
+    DELETE FROM subject_scores
+    WHERE result_id = ? AND subject NOT IN (SELECT value FROM json_each(?))
+"""
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """打开数据库，缺少的表按 schema.sql 创建，缺少的列补齐"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"students", "exams", "exam_results", "subject_scores"} <= tables:
+        with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+    for table, columns in EXTRA_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    return conn
+
+
+def read_exam_file(path: str) -> Tuple[str, Optional[str], List[Dict[str, Any]], Dict[str, Any]]:
+    """读取考试 Excel 或结构化导入 JSON，返回 (考试名称, 考试日期, 记录列表, 增量信息)
+
+    增量信息来自增量导入包的 deleted / fullScores 字段，完整数据时为空。"""
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        records = doc.get("data") or []
+        if records and "student_info" not in records[0]:
+            raise ValueError(f"{os.path.basename(path)} 不是结构化导入 JSON（缺少 student_info），请改用对应的考试 Excel")
+        delta = {key: doc[key] for key in ("deleted", "fullScores") if key in doc}
+        return doc["examName"], doc.get("examDate"), records, delta
+    df = read_exam_sheet(path)
+    exam_name = os.path.splitext(os.path.basename(path))[0]
+    return exam_name, None, list(structured_records(df)), {}
+
+
+def _has_score(score: Any) -> bool:
+    return score is not None and score != ""
+
+
+def load_exam_records(conn: sqlite3.Connection, exam_name: str, exam_date: Optional[str],
+                      records: Iterable[Dict[str, Any]], *, deleted: Iterable[str] = (),
+                      subject_full_scores: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """在当前连接的一个事务内导入一次考试，返回各表写入行数
+
+    deleted 为需要删除本次考试成绩的考号；增量包只含部分学生，满分须由 subject_full_scores 给出。"""
+    records = [item for item in records if (item.get("student_info") or {}).get("id")]
+    subject_full = full_scores(records)
+    subject_full.update(subject_full_scores or {})
+
+    conn.execute("INSERT INTO exams (name, date) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+                 (exam_name, exam_date or None))
+    exam_id = conn.execute("SELECT id FROM exams WHERE name = ?", (exam_name,)).fetchone()[0]
+
+    removed = [(exam_id, str(student_id)) for student_id in deleted]
+    conn.executemany(SUBJECT_DELETE, removed)
+    conn.executemany(RESULT_DELETE, removed)
+
+    students, results, subject_rows = [], [], []
+    for item in records:
+        info, result = item["student_info"], item.get("exam_result") or {}
+        student_id = str(info["id"])
+        subjects = item.get("subjects") or []
+        total_full_score = sum(subject_full.get(sub["subject"], 100) for sub in subjects if _has_score(sub.get("score")))
+        students.append((student_id, info.get("name"), info.get("class"), info.get("report_id"),
+                         info.get("gender"), info.get("class_order"), info.get("student_status")))
+        results.append((student_id, exam_id, result.get("total_score"), total_full_score,
+                        result.get("grade_rank"), result.get("class_rank"), result.get("elective_rank"),
+                        result.get("other_total_score"), result.get("other_total_grade_rank"),
+                        result.get("other_total_class_rank"), result.get("missing_count"),
+                        result.get("remarks"), info.get("class")))
+        subject_rows.append((student_id, subjects))
+
+    conn.executemany(STUDENT_UPSERT, students)
+    conn.executemany(RESULT_UPSERT, results)
+    result_ids = dict(conn.execute("SELECT student_id, id FROM exam_results WHERE exam_id = ?", (exam_id,)))
+
+    scores, prune = [], []
+    for student_id, subjects in subject_rows:
+        result_id = result_ids[student_id]
+        for sub in subjects:
+            scores.append((result_id, sub["subject"], sub.get("score"), subject_full.get(sub["subject"], 100),
+                           sub.get("grade_rank"), sub.get("class_rank"),
+                           sub.get("scaled_score"), sub.get("arts_science_rank")))
+        prune.append((result_id, json.dumps([sub["subject"] for sub in subjects], ensure_ascii=False)))
+    conn.executemany(SUBJECT_PRUNE, prune)
+    conn.executemany(SUBJECT_UPSERT, scores)
+    # 按导入后的全部成绩刷新本次考试的统计（增量导入时同样完整）
+    stats = refresh_exam_stats(conn, exam_id)
+    return {"students": len(students), "exam_results": len(results), "subject_scores": len(scores),
+            "deleted": len(removed), "exam_stats": stats}
+
+
+def absent_students(conn: sqlite3.Connection, exam_name: str, records: Iterable[Dict[str, Any]]) -> List[str]:
+    """数据库中本次考试已有、records 中没有的学生考号"""
+    present = {str((item.get("student_info") or {}).get("id")) for item in records}
+    existing = conn.execute("SELECT r.student_id FROM exam_results r JOIN exams e ON e.id = r.exam_id "
+                            "WHERE e.name = ?", (exam_name,))
+    return [student_id for (student_id,) in existing if student_id not in present]
+
+
+@contextmanager
+def bulk_transaction(db_path: str = DB_PATH) -> Iterator[sqlite3.Connection]:
+    """打开数据库并开启写事务：期间使用 WAL 与 synchronous=OFF，正常结束时提交，出错时整体回滚"""
+    conn = connect(db_path)
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("PRAGMA synchronous = FULL")
+        try:
+            # 恢复原日志模式（其他进程占用数据库时保持 WAL）
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        except sqlite3.OperationalError:
+            pass
+        conn.close()
+
+
+def load_files(paths: List[str], db_path: str = DB_PATH, *, replace: bool = False) -> int:
+    """把多个考试文件导入数据库（同一事务），返回写入的总行数；失败时整体回滚
+
+    replace=True 时完整数据（非增量包）中没有的学生从数据库中该次考试删除。"""
+    if not paths:
+        print("没有需要导入的考试文件。")
+        return 0
+    total = 0
+    started = time.perf_counter()
+    with bulk_transaction(db_path) as conn:
+        for path in paths:
+            t0 = time.perf_counter()
+            exam_name, exam_date, records, delta = read_exam_file(path)
+            deleted = delta.get("deleted", [])
+            if replace and not delta:
+                deleted = absent_students(conn, exam_name, records)
+            if deleted:
+                print(f"  ⚠ 将从数据库删除 {exam_name} 中 {len(deleted)} 名学生: {'、'.join(map(str, deleted))}")
+            counts = load_exam_records(conn, exam_name, exam_date, records, deleted=deleted,
+                                       subject_full_scores=delta.get("fullScores"))
+            rows = sum(counts.values())
+            total += rows
+            removed = f"，删除 {counts['deleted']} 人" if counts["deleted"] else ""
+            print(f"  ✓ {exam_name}: 学生 {counts['exam_results']} 人，科目成绩 {counts['subject_scores']} 行{removed}"
+                  f"（{time.perf_counter() - t0:.2f}s）")
+    elapsed = time.perf_counter() - started
+    print(f"✅ 已导入 {len(paths)} 次考试，共 {total} 行，用时 {elapsed:.2f}s（{total / max(elapsed, 1e-9):.0f} 行/秒）")
+    return total
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="将考试 Excel 或导入 JSON 直接批量写入成绩数据库")
+    parser.add_argument("files", nargs="*", help="考试 Excel (.xlsx) 或结构化导入 JSON (_import.json)")
+    parser.add_argument("--all", action="store_true", help=f"导入 {EXAMS_DIR} 目录下全部考试 Excel")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径（默认取环境变量 DB_PATH 或 %(default)s）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    paths = list(args.files)
+    if args.all:
+        paths += sorted(p for p in glob.glob(os.path.join(EXAMS_DIR, "*.xlsx")) if not os.path.basename(p).startswith("~$"))
+    try:
+        load_files(paths, args.db)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"❌ 导入失败（已回滚）: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
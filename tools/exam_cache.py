@@ -0,0 +1,171 @@
+"""
+考试文件解析缓存
+
+解析 历次成绩/*.xlsx 的“汇总”表（pd.read_excel）是菜单 [3]/[4] 与批量工具中最慢的一步。
+首次读取后把解析结果（列名已去除首尾空白）存为同目录 .exam_cache/ 下的列式旁路文件，
+之后文件未变时直接读回：
+
+- 失效判断：文件大小与修改时间一致即命中；不一致时再比对内容哈希（复制、重新保存但内容未变仍命中）
+- 安装 pyarrow 时存为 Feather，否则存为 pickle；写入后读回校验，与原解析结果不一致的表改用 pickle
+- 旁路文件先写临时文件再替换；缓存读写出错时回退为直接解析 Excel，不影响调用方
+- 进程内另保留最近读取的几张表（按大小与修改时间失效），常驻进程中重复读取同一考试文件时不再读盘；
+  每次返回副本，调用方可随意修改
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIRNAME = ".exam_cache"
+# 设置环境变量 EXAM_CACHE=0 可关闭缓存
+ENABLED = os.environ.get("EXAM_CACHE", "1") != "0"
+# 进程内缓存的表数
+MEMORY_CACHE_SIZE = 8
+
+# (绝对路径, 表名) -> ((大小, 修改时间), 解析结果)
+_memory: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], pd.DataFrame]]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sidecar_base(path: str, sheet_name: str) -> str:
+    folder, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, CACHE_DIRNAME, f"{filename}.{sheet_name}")
+
+
+def _arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _read_sidecar(base: str, fmt: str) -> pd.DataFrame:
+    if fmt == "feather":
+        df = pd.read_feather(f"{base}.feather")
+        # Arrow 把文本列中的空值读回为 None，还原为 read_excel 的 NaN
+        for col in df.columns[df.dtypes == object]:
+            values = df[col]
+            df[col] = values.where(values.notna(), np.nan)
+        return df
+    return pd.read_pickle(f"{base}.pkl")
+
+
+def _write_atomic(path: str, write: Callable[[str], Any]) -> None:
+    """先写临时文件再替换，写出中途中断不会留下不完整的旁路文件"""
+    tmp = f"{path}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_sidecar(base: str, df: pd.DataFrame) -> str:
+    """写出旁路文件，返回实际使用的格式"""
+    fmt = "pickle"
+    if _arrow_available():
+        try:
+            _write_atomic(f"{base}.feather", df.to_feather)
+            if _read_sidecar(base, "feather").equals(df):
+                fmt = "feather"
+        except Exception:
+            # 混合类型的文本列等 Arrow 无法原样保存的表
+            pass
+    if fmt == "pickle":
+        _write_atomic(f"{base}.pkl", df.to_pickle)
+    stale = f"{base}.pkl" if fmt == "feather" else f"{base}.feather"
+    if os.path.exists(stale):
+        os.remove(stale)
+    return fmt
+
+
+def _load_meta(base: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(f"{base}.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(base: str, meta: Dict[str, Any]) -> None:
+    tmp = f"{base}.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, f"{base}.json")
+
+
+def _parse(path: str, sheet_name: str) -> pd.DataFrame:
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df
+
+
+def read_exam_sheet(path: str, sheet_name: str = "汇总") -> pd.DataFrame:
+    """读取考试文件的一张表（列名已去除首尾空白），命中缓存时不再解析 Excel"""
+    if not ENABLED:
+        return _parse(path, sheet_name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return _parse(path, sheet_name)
+    key = (os.path.abspath(path), sheet_name)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _memory_lock:
+        hit = _memory.get(key)
+        if hit is not None and hit[0] == version:
+            _memory.move_to_end(key)
+            return hit[1].copy()
+    df = _read_with_sidecar(path, sheet_name, stat)
+    with _memory_lock:
+        _memory[key] = (version, df.copy())
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+    return df
+
+
+def _read_with_sidecar(path: str, sheet_name: str, stat: os.stat_result) -> pd.DataFrame:
+    base = _sidecar_base(path, sheet_name)
+    try:
+        meta = _load_meta(base)
+        if meta is not None:
+            if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+                return _read_sidecar(base, meta["format"])
+            if meta.get("size") == stat.st_size and meta.get("sha256") == _file_hash(path):
+                meta["mtime_ns"] = stat.st_mtime_ns
+                _save_meta(base, meta)
+                return _read_sidecar(base, meta["format"])
+    except Exception:
+        # 旁路文件损坏（如上次写出被中断）、格式不可读等一律视为未命中
+        pass
+
+    df = _parse(path, sheet_name)
+    try:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        fmt = _write_sidecar(base, df)
+        _save_meta(base, {
+            "source": os.path.basename(path),
+            "sheet": sheet_name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _file_hash(path),
+            "format": fmt,
+        })
+    except Exception:
+        pass
+    return df
@@ -0,0 +1,151 @@
+"""
+考试库清单
+
+在 历次成绩 目录维护 .exam_library.json，记录每个考试文件的考试名称、日期、人数、列结构、
+学生名单与文件指纹（大小、修改时间、内容哈希）。列出考试、查询某学生参加过
+哪些考试都直接查清单；刷新时只重新读取指纹变化的文件（经 exam_cache 读取）。
+
+用法:
+    python exam_library.py                  # 刷新并列出全部考试
+    python exam_library.py --student 张三    # 列出该学生（姓名或考号）参加过的考试
+"""
+import argparse
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+EXAMS_DIR = os.path.join("..", "历次成绩")
+MANIFEST_NAME = ".exam_library.json"
+MANIFEST_VERSION = 1
+
+
+def exam_date_from_name(exam_name: str) -> Optional[str]:
+    """由考试名称推断年月 (YYYY-MM)：“2025年12月月考”、“2025-2026学年下学期4月考试”"""
+    m = re.search(r"(\d{4})年(\d{1,2})月", exam_name)
+    if m:
+        return f"{m.group(1)}-{int(m.group(2)):02d}"
+    m = re.search(r"(\d{4})-(\d{4})学年(上|下)学期(\d{1,2})月", exam_name)
+    if m:
+        month = int(m.group(4))
+        # 上学期的 8-12 月在前一年，其余月份在后一年
+        year = m.group(1) if m.group(3) == "上" and month >= 8 else m.group(2)
+        return f"{year}-{month:02d}"
+    return None
+
+
+def _describe(path: str, stat: os.stat_result, sha256: str) -> Dict[str, Any]:
+    """读取考试文件（经解析缓存），生成清单条目"""
+    # 只有新增或变化的文件才需要 pandas，列出考试时不加载
+    from exam_cache import read_exam_sheet
+    from summary_workbook import _student_id
+
+    df = read_exam_sheet(path)
+    names = [str(v) for v in df["姓名"].tolist()] if "姓名" in df.columns else []
+    ids = [_student_id(v) for v in df["考号"].tolist()] if "考号" in df.columns else [None] * len(names)
+    exam_name = os.path.splitext(os.path.basename(path))[0]
+    return {
+        "name": exam_name,
+        "date": exam_date_from_name(exam_name),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "students": [[name, student_id] for name, student_id in zip(names, ids)],
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+    }
+
+
+class ExamLibrary:
+    """历次成绩目录的考试清单"""
+
+    def __init__(self, exams_dir: str = EXAMS_DIR):
+        self.exams_dir = exams_dir
+        self.manifest_path = os.path.join(exams_dir, MANIFEST_NAME)
+        # 文件名 -> 清单条目
+        self.exams: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            if doc.get("version") == MANIFEST_VERSION:
+                self.exams = doc.get("exams") or {}
+        except (OSError, ValueError):
+            pass
+
+    def refresh(self) -> "ExamLibrary":
+        """按文件指纹同步清单：新增或内容变化的文件重新读取，已删除的文件移出清单"""
+        changed = False
+        seen = set()
+        for filename in sorted(os.listdir(self.exams_dir)):
+            path = os.path.join(self.exams_dir, filename)
+            if not filename.endswith('.xlsx') or filename.startswith('~$') or not os.path.isfile(path):
+                continue
+            seen.add(filename)
+            stat = os.stat(path)
+            entry = self.exams.get(filename)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            # 指纹变化时才需要（exam_cache 依赖 pandas，列出考试时不加载）
+            from exam_cache import _file_hash
+
+            sha256 = _file_hash(path)
+            if entry and entry["size"] == stat.st_size and entry["sha256"] == sha256:
+                entry["mtime_ns"] = stat.st_mtime_ns
+            else:
+                try:
+                    self.exams[filename] = _describe(path, stat, sha256)
+                except Exception as e:
+                    print(f"⚠ 读取考试文件失败，未加入清单: {filename} ({e})")
+                    seen.discard(filename)
+                    self.exams.pop(filename, None)
+            changed = True
+        for filename in [f for f in self.exams if f not in seen]:
+            del self.exams[filename]
+            changed = True
+        if changed:
+            self.save()
+        return self
+
+    def save(self) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "exams": self.exams}, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """全部考试，按日期（无日期的在前）与名称排序，附带 file / path 字段"""
+        items = [dict(entry, file=filename, path=os.path.join(self.exams_dir, filename))
+                 for filename, entry in self.exams.items()]
+        return sorted(items, key=lambda e: (e["date"] or "", e["name"]))
+
+    def exams_for_student(self, student: str) -> List[Dict[str, Any]]:
+        """某学生（姓名或考号）参加过的考试"""
+        return [entry for entry in self.entries()
+                if any(student in (name, student_id) for name, student_id in entry["students"])]
+
+
+def describe_entry(entry: Dict[str, Any]) -> str:
+    """一行考试说明：日期、人数、列数"""
+    return f"{entry['date'] or '日期未知'}，{entry['rows']} 人，{len(entry['columns'])} 列"
+
+
+def list_exams(exams_dir: str = EXAMS_DIR, student: Optional[str] = None) -> None:
+    """刷新清单并列出全部考试，或某学生（姓名或考号）参加过的考试"""
+    library = ExamLibrary(exams_dir).refresh()
+    entries = library.exams_for_student(student) if student else library.entries()
+    title = f"【{student}】参加过的考试" if student else "考试清单"
+    print(f"{title}（共 {len(entries)} 次）:")
+    for entry in entries:
+        print(f"  {entry['file']}  ({describe_entry(entry)})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="刷新并查询历次成绩考试清单")
+    parser.add_argument("--dir", default=EXAMS_DIR, help="考试文件目录 (默认 %(default)s)")
+    parser.add_argument("--student", help="只列出该学生（姓名或考号）参加过的考试")
+    args = parser.parse_args(argv)
+    list_exams(args.dir, args.student)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+考试统计预计算
+
+按考试一次性（SQL 分组聚合）计算各科及总分的年级均分、各班均分、总体标准差、
+最大年级名次（年级实考人数）与实考人数，写入 exam_stats 表。
+网页端读取该表即可，不再在每次请求时 AVG / MAX 聚合；表不存在或无数据时回退实时聚合。
+均分与最大名次使用与网页端实时聚合相同的 SQLite AVG / MAX，两条路径对同一次考试结果一致
+（例如文本成绩按 SQLite 的规则计为 0）。
+
+db_loader 导入考试后会自动刷新对应考试的统计，也可单独运行：
+    python exam_stats.py [--db 路径]     # 重新计算数据库中全部考试的统计
+"""
+import argparse
+import math
+import sqlite3
+import sys
+from typing import List, Optional
+
+# 考试总分在统计表中的科目名
+TOTAL_SUBJECT = "总分"
+# 年级整体统计的班级字段取值
+GRADE_SCOPE = ""
+
+STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id INTEGER NOT NULL,
+    subject TEXT NOT NULL, -- 科目，'总分' 为考试总分
+    class TEXT NOT NULL DEFAULT '', -- 考试时所在班级，'' 为年级整体
+    avg_score REAL,
+    std_score REAL, -- 总体标准差
+    max_grade_rank INTEGER, -- 最大年级名次（年级实考人数）
+    participants INTEGER, -- 有成绩的人数
+    FOREIGN KEY (exam_id) REFERENCES exams(id),
+    UNIQUE(exam_id, subject, class)
+)
+"""
+
+# 年级整体与各班（未记录考试时班级的成绩只计入年级整体）；AVG / MAX 与网页端实时聚合一致
+_EXAM_STATS_SQL = """
+    WITH exam_rows AS (
+        SELECT r.class_at_exam AS class, ss.subject AS subject, ss.score AS score, ss.grade_rank AS grade_rank
+        FROM subject_scores ss
+        JOIN exam_results r ON r.id = ss.result_id
+        WHERE r.exam_id = :exam_id
+        UNION ALL
+        SELECT class_at_exam, :total, total_score, grade_rank
+        FROM exam_results
+        WHERE exam_id = :exam_id
+    )
+    SELECT subject, :grade AS class, AVG(score), AVG(score * score), MAX(grade_rank), COUNT(score)
+    FROM exam_rows GROUP BY subject
+    UNION ALL
+    SELECT subject, class, AVG(score), AVG(score * score), MAX(grade_rank), COUNT(score)
+    FROM exam_rows WHERE class IS NOT NULL GROUP BY subject, class
+    ORDER BY 2, 1
+"""
+
+
+def refresh_exam_stats(conn: sqlite3.Connection, exam_id: int) -> int:
+    """按数据库中的现有成绩重新计算一次考试的统计，返回写入行数（调用方负责事务）"""
+    conn.execute(STATS_TABLE_SQL)
+    rows = []
+    for subject, cls, avg, mean_square, max_rank, count in conn.execute(
+            _EXAM_STATS_SQL, {"exam_id": exam_id, "total": TOTAL_SUBJECT, "grade": GRADE_SCOPE}).fetchall():
+        # 总体标准差 sqrt(E[x²] - E[x]²)
+        std = None if avg is None else math.sqrt(max(0.0, mean_square - avg * avg))
+        rows.append((exam_id, subject, cls, avg, std, max_rank, count))
+    conn.execute("DELETE FROM exam_stats WHERE exam_id = ?", (exam_id,))
+    conn.executemany(
+        "INSERT INTO exam_stats (exam_id, subject, class, avg_score, std_score, max_grade_rank, participants) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def refresh_all(db_path: str) -> int:
+    """重新计算数据库中全部考试的统计"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        exams: List[tuple] = conn.execute("SELECT id, name FROM exams ORDER BY id").fetchall()
+        total = 0
+        conn.execute("BEGIN IMMEDIATE")
+        for exam_id, name in exams:
+            rows = refresh_exam_stats(conn, exam_id)
+            total += rows
+            print(f"  ✓ {name}: {rows} 行统计")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    print(f"✅ 已刷新 {len(exams)} 次考试的统计，共 {total} 行")
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from db_loader import DB_PATH
+
+    parser = argparse.ArgumentParser(description="重新计算成绩数据库中各次考试的统计 (exam_stats)")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径（默认取环境变量 DB_PATH 或 %(default)s）")
+    args = parser.parse_args(argv)
+    try:
+        refresh_all(args.db)
+    except sqlite3.Error as e:
+        print(f"❌ 刷新统计失败（已回滚）: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,10 @@ function importExams() {
         ) VALUES (?, ?, ?, ?, ?, ?, ?)
     `);
 
+    // 预计算统计表 (exam_stats，见 tools/exam_stats.py) 存在时，导入后该考试的统计已过期
+    const hasStats = db.prepare(`SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'exam_stats'`).get();
+    const deleteStats = hasStats ? db.prepare(`DELETE FROM exam_stats WHERE exam_id = ?`) : null;
+
     for (const file of files) {
         const examName = file.replace('.xlsx', '');
         console.log(`正在导入考试: ${examName}`);
@@ -76,6 +80,9 @@ function importExams() {
         const data = xlsx.utils.sheet_to_json(workbook.Sheets[sheetName]);
 
         db.transaction(() => {
+            // 删除本次考试的预计算统计，由查询回退实时聚合（与 ImportService 一致）
+            if (deleteStats) deleteStats.run(examId);
+
             for (const row of data) {
                 const studentId = String(row['考号'] || row['考籍号\t'] || '');
                 if (!studentId) continue;
@@ -0,0 +1,198 @@
+"""
+增量导入包
+
+对每名学生本次考试的成绩（考号、考试时所在班级、exam_result、subjects）计算内容哈希，与上一次导出的
+清单（<考试>_import.manifest.json）或数据库中该次考试的现有数据比对，导入 JSON 只保留新增、有变化的
+学生。清单记录本次全部学生的哈希，供下一次比对。
+
+姓名、性别、报到号等 student_info 字段存放在各次考试共用的 students 表中，之后导入的其他考试会改写它们，
+不属于本次考试的数据，因此不计入哈希（否则刚导入完就与数据库比对也会报告变化）。
+
+抓取结果中缺少某名学生多半是登录失败、超时或未取到成绩表，而不是该学生已不存在，因此默认不删除：
+本次未出现的学生只打印提示，清单中沿用其上次的哈希。只有显式要求删除（deletions=True）且本次运行
+没有抓取失败的学生时，才把未出现的学生写入 "deleted" 列表。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 数据库中与结构化导入记录对应的本次考试字段
+_RESULT_FIELDS = ("total_score", "grade_rank", "class_rank", "elective_rank", "other_total_score",
+                  "other_total_grade_rank", "other_total_class_rank", "missing_count", "remarks")
+_SUBJECT_FIELDS = ("subject", "score", "scaled_score", "grade_rank", "class_rank", "arts_science_rank")
+
+
+def _canon(value: Any) -> Any:
+    """整数值的小数（数据库 REAL 列读回的 95.0）统一为 int，保证两侧哈希一致"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _canon(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canon(v) for v in value]
+    return value
+
+
+def record_key(record: Dict[str, Any]) -> str:
+    """学生标识：结构化记录取考号，旧格式取姓名"""
+    if "student_info" in record:
+        return str((record["student_info"] or {}).get("id") or "")
+    return str(record.get("student_name") or "")
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    """学生本次考试成绩的内容哈希，与科目顺序无关"""
+    if "student_info" in record:
+        info = record.get("student_info") or {}
+        payload = {
+            "id": info.get("id"),
+            "class": info.get("class"),
+            "exam_result": record.get("exam_result"),
+            "subjects": sorted(record.get("subjects") or [], key=lambda s: str(s.get("subject"))),
+        }
+    else:
+        payload = dict(record, subjects=sorted(record.get("subjects") or [], key=lambda s: str(s.get("subject"))))
+    text = json.dumps(_canon(payload), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def manifest_path(output_path: str) -> str:
+    """导入 JSON 对应的清单路径：xxx_import.json -> xxx_import.manifest.json"""
+    root, _ = os.path.splitext(output_path)
+    return f"{root}.manifest.json"
+
+
+def manifest_hashes(path: str) -> Optional[Dict[str, str]]:
+    """读取上一次导出的学生哈希，清单不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("hashes") or {}
+
+
+def db_hashes(db_path: str, exam_name: str) -> Optional[Dict[str, str]]:
+    """由数据库中该次考试的成绩（exam_results / subject_scores）重建结构化记录并计算哈希，考试不存在时返回 None"""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT id FROM exams WHERE name = ?", (exam_name,)).fetchone()
+        if row is None:
+            return None
+        exam_id = row[0]
+        # 班级取考试时所在班级（导入时 class_at_exam 即 student_info.class）
+        records: Dict[int, Dict[str, Any]] = {}
+        for result_id, student_id, class_at_exam, *values in conn.execute(
+                f"SELECT id, student_id, class_at_exam, {', '.join(_RESULT_FIELDS)} FROM exam_results "
+                f"WHERE exam_id = ?", (exam_id,)):
+            info = {"id": student_id, "class": class_at_exam}
+            records[result_id] = {"student_info": info, "exam_result": dict(zip(_RESULT_FIELDS, values)),
+                                  "subjects": []}
+        for values in conn.execute(
+                f"SELECT ss.result_id, {', '.join('ss.' + f for f in _SUBJECT_FIELDS)} FROM subject_scores ss "
+                f"JOIN exam_results r ON r.id = ss.result_id WHERE r.exam_id = ?", (exam_id,)):
+            if values[0] in records:
+                records[values[0]]["subjects"].append(dict(zip(_SUBJECT_FIELDS, values[1:])))
+        return {record_key(r): record_hash(r) for r in records.values()}
+    finally:
+        conn.close()
+
+
+class DeltaFilter:
+    """逐条判断学生记录是否需要写入增量包，并汇总新增/变化/删除情况"""
+
+    def __init__(self, previous: Optional[Dict[str, str]], base: str, *, deletions: bool = False):
+        self.previous = previous or {}
+        self.base = base if previous is not None else None
+        # 是否把本次未出现的学生写入 deleted
+        self.deletions = deletions
+        self.hashes: Dict[str, str] = {}
+        self.new: List[str] = []
+        self.changed: List[str] = []
+        self.unchanged = 0
+
+    def keep(self, record: Dict[str, Any]) -> bool:
+        key = record_key(record)
+        if not key:
+            # 无法比对的记录原样保留
+            return True
+        digest = record_hash(record)
+        self.hashes[key] = digest
+        old = self.previous.get(key)
+        if old is None:
+            self.new.append(key)
+        elif old != digest:
+            self.changed.append(key)
+        else:
+            self.unchanged += 1
+            return False
+        return True
+
+    @property
+    def missing(self) -> List[str]:
+        """上次有、本次未出现的学生"""
+        return [key for key in self.previous if key not in self.hashes]
+
+    @property
+    def deleted(self) -> List[str]:
+        return self.missing if self.deletions else []
+
+    def report_missing(self, log: Callable[[str], None] = print) -> None:
+        """写出增量包之前打印本次未出现的学生，以及是否删除"""
+        missing = self.missing
+        if not missing:
+            return
+        if self.deletions:
+            log(f"  ⚠ 将删除 {len(missing)} 名本次未出现的学生: {'、'.join(missing)}")
+        else:
+            log(f"  ⚠ {len(missing)} 名学生本次未出现，不删除（保留其现有成绩）: {'、'.join(missing)}")
+
+    def write_manifest(self, path: str, exam_name: str, exam_date: str, package: str) -> Dict[str, Any]:
+        hashes = dict(self.hashes)
+        if not self.deletions:
+            # 未删除的学生仍在导入端，沿用上次的哈希
+            for key in self.missing:
+                hashes[key] = self.previous[key]
+        manifest = {
+            "examName": exam_name,
+            "examDate": exam_date,
+            "generatedAt": datetime.now().isoformat(timespec="seconds"),
+            "package": os.path.basename(package),
+            "base": self.base,
+            "counts": {"new": len(self.new), "changed": len(self.changed),
+                       "unchanged": self.unchanged, "missing": len(self.missing), "deleted": len(self.deleted)},
+            "new": self.new,
+            "changed": self.changed,
+            "missing": self.missing,
+            "deleted": self.deleted,
+            "hashes": hashes,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    def summary(self) -> str:
+        base = {"manifest": "上次导出清单", "db": "数据库"}.get(self.base, "无（全部视为新增）")
+        return (f"增量对比基准: {base}；新增 {len(self.new)}，变化 {len(self.changed)}，"
+                f"未变 {self.unchanged}，未出现 {len(self.missing)}，删除 {len(self.deleted)}")
+
+
+def deletions_allowed(requested: bool, failed: Sequence[str], log: Callable[[str], None] = print) -> bool:
+    """显式要求删除且本次运行没有未取得成绩的学生时才允许删除未出现的学生"""
+    if not requested:
+        return False
+    if failed:
+        log(f"  ⚠ 本次有 {len(failed)} 名学生未取得成绩（{'、'.join(failed)}），抓取结果不完整，不删除未出现的学生")
+        return False
+    return True
+
+
+def delta_filter(output_path: str, exam_name: str, db_path: Optional[str] = None, *,
+                 deletions: bool = False) -> DeltaFilter:
+    """指定数据库时与数据库中的现有数据比对，否则与上一次导出的清单比对"""
+    if db_path:
+        return DeltaFilter(db_hashes(db_path, exam_name), "db", deletions=deletions)
+    return DeltaFilter(manifest_hashes(manifest_path(output_path)), "manifest", deletions=deletions)
@@ -0,0 +1,221 @@
+"""
+导入 JSON 生成工具
+
+- 按列一次性完成 NaN→null 与整数/小数规范化，不再逐行逐单元格转换
+- ImportJsonWriter 逐个学生流式写出导入文档，不在内存中拼整份文档；
+  默认缩进格式与 json.dump(..., indent=2) 的输出逐字节一致，compact=True 时不缩进
+- 增量模式（见 import_delta）只写出新增、有变化的学生，删除的学生写入 deleted
+"""
+import json
+import math
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+
+# 结构化导入文档中的核心科目
+CORE_SUBJECTS = ['语文', '数学', '英语', '物理', '化学', '生物', '政治', '历史', '地理']
+
+# 未指定参数的占位
+_DEFAULT = object()
+
+
+def _number(value: float) -> Any:
+    """整数值输出为 int，其余保持 float"""
+    return int(value) if value.is_integer() else value
+
+
+def json_value(value: Any, default: Any = None) -> Any:
+    """单个值的规范化，规则与 json_values 相同"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(number) or math.isinf(number):
+        return str(value)
+    return _number(number)
+
+
+def json_values(df: pd.DataFrame, column: str, default: Any = None) -> List[Any]:
+    """按列规范化单元格：空值为 default，可转为数字的转为 int/float，其余保持文本。
+    列不存在时整列为 default。"""
+    if column not in df.columns:
+        return [default] * len(df)
+    series = df[column]
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype=float)
+        missing = np.isnan(values)
+        return [default if m else _number(v) for v, m in zip(values.tolist(), missing.tolist())]
+    numeric = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float).tolist()
+    missing = series.isna().to_numpy().tolist()
+    out = []
+    for raw, num, m in zip(series.tolist(), numeric, missing):
+        if m:
+            out.append(default)
+        elif not math.isnan(num) and not math.isinf(num):
+            out.append(_number(num))
+        else:
+            out.append(str(raw))
+    return out
+
+
+def numeric_values(df: pd.DataFrame, column: str, default: Any = None, *, absent: Any = _DEFAULT) -> List[Any]:
+    """按列转为数字：空值及无法转换的文本为 default，整数值为 int。
+    列不存在时整列为 absent（未指定时同 default）。"""
+    if column not in df.columns:
+        return [default if absent is _DEFAULT else absent] * len(df)
+    values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+    missing = np.isnan(values)
+    return [default if m else _number(v) for v, m in zip(values.tolist(), missing.tolist())]
+
+
+def text_values(df: pd.DataFrame, column: str, default: str = "") -> List[str]:
+    """按列转为文本（与 str(row.get(column, default)) 一致）"""
+    if column not in df.columns:
+        return [default] * len(df)
+    return [str(v) for v in df[column].tolist()]
+
+
+def raw_values(df: pd.DataFrame, column: str) -> List[Any]:
+    """按列取原始值，列不存在时为 None"""
+    if column not in df.columns:
+        return [None] * len(df)
+    return df[column].tolist()
+
+
+class ImportJsonWriter:
+    """逐个学生流式写出 {"examName", "examDate", "data": [...]} 格式的导入文档"""
+
+    def __init__(self, path: str, exam_name: str, exam_date: str, *, compact: bool = False):
+        self.path = path
+        self.compact = compact
+        self.count = 0
+        # 关闭时追加在 data 之后的顶层字段（如增量包的 deleted）
+        self.extra: Dict[str, Any] = {}
+        self._fh = open(path, "w", encoding="utf-8")
+        header = {"examName": exam_name, "examDate": exam_date}
+        if compact:
+            self._fh.write(json.dumps(header, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"data":[')
+        else:
+            self._fh.write(json.dumps(header, ensure_ascii=False, indent=2)[:-2] + ',\n  "data": [')
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.compact:
+            text = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            self._fh.write(("," if self.count else "") + text)
+        else:
+            text = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            self._fh.write(("," if self.count else "") + "\n    " + text)
+        self.count += 1
+
+    def close(self) -> None:
+        if self.compact:
+            self._fh.write("]")
+            for key, value in self.extra.items():
+                self._fh.write(f",{json.dumps(key, ensure_ascii=False)}:"
+                               + json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+            self._fh.write("}")
+        else:
+            self._fh.write("\n  ]" if self.count else "]")
+            for key, value in self.extra.items():
+                self._fh.write(f",\n  {json.dumps(key, ensure_ascii=False)}: "
+                               + json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            self._fh.write("\n}")
+        self._fh.close()
+
+    def __enter__(self) -> "ImportJsonWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def column_or(primary: List[Any], fallback: List[Any]) -> List[Any]:
+    """逐行取 primary 的值，为假值时取 fallback（与 a or b 一致）"""
+    return [p or f for p, f in zip(primary, fallback)]
+
+
+def structured_records(df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """由考试“汇总”表（列名已去除首尾空白）逐个产出结构化导入记录
+    {"student_info", "exam_result", "subjects"}，各列一次性规范化。"""
+    # 1. 学生基础信息 (student_info) 各列
+    ids = [str(v).split('.')[0] for v in json_values(df, '考号', '')]
+    report_ids = [str(v).split('.')[0] for v in json_values(df, '报到号', '')]
+    names = text_values(df, '姓名', '')
+    classes = text_values(df, '班级', '未知')
+    genders = json_values(df, '性别')
+    class_orders = json_values(df, '班序')
+    statuses = json_values(df, '学籍')
+
+    # 2. 考试总体结果 (exam_result) 各列
+    total_scores = json_values(df, '总分')
+    grade_ranks = json_values(df, '总分年名')
+    class_ranks = json_values(df, '总分班名')
+    elective_ranks = [json_value(v) for v in column_or(raw_values(df, '选科名次'), raw_values(df, '文理名次'))]
+    # 历次成绩中该列多写作“其他总分”
+    other = '其它总分' if '其它总分' in df.columns else '其他总分'
+    other_totals = json_values(df, other)
+    other_grade_ranks = json_values(df, f'{other}年名')
+    other_class_ranks = json_values(df, f'{other}班名')
+    missing_counts = json_values(df, '缺考门次', 0)
+    remarks = [str(v) if pd.notnull(v) else "" for v in raw_values(df, '备注')] if '备注' in df.columns else [""] * len(df)
+    # 如果有选考科目列，加入备注
+    for i, elective_subjects in enumerate(raw_values(df, '选考科目')):
+        if pd.notnull(elective_subjects):
+            remarks[i] = f"[{elective_subjects}] " + remarks[i]
+
+    # 3. 单科详细成绩 (subjects) 各列
+    subject_columns = [
+        (sub, json_values(df, sub), json_values(df, f'{sub}赋分'), json_values(df, f'{sub}年名'),
+         json_values(df, f'{sub}班名'), json_values(df, f'{sub}文理名次'))
+        for sub in CORE_SUBJECTS
+    ]
+
+    for i in range(len(df)):
+        yield {
+            "student_info": {
+                "id": ids[i],
+                "report_id": report_ids[i],
+                "name": names[i],
+                "class": classes[i],
+                "gender": genders[i],
+                "class_order": class_orders[i],
+                "student_status": statuses[i]
+            },
+            "exam_result": {
+                "total_score": total_scores[i],
+                "grade_rank": grade_ranks[i],
+                "class_rank": class_ranks[i],
+                "elective_rank": elective_ranks[i],
+                "other_total_score": other_totals[i],
+                "other_total_grade_rank": other_grade_ranks[i],
+                "other_total_class_rank": other_class_ranks[i],
+                "missing_count": missing_counts[i],
+                "remarks": remarks[i]
+            },
+            "subjects": [
+                {
+                    "subject": sub,
+                    "score": scores[i],
+                    "scaled_score": scaled[i],
+                    "grade_rank": sub_grade[i],
+                    "class_rank": sub_class[i],
+                    "arts_science_rank": sub_arts[i]
+                }
+                for sub, scores, scaled, sub_grade, sub_class, sub_arts in subject_columns
+            ]
+        }
+
+
+def full_scores(records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """各科满分：本次考试该科最高分超过 100 记为 150，否则 100（与 ImportService 一致）"""
+    subject_max: Dict[str, float] = {}
+    for item in records:
+        for sub in item.get("subjects") or []:
+            score = sub.get("score")
+            if isinstance(score, (int, float)) and not isinstance(score, bool):
+                subject_max[sub["subject"]] = max(subject_max.get(sub["subject"], 0), score)
+    return {subject: 150 if top > 100 else 100 for subject, top in subject_max.items()}
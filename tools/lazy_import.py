@@ -0,0 +1,38 @@
+"""
+按需加载重量级依赖
+
+pandas、requests 等模块导入一次要数百毫秒，而列出考试、查看进度、菜单中直接退出等操作根本用不到。
+lazy_module 返回一个登记在 sys.modules 中的延迟模块：首次访问其属性时才真正执行导入。
+
+注意：
+- 函数签名中的 `pd.DataFrame` 之类注解在定义函数时就会求值，使用延迟模块的文件需
+  `from __future__ import annotations`，或把注解写成字符串
+- 其他模块中的 `import pandas` 同样会触发加载（导入系统会检查模块的 __spec__），
+  顶层导入了这些库的模块应在用到的函数内导入
+- Python 3.12 之前延迟模块的首次加载不是线程安全的，启动线程池前应在主线程中用到它们或调用 load_now
+"""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_module(name: str) -> ModuleType:
+    """返回模块 name 的延迟加载版本；已导入过的模块直接返回"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"未安装模块: {name}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def load_now(*modules: ModuleType) -> None:
+    """立即完成延迟模块的加载（在启动线程前调用）"""
+    for module in modules:
+        # 访问任意属性即触发加载；已加载的模块无影响
+        getattr(module, "__name__")
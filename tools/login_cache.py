@@ -0,0 +1,49 @@
+"""
+登录表单结构缓存
+
+登录页表单（字段名、静态隐藏字段、action、method）对所有学生都相同。
+第一次 GET 登录页后缓存表单结构，之后直接 POST 登录，每名学生省去一次请求。
+以下情况会重新 GET 登录页进行校验：
+- 使用缓存登录失败，且失败页面上的登录表单与缓存不一致（调用方调用 invalidate）；
+  密码错误等普通登录失败返回同样的登录表单，不作废缓存
+- 缓存已被使用 revalidate_every 次
+"""
+import threading
+from typing import Any, Dict, Optional
+
+LoginForm = Dict[str, Any]
+
+
+class LoginFormCache:
+    """按登录页 URL 缓存表单结构，可在多个抓取线程间共享"""
+
+    def __init__(self, revalidate_every: int = 100):
+        self.revalidate_every = max(1, int(revalidate_every))
+        self._lock = threading.Lock()
+        self._forms: Dict[str, LoginForm] = {}
+        self._uses: Dict[str, int] = {}
+
+    def get(self, url: str) -> Optional[LoginForm]:
+        """取缓存的表单结构；无缓存或到达校验周期时返回 None，调用方应重新 GET 登录页"""
+        with self._lock:
+            form = self._forms.get(url)
+            if form is None:
+                return None
+            uses = self._uses.get(url, 0)
+            if uses >= self.revalidate_every:
+                # 到期：清空计数，由本次调用方重新获取
+                del self._forms[url]
+                self._uses[url] = 0
+                return None
+            self._uses[url] = uses + 1
+            return form
+
+    def store(self, url: str, form: LoginForm) -> None:
+        with self._lock:
+            self._forms[url] = form
+            self._uses[url] = 0
+
+    def invalidate(self, url: str) -> None:
+        with self._lock:
+            self._forms.pop(url, None)
+            self._uses.pop(url, None)
@@ -0,0 +1,51 @@
+"""
+页面快照：每个响应只解析一次 HTML，供登录判定、表格选择、考试名称提取等环节共享
+"""
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+class PageSnapshot:
+    """已解析的页面。soup / lxml 树都按需构建且只构建一次，纯文本同样按需计算并缓存。"""
+
+    def __init__(self, html: str):
+        self.html = html
+        self._soup: Optional["BeautifulSoup"] = None
+        self._tree: Any = None
+        self._text: Optional[str] = None
+
+    @classmethod
+    def of(cls, page: "Page") -> "PageSnapshot":
+        """接受 HTML 字符串或已有快照，统一返回快照"""
+        if isinstance(page, PageSnapshot):
+            return page
+        return cls(page)
+
+    @property
+    def soup(self) -> "BeautifulSoup":
+        """BeautifulSoup 解析结果（lxml 解析器）"""
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.html, "lxml")
+        return self._soup
+
+    @property
+    def tree(self) -> Any:
+        """原生 lxml.html 文档树，供成绩表快速提取使用"""
+        if self._tree is None:
+            import lxml.html
+            self._tree = lxml.html.document_fromstring(self.html)
+        return self._tree
+
+    @property
+    def text(self) -> str:
+        """页面纯文本（空格分隔），等价于 soup.get_text(" ", strip=True)"""
+        if self._text is None:
+            self._text = self.soup.get_text(" ", strip=True)
+        return self._text
+
+
+# 各解析函数既接受原始 HTML，也接受已解析的快照
+Page = Union[str, PageSnapshot]
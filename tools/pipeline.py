@@ -0,0 +1,308 @@
+"""
+无交互流水线
+
+菜单 [1] 的各步骤依次执行，每一步都重新读取上一步写出的 Excel。流水线模式下各阶段由内存队列连接：
+抓取主线程每整理完一名学生就把成绩行交给分发线程，转换为与考试文件“汇总”表读回时一致的
+DataFrame 后分发给各阶段；各阶段在自己的线程中边抓边处理，不经由 Excel 中转：
+
+- JsonExportStage: 逐个学生流式写出导入 JSON（支持增量模式），完成后替换旧文件
+- SummaryStage: 边抓边收集目标学生的成绩行，抓取结束后写入其成绩汇总，已存在的考试列按 overwrite 处理，不询问
+- DatabaseStage: 边抓边生成结构化记录，抓取结束后在一个事务中写入数据库（满分需按全体学生判定）
+
+任一阶段出错只停止该阶段（并调用其 abort 丢弃未完成的输出），其余阶段照常完成。各阶段的处理用时合计后计入运行指标（run_metrics）。
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from import_delta import DeltaFilter, delta_filter, deletions_allowed, manifest_path
+from import_json import ImportJsonWriter, full_scores, structured_records
+from run_metrics import current
+from summary_workbook import SummaryWorkbook, clean_indicator
+
+# 队列结束标记
+_DONE = object()
+
+
+class Stage:
+    """流水线阶段：start(考试名称) → rows(成绩表) 若干次 → finish()，均在本阶段线程中按名单顺序调用"""
+
+    name = "阶段"
+    # 运行指标中的阶段名
+    metric = "pipeline_stage"
+
+    def start(self, exam_name: str) -> None:
+        pass
+
+    def rows(self, frame: pd.DataFrame) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        """抓取失败或本阶段出错时代替 finish 调用，丢弃未完成的输出"""
+
+
+class Pipeline:
+    """把抓取结果经内存队列分发给各阶段线程"""
+
+    def __init__(self, stages: Sequence[Stage], prepare: Callable[[List[str], List[List[Any]]], pd.DataFrame]):
+        self.stages = list(stages)
+        self.prepare = prepare
+        self.exam_name: Optional[str] = None
+        self.errors: Dict[str, BaseException] = {}
+        # 考试名称确定前到达的成绩行
+        self._pending: List[Tuple[List[str], List[List[Any]]]] = []
+        self._abort = False
+        self._inbox: "queue.Queue[Any]" = queue.Queue()
+        self._queues: List["queue.Queue[Any]"] = [queue.Queue() for _ in self.stages]
+        self._busy = [0.0] * len(self.stages)
+        self._threads = [threading.Thread(target=self._run_stage, args=(i,), name=f"pipeline-{i}", daemon=True)
+                         for i in range(len(self.stages))]
+        self._threads.append(threading.Thread(target=self._dispatch, name="pipeline-dispatch", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def feed(self, exam_name: Optional[str], columns: List[str], rows: List[List[Any]]) -> None:
+        """交付一名学生的成绩行（抓取主线程调用，立即返回）；考试名称确定前先暂存"""
+        if exam_name and self.exam_name is None:
+            self.exam_name = exam_name
+            self._inbox.put(("start", exam_name))
+            for item in self._pending:
+                self._inbox.put(("rows", item))
+            self._pending = []
+        if self.exam_name is None:
+            self._pending.append((list(columns), rows))
+        else:
+            self._inbox.put(("rows", (list(columns), rows)))
+
+    def _dispatch(self) -> None:
+        while True:
+            message = self._inbox.get()
+            if message is _DONE:
+                break
+            kind, payload = message
+            if kind == "rows":
+                try:
+                    payload = self.prepare(*payload)
+                except Exception as e:
+                    print(f"  ⚠ 流水线转换成绩行失败，已跳过: {e}")
+                    continue
+            for q in self._queues:
+                q.put((kind, payload))
+        for q in self._queues:
+            q.put(_DONE)
+
+    def _run_stage(self, i: int) -> None:
+        stage, q = self.stages[i], self._queues[i]
+        started = failed = False
+        while True:
+            message = q.get()
+            if message is _DONE:
+                break
+            if failed:
+                continue
+            kind, payload = message
+            t0 = time.perf_counter()
+            try:
+                if kind == "start":
+                    stage.start(payload)
+                    started = True
+                else:
+                    stage.rows(payload)
+            except Exception as e:
+                failed = True
+                self.errors[stage.name] = e
+                print(f"  ❌ 流水线阶段【{stage.name}】失败: {e}")
+            self._busy[i] += time.perf_counter() - t0
+        if not started:
+            return
+        t0 = time.perf_counter()
+        try:
+            if failed or self._abort:
+                stage.abort()
+            else:
+                stage.finish()
+        except Exception as e:
+            self.errors.setdefault(stage.name, e)
+            print(f"  ❌ 流水线阶段【{stage.name}】失败: {e}")
+        self._busy[i] += time.perf_counter() - t0
+
+    def close(self, abort: bool = False) -> bool:
+        """通知各阶段抓取已结束并等待其完成；abort=True 时各阶段丢弃未完成的输出。返回是否全部成功"""
+        self._abort = abort
+        t0 = time.perf_counter()
+        self._inbox.put(_DONE)
+        for thread in self._threads:
+            thread.join()
+        if self.exam_name is None and not abort:
+            print("  ⚠ 未能提取考试名称，流水线各阶段均未执行")
+            return False
+        metrics = current()
+        for stage, seconds in zip(self.stages, self._busy):
+            metrics.observe(stage.metric, seconds)
+        busy = "，".join(f"{stage.name} {seconds:.2f}s" for stage, seconds in zip(self.stages, self._busy))
+        print(f"  · 流水线各阶段处理用时: {busy}；抓取结束后收尾 {time.perf_counter() - t0:.2f}s")
+        return not self.errors
+
+
+class JsonExportStage(Stage):
+    """逐个学生流式写出导入 JSON：先写临时文件，完成后替换，中途失败时保留上一次的导出"""
+
+    name = "导入 JSON"
+    metric = "json_export"
+
+    def __init__(self, output_dir: str, to_records: Callable[[pd.DataFrame], Iterable[Dict[str, Any]]], *,
+                 compact: bool = False, delta: bool = False, delta_db: Optional[str] = None,
+                 delta_delete: bool = False, with_full_scores: bool = False):
+        self.output_dir = output_dir
+        self.to_records = to_records
+        self.compact = compact
+        self.delta = delta
+        self.delta_db = delta_db
+        # 要求把本次未出现的学生写入 deleted（本次有学生未取得成绩时仍不删除）
+        self.delta_delete = delta_delete
+        # 增量包只含部分学生，满分按全部学生判定后写入 fullScores
+        self.with_full_scores = with_full_scores
+        self.output_path: Optional[str] = None
+        self.writer: Optional[ImportJsonWriter] = None
+        self.tracker: Optional[DeltaFilter] = None
+        self.records: List[Dict[str, Any]] = []
+
+    def start(self, exam_name: str) -> None:
+        self.exam_name = exam_name
+        self.exam_date = datetime.now().strftime("%Y-%m-%d")
+        self.output_path = os.path.join(self.output_dir, f"{exam_name}_import.json")
+        self.tracker = delta_filter(self.output_path, exam_name, self.delta_db) if self.delta else None
+        self.writer = ImportJsonWriter(f"{self.output_path}.tmp", exam_name, self.exam_date, compact=self.compact)
+
+    def rows(self, frame: pd.DataFrame) -> None:
+        for record in self.to_records(frame):
+            if self.tracker is not None and self.with_full_scores:
+                self.records.append(record)
+            if self.tracker is None or self.tracker.keep(record):
+                self.writer.write(record)
+
+    def finish(self) -> None:
+        if self.tracker is not None:
+            self.tracker.deletions = deletions_allowed(self.delta_delete, current().failed_students())
+            self.tracker.report_missing()
+            if self.with_full_scores:
+                self.writer.extra["fullScores"] = full_scores(self.records)
+            self.writer.extra["deleted"] = self.tracker.deleted
+        self.writer.close()
+        os.replace(f"{self.output_path}.tmp", self.output_path)
+        current().add_bytes(self.metric, os.path.getsize(self.output_path))
+        if self.tracker is not None:
+            self.tracker.write_manifest(manifest_path(self.output_path), self.exam_name, self.exam_date,
+                                        self.output_path)
+            print(f"  {self.tracker.summary()}")
+        print(f"✅ JSON 生成成功: {os.path.basename(self.output_path)}（{self.writer.count} 条记录）")
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        tmp_path = f"{self.output_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class SummaryStage(Stage):
+    """边抓边收集目标学生的成绩行，抓取结束后写入其成绩汇总工作簿（同名取第一行，与从考试文件提取时一致）；
+    抓取失败时不改动任何汇总"""
+
+    name = "成绩汇总"
+    metric = "summary_update"
+
+    def __init__(self, students: Mapping[str, str], overwrite: bool = False):
+        # 姓名或考号 -> 汇总工作簿路径
+        self.students = dict(students)
+        self.overwrite = overwrite
+        self.seen: Dict[str, None] = {}
+        # 待写入的 (学生, 成绩行)，finish 时才打开、保存汇总工作簿
+        self.pending: List[Tuple[str, Dict[str, Any]]] = []
+        self.updated: List[str] = []
+
+    def start(self, exam_name: str) -> None:
+        self.exam_name = exam_name
+
+    def rows(self, frame: pd.DataFrame) -> None:
+        columns = [clean_indicator(col) for col in frame.columns]
+        for row in frame.itertuples(index=False, name=None):
+            scores = dict(zip(columns, row))
+            student_id = scores.get("考号")
+            keys = [str(scores.get("姓名"))]
+            if student_id is not None and not pd.isna(student_id):
+                keys.append(str(student_id).split('.')[0])
+            for key in keys:
+                if key in self.students and key not in self.seen:
+                    self.seen[key] = None
+                    self.pending.append((key, scores))
+
+    def _write(self, student: str, scores: Dict[str, Any]) -> None:
+        path = self.students[student]
+        if not os.path.exists(path):
+            print(f"  ⚠ 未找到【{student}】的成绩汇总文件: {path}，跳过")
+            return
+        book = SummaryWorkbook(path)
+        if book.write_scores(self.exam_name, scores, self.overwrite,
+                             log=lambda msg: print(f"  【{student}】{msg.strip()}")) is not None:
+            book.save()
+            self.updated.append(student)
+
+    def finish(self) -> None:
+        for student, scores in self.pending:
+            self._write(student, scores)
+        self.pending = []
+        for student in self.students:
+            if student not in self.seen:
+                print(f"  ⚠ 抓取结果中未找到学生【{student}】的成绩")
+        print(f"✅ 已更新 {len(self.updated)} 份成绩汇总")
+
+    def abort(self) -> None:
+        self.pending = []
+
+
+class DatabaseStage(Stage):
+    """边抓边生成结构化记录，抓取结束后在一个事务中写入数据库
+
+    replace=True 时同时删除数据库中本次考试已不在抓取结果里的学生（与相对数据库的增量包效果一致），
+    但本次运行有学生未取得成绩（登录失败、超时、无成绩表）时不删除，只打印提示；
+    exam_date 为新建考试时写入的日期。"""
+
+    name = "数据库"
+    metric = "db_load"
+
+    def __init__(self, db_path: str, *, replace: bool = False, exam_date: Optional[str] = None):
+        self.db_path = db_path
+        self.replace = replace
+        self.exam_date = exam_date
+        self.records: List[Dict[str, Any]] = []
+
+    def start(self, exam_name: str) -> None:
+        self.exam_name = exam_name
+
+    def rows(self, frame: pd.DataFrame) -> None:
+        self.records.extend(structured_records(frame))
+
+    def finish(self) -> None:
+        from db_loader import absent_students, bulk_transaction, load_exam_records
+
+        t0 = time.perf_counter()
+        replace = deletions_allowed(self.replace, current().failed_students())
+        with bulk_transaction(self.db_path) as conn:
+            deleted: List[str] = []
+            if replace:
+                deleted = absent_students(conn, self.exam_name, self.records)
+                if deleted:
+                    print(f"  ⚠ 将从数据库删除 {len(deleted)} 名本次未出现的学生: {'、'.join(deleted)}")
+            counts = load_exam_records(conn, self.exam_name, self.exam_date, self.records, deleted=deleted)
+        removed = f"，删除 {counts['deleted']} 人" if counts["deleted"] else ""
+        print(f"✅ 已写入数据库 {self.db_path}: 学生 {counts['exam_results']} 人，"
+              f"科目成绩 {counts['subject_scores']} 行{removed}（{time.perf_counter() - t0:.2f}s）")
@@ -0,0 +1,93 @@
+"""
+自适应限速器 (AIMD 令牌桶)
+
+- 每次请求前从令牌桶取一个令牌，令牌按当前速率补充
+- 响应健康（非 5xx、未超时、耗时低于阈值）时速率加性增长，每秒约增加 increase 次/秒
+- 超时、连接错误、5xx 或慢响应时速率乘性下降；冷却期内只下降一次，避免一批失败把速率压到底
+- 回退事件立即打印，速率变化定期打印到运行日志
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+
+class AdaptiveRateLimiter:
+    """AIMD 自适应限速器，可在多个抓取线程间共享"""
+
+    def __init__(self, initial_rate: float = 2.0, min_rate: float = 0.5, max_rate: float = 20.0, *,
+                 increase: float = 1.0, decrease: float = 0.5, slow_seconds: float = 3.0,
+                 cooldown: float = 1.0, burst: float = 2.0, report_interval: float = 5.0,
+                 log: Callable[[str], None] = print):
+        self.min_rate = max(0.01, float(min_rate))
+        self.max_rate = max(self.min_rate, float(max_rate))
+        self.rate = min(self.max_rate, max(self.min_rate, float(initial_rate)))
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.slow_seconds = float(slow_seconds)
+        self.cooldown = float(cooldown)
+        self.burst = max(1.0, float(burst))
+        self.report_interval = float(report_interval)
+        self.log = log
+        self.backoffs = 0
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        now = time.monotonic()
+        self._last_refill = now
+        self._last_decrease = now - self.cooldown
+        self._last_report = now
+        self._reported_rate = self.rate
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def classify(self, latency: float, status: Optional[int] = None, error: Optional[BaseException] = None) -> Optional[str]:
+        """返回需要回退的原因，健康响应返回 None"""
+        if error is not None:
+            if isinstance(error, requests.Timeout):
+                return "请求超时"
+            return f"连接错误 {type(error).__name__}"
+        if status is not None and status >= 500:
+            return f"HTTP {status}"
+        if latency > self.slow_seconds:
+            return f"慢响应 {latency:.1f}s"
+        return None
+
+    def record(self, latency: float, status: Optional[int] = None, error: Optional[BaseException] = None) -> bool:
+        """记录一次请求结果并调整速率，返回该次响应是否健康"""
+        reason = self.classify(latency, status, error)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if reason is not None:
+                # 冷却期内或已是最低速率时不再回退，也不计数
+                new_rate = max(self.min_rate, self.rate * self.decrease)
+                if now - self._last_decrease >= self.cooldown and new_rate < self.rate:
+                    old_rate = self.rate
+                    self.rate = new_rate
+                    self.backoffs += 1
+                    self._last_decrease = now
+                    self._reported_rate = self.rate
+                    self.log(f"  ⚠ 限速回退({reason}): {old_rate:.1f} → {self.rate:.1f} 次/秒")
+                return False
+
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            if now - self._last_report >= self.report_interval and abs(self.rate - self._reported_rate) >= 0.1:
+                self._last_report = now
+                self._reported_rate = self.rate
+                self.log(f"  · 当前请求速率: {self.rate:.1f} 次/秒")
+            return True
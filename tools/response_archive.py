@@ -0,0 +1,99 @@
+"""
+原始响应存档（按内容寻址）
+
+- 每个响应正文按 SHA-256 存为 objects/<前两位>/<哈希>.html.gz，内容相同的页面（如登录页）只存一份
+- index.jsonl 逐行记录 (学生账号, 考试名称) 对应的页面列表，同一学生同一考试以最后一条为准
+解析规则调整后可用 --replay 从存档离线重跑解析、导出与汇总流程，无需重新登录。
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# (页面类型, URL, 页面正文)，页面类型为 login / after_login / score
+ArchivedPage = Tuple[str, str, str]
+
+
+class ResponseArchive:
+    """原始响应存档，可在多个抓取线程间共享"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._objects_dir = os.path.join(root, "objects")
+        self._index_path = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+        # (学生账号, 考试名称) -> [(页面类型, URL, 哈希)]
+        self._index: Dict[Tuple[str, str], List[Tuple[str, str, str]]] = {}
+        self._exams: Dict[str, None] = {}
+        os.makedirs(self._objects_dir, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 写了一半的最后一行
+                    continue
+                self._remember(entry)
+
+    def _remember(self, entry: Dict) -> None:
+        pages = [(p["kind"], p["url"], p["sha256"]) for p in entry["pages"]]
+        self._index[(entry["student"], entry["exam"])] = pages
+        self._exams.pop(entry["exam"], None)
+        self._exams[entry["exam"]] = None
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._objects_dir, digest[:2], f"{digest}.html.gz")
+
+    def put(self, text: str) -> str:
+        """保存页面正文，返回内容哈希；已存在的内容不重复写入"""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest: str) -> str:
+        with gzip.open(self._object_path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def record(self, student: str, exam_name: str, pages: List[ArchivedPage]) -> None:
+        """记录一名学生在某次考试中的全部原始响应"""
+        entry = {
+            "student": student,
+            "exam": exam_name,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "pages": [{"kind": kind, "url": url, "sha256": self.put(text)} for kind, url, text in pages],
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._remember(entry)
+
+    def exams(self) -> List[str]:
+        """存档中的考试名称，最近写入的在最后"""
+        return list(self._exams)
+
+    def latest_exam(self) -> Optional[str]:
+        exams = self.exams()
+        return exams[-1] if exams else None
+
+    def lookup(self, student: str, exam_name: str) -> Optional[List[ArchivedPage]]:
+        """读回某学生某次考试的原始响应，不存在时返回 None"""
+        refs = self._index.get((student, exam_name))
+        if refs is None:
+            return None
+        return [(kind, url, self.get(digest)) for kind, url, digest in refs]
@@ -0,0 +1,268 @@
+"""
+运行指标与运行报告
+
+以前一次运行只有 `[12/50] 登录并抓取` 之类的控制台输出，慢在哪里无从得知。各环节用 stage(阶段名) 计时，
+记录在进程内的“当前运行”上（可在抓取线程间共享）：
+
+- 各阶段耗时直方图（次数/总耗时/P50/P95/最大值，以及 Prometheus 风格的累计分桶）
+- 各阶段处理的字节数（响应正文、写出的文件）
+- 事件计数：HTTP 请求、重试、5xx/连接错误、登录失败等
+- 逐个学生的结果（成功/失败/未取到成绩表、耗时、失败原因）
+
+运行结束后 finish() 打印各阶段汇总，写出 JSON 运行报告，并可写出 Prometheus 文本文件
+（node_exporter textfile collector 格式，先写临时文件再替换）。
+
+阶段名：
+- login_get / login_post / score_get: 登录页、登录提交、成绩页请求（含限速器等待与重试）
+- http_wait: 限速器取令牌与主机请求预算排队的等待时间
+- parse / table_select / coerce: 页面解析与登录判定、选取成绩表、数值转换
+- student: 单个学生从登录到取得成绩表的总耗时
+- excel_write / summary_update / json_export / db_load: 写出汇总 Excel、更新成绩汇总、生成导入 JSON、写入数据库
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+# 直方图分桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Prometheus 指标名前缀
+METRIC_PREFIX = "score_scraper"
+# 控制台汇总中各阶段的显示顺序，其余阶段按名称排在后面
+STAGE_ORDER = ["login_get", "login_post", "score_get", "http_wait", "parse", "table_select", "coerce",
+               "student", "excel_write", "summary_update", "json_export", "db_load"]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _Histogram:
+    """一个阶段的耗时样本与字节数"""
+
+    __slots__ = ("samples", "buckets", "bytes")
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.buckets = [0] * len(BUCKETS)
+        self.bytes = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        result: Dict[str, Any] = {"count": n, "total_s": round(sum(ordered), 4), "bytes": self.bytes}
+        if n:
+            result.update(
+                mean_ms=round(sum(ordered) / n * 1000, 3),
+                p50_ms=round(ordered[n // 2] * 1000, 3),
+                p95_ms=round(ordered[min(n - 1, int(n * 0.95))] * 1000, 3),
+                max_ms=round(ordered[-1] * 1000, 3),
+            )
+        # 累计分桶：le 为上界
+        cumulative, total = {}, 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            total += count
+            cumulative[str(bound)] = total
+        cumulative["+Inf"] = n
+        result["buckets"] = cumulative
+        return result
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class RunMetrics:
+    """一次运行的指标（线程安全）"""
+
+    def __init__(self, run: str = ""):
+        self.run = run
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._students: List[Dict[str, Any]] = []
+
+    def _histogram(self, stage: str) -> _Histogram:
+        hist = self._stages.get(stage)
+        if hist is None:
+            hist = self._stages[stage] = _Histogram()
+        return hist
+
+    def observe(self, stage: str, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            hist = self._histogram(stage)
+            hist.add(seconds)
+            hist.bytes += nbytes
+
+    def add_bytes(self, stage: str, nbytes: int) -> None:
+        with self._lock:
+            self._histogram(stage).bytes += nbytes
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """计时一个阶段；抛出异常时同样记录耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, event: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + n
+
+    def student(self, idx: int, name: str, outcome: str, seconds: Optional[float] = None,
+                error: Optional[str] = None) -> None:
+        """记录一名学生的结果：ok / failed / no_table"""
+        record: Dict[str, Any] = {"idx": int(idx), "name": name, "outcome": outcome}
+        if seconds is not None:
+            record["seconds"] = round(seconds, 4)
+        if error:
+            record["error"] = error
+        with self._lock:
+            self._students.append(record)
+
+    def failed_students(self) -> List[str]:
+        """本次运行中未取得成绩表的学生（failed / no_table）"""
+        with self._lock:
+            return [record["name"] for record in sorted(self._students, key=lambda s: s["idx"])
+                    if record["outcome"] != "ok"]
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: hist.summary() for name, hist in self._stages.items()}
+            counters = dict(self._counters)
+            students = sorted(self._students, key=lambda s: s["idx"])
+        outcomes: Dict[str, int] = {}
+        for record in students:
+            outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+        return {
+            "run": self.run,
+            "started": self.started.isoformat(timespec="seconds"),
+            "elapsed_s": round(time.perf_counter() - self._t0, 3),
+            "stages": stages,
+            "counters": counters,
+            "outcomes": outcomes,
+            "students": students,
+        }
+
+    def print_summary(self, report: Optional[Dict[str, Any]] = None) -> None:
+        report = report or self.report()
+        stages = report["stages"]
+        if not stages:
+            return
+        names = [s for s in STAGE_ORDER if s in stages] + sorted(s for s in stages if s not in STAGE_ORDER)
+        print(f"\n各阶段用时（本次运行共 {report['elapsed_s']:.2f}s）:")
+        print(f"  {'阶段':<16}{'次数':>8}{'总耗时(s)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'最大(ms)':>12}{'字节':>14}")
+        for name in names:
+            s = stages[name]
+            if not s["count"]:
+                continue
+            print(f"  {name:<16}{s['count']:>8}{s['total_s']:>12.3f}{s['p50_ms']:>12.2f}{s['p95_ms']:>12.2f}"
+                  f"{s['max_ms']:>12.2f}{s['bytes']:>14}")
+        if report["counters"]:
+            print("  事件: " + "，".join(f"{k} {v}" for k, v in sorted(report["counters"].items())))
+        if report["outcomes"]:
+            print("  学生: " + "，".join(f"{k} {v}" for k, v in sorted(report["outcomes"].items())))
+
+    def write_json(self, path: str, report: Optional[Dict[str, Any]] = None) -> None:
+        report = report or self.report()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def write_prometheus(self, path: str, report: Optional[Dict[str, Any]] = None) -> None:
+        """写出 Prometheus 文本格式（textfile collector 采集目录中的 .prom 文件）"""
+        report = report or self.report()
+        p = METRIC_PREFIX
+        run = _label(self.run)
+        lines = [
+            f"# HELP {p}_stage_seconds 各阶段耗时",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        for stage, s in sorted(report["stages"].items()):
+            labels = f'run="{run}",stage="{_label(stage)}"'
+            for bound, count in s["buckets"].items():
+                lines.append(f'{p}_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{p}_stage_seconds_sum{{{labels}}} {s['total_s']}")
+            lines.append(f"{p}_stage_seconds_count{{{labels}}} {s['count']}")
+        lines += [f"# HELP {p}_stage_bytes 各阶段处理的字节数", f"# TYPE {p}_stage_bytes gauge"]
+        for stage, s in sorted(report["stages"].items()):
+            lines.append(f'{p}_stage_bytes{{run="{run}",stage="{_label(stage)}"}} {s["bytes"]}')
+        lines += [f"# HELP {p}_events 事件次数（请求、重试、错误等）", f"# TYPE {p}_events gauge"]
+        for event, count in sorted(report["counters"].items()):
+            lines.append(f'{p}_events{{run="{run}",event="{_label(event)}"}} {count}')
+        lines += [f"# HELP {p}_students 各结果的学生数", f"# TYPE {p}_students gauge"]
+        for outcome, count in sorted(report["outcomes"].items()):
+            lines.append(f'{p}_students{{run="{run}",outcome="{_label(outcome)}"}} {count}')
+        lines += [
+            f"# HELP {p}_run_seconds 本次运行总耗时",
+            f"# TYPE {p}_run_seconds gauge",
+            f'{p}_run_seconds{{run="{run}"}} {report["elapsed_s"]}',
+            f"# HELP {p}_run_timestamp_seconds 本次运行开始时间",
+            f"# TYPE {p}_run_timestamp_seconds gauge",
+            f'{p}_run_timestamp_seconds{{run="{run}"}} {self.started.timestamp():.0f}',
+        ]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+    def finish(self, report_path: Optional[str], prometheus_path: Optional[str] = None) -> Dict[str, Any]:
+        """打印各阶段汇总并写出运行报告（没有记录任何指标时不写出），返回报告内容"""
+        report = self.report()
+        if not (report["stages"] or report["counters"] or report["students"]):
+            return report
+        self.print_summary(report)
+        for path, write in ((report_path, self.write_json), (prometheus_path, self.write_prometheus)):
+            if not path:
+                continue
+            try:
+                write(path, report)
+                print(f"  · 运行报告已写出: {path}")
+            except OSError as e:
+                print(f"  ⚠ 写出运行报告失败: {path}（{e}）")
+        return report
+
+
+# 进程内的当前运行；begin_run 开始新的一次
+_current = RunMetrics()
+
+
+def current() -> RunMetrics:
+    return _current
+
+
+def begin_run(run: str) -> RunMetrics:
+    """开始新的一次运行（此前的指标不再累计），返回其指标"""
+    global _current
+    _current = RunMetrics(run)
+    return _current
+
+
+def stage(name: str) -> Any:
+    """在当前运行上计时一个阶段: with stage("login_get"): ..."""
+    return _current.stage(name)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """装饰器：每次调用计入当前运行的 name 阶段"""
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _current.stage(name):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorate
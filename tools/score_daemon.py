@@ -0,0 +1,271 @@
+"""
+常驻进程 (本机 HTTP)
+
+每次运行抓取脚本都要付出解释器启动、导入 pandas 等依赖、新建 TCP 连接、从磁盘读回考试文件的开销。
+常驻进程启动时一次性加载依赖，之后在本机端口上接受任务，任务之间保持：
+
+- 已加载的模块与登录表单结构缓存
+- 到成绩服务器的连接池与自适应限速器学到的速率
+- 已解析考试文件的内存缓存（exam_cache，文件变化时自动失效）
+
+协议：POST /<任务名>，请求体为 JSON 参数对象；返回 {"ok", "result", "error", "output", "seconds"}，
+output 为任务运行期间的控制台输出。GET /status 返回进程状态与可用任务。任务逐个执行，
+执行期间仍可查询状态。只监听 127.0.0.1。
+
+本机网页也能向 127.0.0.1 发请求，因此 POST 须带 Content-Type: application/json（浏览器跨站发送时
+需先预检，常驻进程不应答预检）与令牌头 X-Score-Token。令牌在启动时随机生成，写入仅本用户可读的
+~/.score_daemon_<端口>.token，退出时删除；客户端自动读取。任务中的考试、汇总与数据库路径
+由抓取脚本用 check_within 限制在各自目录内。
+
+任务由抓取脚本注册（--serve 启动），本文件同时是客户端:
+    python score_daemon.py status
+    python score_daemon.py export exam=2025年12月月考 delta=true
+    python score_daemon.py summary exam=2025年12月月考 student=张三 student=李四=../汇总_李四.xlsx overwrite=true
+参数写作 键=值，值按 JSON 解析（true / 数字等），否则为字符串；同一键重复出现时为列表。
+"""
+import argparse
+import hmac
+import http.client
+import importlib
+import io
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-Score-Token"
+
+# 任务: 参数 -> 可 JSON 序列化的结果
+Job = Callable[[Dict[str, Any]], Any]
+
+
+def token_path(port: int) -> str:
+    """常驻进程令牌文件（每个端口一个）"""
+    return os.path.join(os.path.expanduser("~"), f".score_daemon_{port}.token")
+
+
+def read_token(port: int) -> Optional[str]:
+    try:
+        with open(token_path(port), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def check_within(base: str, path: str, what: str) -> str:
+    """path 须位于 base 目录内（解析 .. 与符号链接后判断），否则 ValueError；原样返回 path"""
+    root = os.path.realpath(base)
+    target = os.path.realpath(path)
+    if target == root or os.path.commonpath([root, target]) != root:
+        raise ValueError(f"{what}不在 {base} 目录内: {path}")
+    return path
+
+
+def _json_default(value: Any) -> Any:
+    """numpy 标量等转为 Python 原生类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class _Tee(io.TextIOBase):
+    """同时写入常驻进程自己的控制台与本次任务的输出缓冲（抓取线程的输出也会被收集）"""
+
+    def __init__(self, console: Any):
+        self.console = console
+        self.buffer = io.StringIO()
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self.buffer.write(text)
+            self.console.write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self.console.flush()
+
+
+class ScoreDaemon:
+    """在本机端口上逐个执行抓取脚本注册的任务"""
+
+    def __init__(self, jobs: Dict[str, Job], *, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 preload: Iterable[str] = (), token_file: Optional[str] = None):
+        self.jobs = dict(jobs)
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.served = 0
+        self.failed = 0
+        self.current: Optional[str] = None
+        self._lock = threading.Lock()
+        preload = tuple(preload)
+        t0 = time.perf_counter()
+        for name in preload:
+            importlib.import_module(name)
+        print(f"  · 已预先加载 {len(preload)} 个模块（{time.perf_counter() - t0:.2f}s）")
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.token = secrets.token_urlsafe(32)
+        self.token_file = token_file or token_path(self.server.server_address[1])
+        fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.token)
+
+    def status(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "started": self.started, "served": self.served, "failed": self.failed,
+                "running": self.current, "jobs": sorted(self.jobs)}
+
+    def run(self, name: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """执行一个任务，返回 (HTTP 状态码, 响应)；同一时间只执行一个任务"""
+        job = self.jobs.get(name)
+        if job is None:
+            return 404, {"ok": False, "error": f"未知任务: {name}（可用: {'、'.join(sorted(self.jobs))}）"}
+        with self._lock:
+            self.current = name
+            tee = _Tee(sys.stdout)
+            t0 = time.perf_counter()
+            # 参数中可能有密码，日志只记参数名
+            print(f"\n[{datetime.now():%H:%M:%S}] 任务 {name}（参数: {', '.join(params) or '无'}）")
+            try:
+                with redirect_stdout(tee):
+                    result = job(params)
+                response = {"ok": True, "result": result}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                print(f"  ❌ 任务 {name} 失败: {e}")
+            finally:
+                self.current = None
+            seconds = time.perf_counter() - t0
+            self.served += 1
+            self.failed += 0 if response["ok"] else 1
+        response.update(output=tee.buffer.getvalue(), seconds=round(seconds, 3))
+        return 200, response
+
+    def _handler_class(self) -> type:
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body, ensure_ascii=False, default=_json_default).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                if self.path.strip("/") in ("", "status"):
+                    self._reply(200, {"ok": True, "result": daemon.status()})
+                else:
+                    self._reply(404, {"ok": False, "error": f"未知路径: {self.path}"})
+
+            def do_POST(self) -> None:
+                content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+                if content_type != "application/json":
+                    self._reply(415, {"ok": False, "error": "请求须为 Content-Type: application/json"})
+                    return
+                if not hmac.compare_digest(self.headers.get(TOKEN_HEADER) or "", daemon.token):
+                    self._reply(403, {"ok": False, "error": f"令牌无效（见 {daemon.token_file}）"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    params = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+                    if not isinstance(params, dict):
+                        raise ValueError("参数须为 JSON 对象")
+                except ValueError as e:
+                    self._reply(400, {"ok": False, "error": f"参数无效: {e}"})
+                    return
+                self._reply(*daemon.run(self.path.strip("/"), params))
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        host, port = self.server.server_address[:2]
+        print(f"✅ 常驻进程已启动: http://{host}:{port}（任务: {'、'.join(sorted(self.jobs))}；Ctrl-C 退出）")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n常驻进程退出。")
+        finally:
+            self.server.server_close()
+            try:
+                os.remove(self.token_file)
+            except OSError:
+                pass
+
+
+def send_job(job: str, params: Optional[Dict[str, Any]] = None, *, host: str = DEFAULT_HOST,
+             port: int = DEFAULT_PORT, timeout: Optional[float] = None,
+             token: Optional[str] = None) -> Dict[str, Any]:
+    """向常驻进程提交任务并等待完成；job 为 status 时查询状态；未给出 token 时读取令牌文件"""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if job == "status":
+            conn.request("GET", "/status")
+        else:
+            body = json.dumps(params or {}, ensure_ascii=False).encode("utf-8")
+            headers = {"Content-Type": "application/json", TOKEN_HEADER: token or read_token(port) or ""}
+            conn.request("POST", f"/{job}", body=body, headers=headers)
+        return json.loads(conn.getresponse().read().decode("utf-8"))
+    finally:
+        conn.close()
+
+
+def parse_params(items: List[str]) -> Dict[str, Any]:
+    """键=值 列表转为参数对象"""
+    params: Dict[str, Any] = {}
+    for item in items:
+        key, sep, text = item.partition("=")
+        if not sep:
+            raise ValueError(f"参数应写作 键=值: {item}")
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = text
+        if key in params:
+            existing = params[key]
+            params[key] = (existing if isinstance(existing, list) else [existing]) + [value]
+        else:
+            params[key] = value
+    return params
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="向常驻进程提交任务（常驻进程由抓取脚本 --serve 启动）")
+    parser.add_argument("job", help="任务名，如 status / scrape / scrape_student / export / summary / exams")
+    parser.add_argument("params", nargs="*", metavar="键=值", help="任务参数")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="常驻进程端口 (默认 %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        params = parse_params(args.params)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        response = send_job(args.job, params, port=args.port)
+    except OSError as e:
+        print(f"❌ 无法连接常驻进程 {DEFAULT_HOST}:{args.port}（{e}），请先用抓取脚本 --serve 启动")
+        sys.exit(2)
+    if response.get("output"):
+        print(response["output"], end="")
+    if response.get("ok"):
+        print(json.dumps(response.get("result"), ensure_ascii=False, indent=2))
+        if "seconds" in response:
+            print(f"（任务用时 {response['seconds']:.2f}s）")
+    else:
+        print(f"❌ {response.get('error')}")
+    sys.exit(0 if response.get("ok") else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+列式成绩累加器
+
+第一个成功页面的表头确定列结构（“姓名”列固定放在首列），之后每名学生的成绩行按缓存的列映射
+直接写入预分配的 numpy 列数组，不再为每名学生构造 DataFrame；全部完成后一次性生成 DataFrame。
+页面表头与已锁定的列结构不一致时打印列结构变化：新增列追加到末尾，缺少的列留空。
+buffer=False 时只锁定列结构、对齐成绩行，不保留数据（只流式写出、不生成汇总表时内存与人数无关）。
+"""
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+NAME_COLUMN = "姓名"
+
+
+class ScoreTable:
+    """按名单序号累加成绩行的列式缓冲区"""
+
+    def __init__(self, capacity: int = 64, *, buffer: bool = True, log: Callable[[str], None] = print):
+        self.buffer = buffer
+        self._capacity = max(1, int(capacity)) if buffer else 0
+        self._size = 0
+        self._columns: List[str] = []
+        self._data: List[np.ndarray] = []
+        self._order = np.empty(self._capacity, dtype=np.int64) if buffer else None
+        # 页面表头 -> 各锁定列在页面行中的位置（-1 表示页面缺少该列）
+        self._layouts: Dict[Tuple[str, ...], List[int]] = {}
+        self.drift: List[Dict[str, Any]] = []
+        self.log = log
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _add_column(self, column: str) -> None:
+        self._columns.append(column)
+        if self.buffer:
+            self._data.append(np.full(self._capacity, None, dtype=object))
+        for layout in self._layouts.values():
+            layout.append(-1)
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        for i, values in enumerate(self._data):
+            grown = np.full(capacity, None, dtype=object)
+            grown[:self._size] = values[:self._size]
+            self._data[i] = grown
+        order = np.empty(capacity, dtype=np.int64)
+        order[:self._size] = self._order[:self._size]
+        self._order = order
+        self._capacity = capacity
+
+    def _layout(self, header: Tuple[str, ...], name: str) -> List[int]:
+        layout = self._layouts.get(header)
+        if layout is not None:
+            return layout
+        page_columns = list(header)
+        if not self._columns:
+            # 首个成功页面锁定列结构；“姓名”列移到首列，与原先逐个学生 ensure_output_columns 后再合并的列顺序一致
+            self._add_column(NAME_COLUMN)
+            for col in page_columns:
+                if col != NAME_COLUMN:
+                    self._add_column(col)
+        else:
+            missing = [c for c in self._columns if c != NAME_COLUMN and c not in page_columns]
+            added = [c for c in page_columns if c != NAME_COLUMN and c not in self._columns]
+            if missing or added:
+                self.drift.append({"name": name, "added": added, "missing": missing})
+                self.log(f"  ⚠ 列结构变化（{name}）：新增列 {added or '无'}，缺少列 {missing or '无'}")
+                for col in added:
+                    self._add_column(col)
+        positions = {col: i for i, col in enumerate(page_columns)}
+        layout = [positions.get(col, -1) for col in self._columns]
+        self._layouts[header] = layout
+        return layout
+
+    def add(self, idx: int, name: str, columns: Sequence[Any], rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+        """追加一名学生的成绩行，姓名列统一写为 name；返回按锁定列顺序排列的行"""
+        header = tuple(str(c) for c in columns)
+        layout = self._layout(header, name)
+        if self.buffer:
+            self._grow(self._size + len(rows))
+        out = []
+        for row in rows:
+            values = [name if j == 0 else (row[pos] if pos >= 0 else None) for j, pos in enumerate(layout)]
+            out.append(values)
+            if not self.buffer:
+                self._size += 1
+                continue
+            for column, value in zip(self._data, values):
+                column[self._size] = value
+            self._order[self._size] = idx
+            self._size += 1
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        """按名单顺序生成汇总 DataFrame（同一学生的多行保持原有顺序）"""
+        if not self.buffer:
+            raise RuntimeError("ScoreTable(buffer=False) 不保留成绩行，无法生成汇总表")
+        order = np.argsort(self._order[:self._size], kind="stable")
+        return pd.DataFrame({col: values[:self._size][order] for col, values in zip(self._columns, self._data)},
+                            columns=self._columns)
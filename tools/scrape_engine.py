@@ -0,0 +1,188 @@
+"""
+异步并发抓取引擎
+
+- 使用 asyncio + 线程池在有界并发下同时抓取多名学生（每名学生独立 Session，Cookie 互不干扰）
+- 所有 Session 共享同一个连接池，复用到成绩服务器的 TCP 连接
+- HostBudget 限制对同一主机同时在途的请求数，避免把学校服务器压垮
+- 可选的 AdaptiveRateLimiter 按服务器健康状况自适应调整请求速率，超时/5xx 时回退并重试
+- 结果按名单顺序回调交付，保证输出的"汇总"表与逐个抓取时完全一致
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import run_metrics
+from rate_limiter import AdaptiveRateLimiter
+
+# 默认同时抓取的学生数
+DEFAULT_CONCURRENCY = 8
+# 默认对同一主机同时在途的请求数
+DEFAULT_HOST_BUDGET = 4
+# 默认超时/5xx 时的重试次数
+DEFAULT_RETRIES = 2
+
+
+class HostBudget:
+    """按主机限制同时在途的HTTP请求数（跨线程共享）"""
+
+    def __init__(self, per_host: int = DEFAULT_HOST_BUDGET):
+        self.per_host = max(1, int(per_host))
+        self._lock = threading.Lock()
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._sems[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        sem = self._semaphore(url)
+        sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
+
+
+class BudgetedSession(requests.Session):
+    """每次请求前向 HostBudget 申请名额的 Session，重定向链算作同一次请求。
+
+    设置了 limiter 时，请求前先取令牌，请求后上报耗时与状态码；
+    超时、连接错误或 5xx 时最多重试 retries 次。
+    请求数、重试与错误次数、取令牌与排队的等待时间计入当前运行指标（run_metrics）。
+    """
+
+    def __init__(self, budget: HostBudget, adapter: Optional[HTTPAdapter] = None, *,
+                 limiter: Optional[AdaptiveRateLimiter] = None, retries: int = DEFAULT_RETRIES):
+        super().__init__()
+        self.budget = budget
+        self.limiter = limiter
+        self.retries = max(0, int(retries))
+        self._shared_adapter = adapter is not None
+        if adapter is not None:
+            self.mount("http://", adapter)
+            self.mount("https://", adapter)
+
+    def close(self) -> None:
+        # 共享连接池由引擎统一关闭，这里只清理本会话状态
+        if self._shared_adapter:
+            self.cookies.clear()
+            return
+        super().close()
+
+    def request(self, method, url, *args, **kwargs):  # type: ignore[override]
+        metrics = run_metrics.current()
+        attempt = 0
+        while True:
+            waiting = time.monotonic()
+            if self.limiter is not None:
+                self.limiter.acquire()
+            with self.budget.slot(url):
+                start = time.monotonic()
+                metrics.observe("http_wait", start - waiting)
+                metrics.count("http_requests")
+                try:
+                    resp = super().request(method, url, *args, **kwargs)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    metrics.count("http_timeouts" if isinstance(e, requests.Timeout) else "http_connection_errors")
+                    if self.limiter is not None:
+                        self.limiter.record(time.monotonic() - start, error=e)
+                    if attempt >= self.retries:
+                        raise
+                    attempt += 1
+                    metrics.count("http_retries")
+                    continue
+                latency = time.monotonic() - start
+            if self.limiter is not None:
+                self.limiter.record(latency, status=resp.status_code)
+            if resp.status_code >= 500:
+                metrics.count("http_5xx")
+                if attempt < self.retries:
+                    resp.close()
+                    attempt += 1
+                    metrics.count("http_retries")
+                    continue
+            return resp
+
+
+# 单个任务: (名单序号, 任务数据)；worker 返回任意结果，异常会被捕获后交给回调
+Job = Tuple[int, Any]
+Worker = Callable[[requests.Session, int, Any], Any]
+ResultCallback = Callable[[int, Any, Any, Optional[BaseException]], None]
+
+
+async def _run_jobs(jobs: Sequence[Job], worker: Worker, on_result: ResultCallback,
+                    concurrency: int, budget: HostBudget, adapter: HTTPAdapter,
+                    limiter: Optional[AdaptiveRateLimiter], retries: int) -> None:
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+
+    def run_one(idx: int, payload: Any) -> Tuple[Any, Optional[BaseException]]:
+        with BudgetedSession(budget, adapter, limiter=limiter, retries=retries) as sess:
+            try:
+                return worker(sess, idx, payload), None
+            except Exception as e:
+                return None, e
+
+    async def guarded(pos: int, executor: ThreadPoolExecutor) -> Tuple[int, Any, Optional[BaseException]]:
+        idx, payload = jobs[pos]
+        async with sem:
+            result, error = await loop.run_in_executor(executor, run_one, idx, payload)
+            return pos, result, error
+
+    # 按名单顺序交付：先完成的结果暂存，等前面的都到齐再回调
+    pending: Dict[int, Tuple[Any, Optional[BaseException]]] = {}
+    next_pos = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape") as executor:
+        tasks = [asyncio.ensure_future(guarded(pos, executor)) for pos in range(len(jobs))]
+        for fut in asyncio.as_completed(tasks):
+            pos, result, error = await fut
+            pending[pos] = (result, error)
+            while next_pos in pending:
+                result, error = pending.pop(next_pos)
+                idx, payload = jobs[next_pos]
+                on_result(idx, payload, result, error)
+                next_pos += 1
+
+
+def run_scrape_jobs(jobs: List[Job], worker: Worker, on_result: ResultCallback, *,
+                    concurrency: int = DEFAULT_CONCURRENCY, host_budget: int = DEFAULT_HOST_BUDGET,
+                    limiter: Optional[AdaptiveRateLimiter] = None, retries: int = DEFAULT_RETRIES,
+                    adapter: Optional[HTTPAdapter] = None) -> None:
+    """并发执行抓取任务。
+
+    - jobs: [(名单序号, 任务数据)]，按名单顺序排列
+    - worker(session, 名单序号, 任务数据): 在线程中执行，使用独立 Session 登录抓取
+    - on_result(名单序号, 任务数据, 结果, 异常): 在主线程中按名单顺序回调
+    - concurrency: 同时抓取的学生数
+    - host_budget: 对同一主机同时在途的请求数
+    - limiter: 自适应限速器，为 None 时不限速
+    - retries: 超时/5xx 时单个请求的重试次数
+    - adapter: 调用方持有的连接池（常驻进程中跨多次抓取复用），为 None 时新建并在结束后关闭
+    """
+    if not jobs:
+        return
+    concurrency = max(1, int(concurrency))
+    budget = HostBudget(host_budget)
+    owned = adapter is None
+    if owned:
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(concurrency, budget.per_host))
+    try:
+        asyncio.run(_run_jobs(jobs, worker, on_result, concurrency, budget, adapter, limiter, retries))
+    finally:
+        if owned:
+            adapter.close()
+        if limiter is not None:
+            print(f"  · 限速统计: 最终速率 {limiter.rate:.1f} 次/秒, 回退事件 {limiter.backoffs} 次")
@@ -0,0 +1,145 @@
+"""
+抓取进度日志 (JSONL)
+
+每名学生抓取并整理完成后立即追加一行记录并落盘（flush + fsync），
+程序崩溃、Ctrl-C 或断网后可用 --resume 跳过已完成的学生，最终汇总表从日志重建。
+进程中途被杀时最后一行可能不完整，读取时自动忽略。
+内存中只保存每条记录的名单序号与文件偏移，成绩行按需从磁盘读回，内存占用与人数无关。
+"""
+import json
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def _json_default(value: Any) -> Any:
+    """numpy 标量等转为 Python 原生类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _clean_value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    import pandas as pd
+
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _scan(path: str) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    """逐条产出日志中的完整记录 (记录, 起始偏移, 结束偏移)，遇到写了一半的行即停止"""
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.endswith(b"\n"):
+                # 崩溃时写了一半的行
+                break
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                break
+            yield record, start, offset
+
+
+def journal_progress(path: str) -> Tuple[int, Optional[str]]:
+    """只读统计日志中已完成的学生数与考试名称；不截断、不追加，抓取进行中也可调用"""
+    keys = set()
+    exam_name: Optional[Tuple[int, str]] = None
+    for record, _, _ in _scan(path):
+        if record.get("type") != "student":
+            continue
+        keys.add(record["key"])
+        idx = int(record["idx"])
+        if record.get("exam_name") and (exam_name is None or idx < exam_name[0]):
+            exam_name = (idx, record["exam_name"])
+    return len(keys), exam_name[1] if exam_name else None
+
+
+class ScrapeJournal:
+    """抓取进度日志：按登录账号记录每名学生整理后的成绩行"""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        # 登录账号 -> (名单序号, 记录在文件中的偏移)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._exam_name: Optional[Tuple[int, str]] = None
+        self._valid_end = 0
+        if resume and os.path.exists(path):
+            self._load()
+            # 丢弃崩溃时写了一半的最后一行，从最后一条完整记录之后继续追加
+            self._fh = open(path, "r+b")
+            self._fh.truncate(self._valid_end)
+            self._fh.seek(self._valid_end)
+        else:
+            if os.path.exists(path):
+                print(f"  → 未指定 --resume，清空旧的抓取进度: {path}")
+            self._fh = open(path, "wb")
+        if self._valid_end == 0:
+            self._write({"type": "header", "created": datetime.now().isoformat(timespec="seconds")})
+        self._reader = open(path, "rb")
+
+    def _load(self) -> None:
+        for record, start, end in _scan(self.path):
+            self._valid_end = end
+            if record.get("type") == "student":
+                self._remember(record, start)
+
+    def _remember(self, record: Dict[str, Any], offset: int) -> None:
+        idx = int(record["idx"])
+        self._index[record["key"]] = (idx, offset)
+        if record.get("exam_name") and (self._exam_name is None or idx < self._exam_name[0]):
+            self._exam_name = (idx, record["exam_name"])
+
+    def _write(self, record: Dict[str, Any]) -> int:
+        offset = self._fh.tell()
+        line = json.dumps(record, ensure_ascii=False, default=_json_default) + "\n"
+        self._fh.write(line.encode("utf-8"))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        return offset
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def exam_name(self) -> Optional[str]:
+        return self._exam_name[1] if self._exam_name else None
+
+    def append(self, key: str, idx: int, name: str, columns: List[str], rows: List[List[Any]],
+               exam_name: Optional[str]) -> Dict[str, Any]:
+        """记录一名学生整理后的成绩行，返回写入的记录"""
+        record = {
+            "type": "student",
+            "key": key,
+            "idx": int(idx),
+            "name": name,
+            "exam_name": exam_name,
+            "columns": [str(c) for c in columns],
+            "rows": [[_clean_value(v) for v in row] for row in rows],
+        }
+        offset = self._write(record)
+        self._remember(record, offset)
+        return record
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """按名单顺序逐条从磁盘读回记录"""
+        for idx, offset in sorted(self._index.values()):
+            self._reader.seek(offset)
+            yield json.loads(self._reader.readline().decode("utf-8"))
+
+    def close(self) -> None:
+        self._fh.close()
+        self._reader.close()
@@ -1,16 +1,36 @@
+from __future__ import annotations
+
+import argparse
 import os
+import re
 import sys
-import time
 import shutil
-import json
+import time
 from datetime import datetime
 from io import StringIO
-from typing import List, Dict, Any, Optional, Tuple
-
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from openpyxl import load_workbook
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Any, Optional, Tuple
+
+from lazy_import import lazy_module, load_now
+
+# pandas / requests 首次使用时才加载：列出考试、查看进度、菜单中直接退出都不必等待导入。
+# 导入时就会加载它们的模块（考试文件缓存、导入 JSON、流水线、抓取引擎、限速器等）在用到的函数内导入。
+pd = lazy_module("pandas")
+requests = lazy_module("requests")
+
+from exam_library import ExamLibrary, describe_entry, list_exams
+from import_delta import delta_filter, deletions_allowed, manifest_path
+from login_cache import LoginForm, LoginFormCache
+from page_snapshot import Page, PageSnapshot
+from response_archive import ArchivedPage, ResponseArchive
+from run_metrics import begin_run, current, stage, timed
+from scrape_journal import ScrapeJournal, journal_progress
+from stream_writer import STREAM_FORMATS, RowStreamWriter, write_excel_rows
+from summary_workbook import SummaryWorkbook, batch_update_summaries, parse_student
+from work_queue import WorkQueue, dedupe_roster
+
+if TYPE_CHECKING:
+    from requests.adapters import HTTPAdapter
+    from rate_limiter import AdaptiveRateLimiter
 
 # ----------------------------
 # 可配置参数
@@ -19,6 +39,17 @@ LOGIN_URL = "http://121.229.61.27:8001/xs/cjcx/index.asp"
 INPUT_EXCEL = "19班 50人1.xlsx"
 SHEET_USERS = "Sheet1"
 OUTPUT_EXCEL = "汇总成绩.xlsx"
+# 抓取进度日志：每名学生完成后立即追加，崩溃后可用 --resume 续抓
+JOURNAL_FILE = "抓取进度.jsonl"
+# 分片抓取工作队列（SQLite）：多个进程/多台机器共享同一队列文件领取分片，--merge 合并为汇总表
+QUEUE_FILE = "抓取队列.db"
+# 每个分片的学生数
+SHARD_SIZE = 20
+# 流式输出：每名学生整理完成后立即追加一行，格式可选 csv / jsonl / parquet
+STREAM_FORMAT = "csv"
+STREAM_OUTPUT_BASENAME = "汇总成绩"
+# 原始响应存档目录：按学生与考试保存登录后页面与成绩页，可用 --replay 离线重跑解析
+ARCHIVE_DIR = "原始响应存档"
 TIMEOUT = 20
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -38,19 +69,45 @@ FORM_FIELD_NAMES = {
 # 是否需要在控制台手动输入验证码。若站点强制验证码，设为 True
 PROMPT_CAPTCHA = False
 
+# 同时抓取的学生数（并发登录会话数）
+SCRAPE_CONCURRENCY = 8
+# 对成绩服务器同时在途的请求数上限
+HOST_REQUEST_BUDGET = 4
+
+# 自适应限速：初始/最低/最高请求速率（次/秒）。服务器响应健康时逐步提速，超时/5xx/慢响应时立即减半
+RATE_INITIAL = 2.0
+RATE_MIN = 0.5
+RATE_MAX = 20.0
+# 响应耗时超过该秒数视为慢响应，触发降速
+SLOW_RESPONSE_SECONDS = 3.0
+# 超时/5xx 时单个请求的重试次数
+REQUEST_RETRIES = 2
+
+# 登录表单结构缓存：首次获取登录页后直接POST登录；登录失败或每隔N名学生重新获取登录页校验
+LOGIN_FORM_REVALIDATE_EVERY = 100
+
 # 成绩汇总文件路径
 SUMMARY_EXCEL = os.path.join("..", "成绩汇总.xlsx")
 
 # 历次成绩目录
 EXAMS_DIR = os.path.join("..", "历次成绩")
 
+# 导入 JSON 是否输出紧凑格式（不缩进，文件更小、写出更快）
+JSON_COMPACT = False
+
 # 需要提取成绩的学生姓名
 TARGET_STUDENT_NAME = "陈泓宇"
 
+# 运行报告：各阶段耗时直方图、字节数、重试次数与逐个学生的结果（JSON），--prometheus 可另写出 Prometheus 文本文件
+RUN_REPORT_FILE = "运行报告.json"
+
+# 常驻进程（--serve）监听的本机端口，任务由 score_daemon.py 提交
+DAEMON_PORT = 8765
 
-def extract_exam_name_from_page(html: str) -> Optional[str]:
+
+def extract_exam_name_from_page(page: Page) -> Optional[str]:
     """从登录后的页面中提取考试名称,不依赖正则表达式"""
-    soup = BeautifulSoup(html, 'lxml')
+    soup = PageSnapshot.of(page).soup
 
     # 方法: 从body开头文本提取
     # 通常考试名称在"返回首页"链接之前
@@ -117,19 +174,14 @@ def show_menu() -> str:
 
 
 def select_exam_file() -> Optional[str]:
-    """列出历次成绩目录的xlsx文件供用户选择"""
-    xlsx_files = []
-
-    # 扫描历次成绩目录的xlsx文件
+    """按考试库清单列出历次成绩目录的考试文件供用户选择"""
+    # 扫描历次成绩目录的xlsx文件（清单只重新读取新增或变化的文件）
     if not os.path.exists(EXAMS_DIR):
         print(f"错误: 历次成绩目录不存在: {EXAMS_DIR}")
         return None
 
-    for filename in os.listdir(EXAMS_DIR):
-        if filename.endswith('.xlsx') and not filename.startswith('~$'):
-            filepath = os.path.join(EXAMS_DIR, filename)
-            if os.path.isfile(filepath):
-                xlsx_files.append((filename, filepath))
+    entries = ExamLibrary(EXAMS_DIR).refresh().entries()
+    xlsx_files = [(entry["file"], entry["path"]) for entry in entries]
 
     if not xlsx_files:
         print("未找到可用的考试文件!")
@@ -137,8 +189,8 @@ def select_exam_file() -> Optional[str]:
 
     print("\n可用的考试文件:")
     print("="*60)
-    for idx, (filename, _) in enumerate(xlsx_files, 1):
-        print(f"[{idx}] {filename}")
+    for idx, entry in enumerate(entries, 1):
+        print(f"[{idx}] {entry['file']}  ({describe_entry(entry)})")
     print("="*60)
 
     while True:
@@ -160,16 +212,6 @@ def select_exam_file() -> Optional[str]:
             return None
 
 
-def check_exam_exists(summary_path: str, exam_name: str) -> bool:
-    """检查成绩汇总文件中是否已存在该考试"""
-    try:
-        df = pd.read_excel(summary_path, sheet_name="考试详情")
-        return exam_name in df.columns
-    except Exception as e:
-        print(f"读取成绩汇总文件失败: {e}")
-        return False
-
-
 def ask_overwrite(exam_name: str) -> bool:
     """询问用户是否覆盖已存在的考试成绩"""
     print(f"\n警告: 成绩汇总中已存在考试【{exam_name}】!")
@@ -188,8 +230,10 @@ def ask_overwrite(exam_name: str) -> bool:
 
 def extract_student_scores(excel_path: str, student_name: str) -> Optional[pd.Series]:
     """从考试文件中提取指定学生的成绩"""
+    from exam_cache import read_exam_sheet
+
     try:
-        df = pd.read_excel(excel_path, sheet_name="汇总")
+        df = read_exam_sheet(excel_path)
 
         # 清理列名: 移除制表符、空格等,并统一字符(其他->其它)
         df.columns = [str(col).strip().replace('\t', '').replace(' ', '').replace('其他', '其它') for col in df.columns]
@@ -210,92 +254,14 @@ def extract_student_scores(excel_path: str, student_name: str) -> Optional[pd.Se
         return None
 
 
-def update_summary_with_scores(summary_path: str, exam_name: str, student_scores: pd.Series, overwrite: bool = False) -> bool:
-    """将学生成绩更新到成绩汇总文件 - 只修改单元格值,保留格式"""
-    try:
-        # 使用openpyxl打开,保留所有格式
-        wb = load_workbook(summary_path)
-        ws = wb["考试详情"]
-
-        # 读取第一列(指标名称)建立映射
-        indicator_to_row = {}
-        for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_row=ws.max_row, values_only=False), start=2):
-            indicator_cell = row[0]  # 第一列是指标名称
-            if indicator_cell.value:
-                indicator = str(indicator_cell.value).strip().replace('\t', '').replace(' ', '').replace('其他', '其它')
-                indicator_to_row[indicator] = row_idx
-
-        # 查找或创建考试列
-        exam_col = None
-        for col_idx, cell in enumerate(ws[1], start=1):  # 第一行是列名
-            if cell.value == str(exam_name):
-                exam_col = col_idx
-                break
-
-        if exam_col is None:
-            # 找到最后一列,在其后添加新列
-            exam_col = ws.max_column + 1
-
-            # 复制前一列的格式到新列
-            from copy import copy
-            prev_col = exam_col - 1
-            for row_idx in range(1, ws.max_row + 1):
-                source_cell = ws.cell(row=row_idx, column=prev_col)
-                target_cell = ws.cell(row=row_idx, column=exam_col)
-
-                # 复制格式(不包括值)
-                if source_cell.has_style:
-                    target_cell.font = copy(source_cell.font)
-                    target_cell.border = copy(source_cell.border)
-                    target_cell.fill = copy(source_cell.fill)
-                    target_cell.number_format = source_cell.number_format
-                    target_cell.protection = copy(source_cell.protection)
-                    target_cell.alignment = copy(source_cell.alignment)
-
-            # 设置第一行(列名)的值
-            ws.cell(row=1, column=exam_col, value=exam_name)
-            print(f"  → 创建新列: 第{exam_col}列(已复制格式)")
-        else:
-            if not overwrite:
-                print(f"  → 考试已存在,跳过")
-                return False
-            print(f"  → 覆盖现有列: 第{exam_col}列")
-
-        # 填充数据
-        matched_count = 0
-        for indicator, value in student_scores.items():
-            indicator_clean = str(indicator).strip().replace('\t', '').replace(' ', '').replace('其他', '其它')
-
-            if indicator_clean in indicator_to_row:
-                row_idx = indicator_to_row[indicator_clean]
-                ws.cell(row=row_idx, column=exam_col, value=value)
-                matched_count += 1
+def stream_output_path(fmt: str) -> str:
+    """流式输出文件路径"""
+    return f"{STREAM_OUTPUT_BASENAME}.{fmt}"
 
-        print(f"  → 匹配了 {matched_count} 个指标")
-
-        # 保存文件
-        wb.save(summary_path)
-
-        print(f"✅ 已成功更新成绩汇总: {exam_name}")
-        return True
-
-    except Exception as e:
-        print(f"更新成绩汇总失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-
-def scrape_scores_with_exam_name() -> Tuple[bool, Optional[str]]:
-    """执行抓取流程,返回(是否成功, 考试名称)"""
-    output_excel = OUTPUT_EXCEL
-    users_df = read_users_from_excel(INPUT_EXCEL, SHEET_USERS)
-    template_df: Optional[pd.DataFrame] = None
-    all_rows: List[pd.DataFrame] = []
-    debug_dir = None
-    exam_name = None
-    count = 0
 
+def roster_jobs(users_df: pd.DataFrame) -> List[Tuple[int, Tuple[str, str, str]]]:
+    """由名单整理抓取任务: [(名单序号, (姓名, 登录账号, 密码))]，缺少姓名或密码的行跳过"""
+    jobs = []
     for idx, row in users_df.iterrows():
         username_value = None
         candidate_cols = ["姓名", "学号", "账号", "考籍号", "准考证号", "用户名"]
@@ -309,93 +275,187 @@ def scrape_scores_with_exam_name() -> Tuple[bool, Optional[str]]:
 
         if not name or not pwd:
             continue
+        jobs.append((idx, (name, username_value or name, pwd)))
+    return jobs
+
+
+def scrape_scores_with_exam_name(resume: bool = False, stream_format: str = STREAM_FORMAT,
+                                 write_excel: bool = True, archive: bool = True,
+                                 replay: Optional[str] = None,
+                                 on_rows: Optional[Callable[[Optional[str], List[str], List[List[Any]]], None]] = None,
+                                 adapter: Optional[HTTPAdapter] = None,
+                                 limiter: Optional[AdaptiveRateLimiter] = None) -> Tuple[bool, Optional[str]]:
+    """执行抓取流程,返回(是否成功, 考试名称)
+
+    每名学生整理完成后立即写入抓取进度日志，并把原始单元格文本追加到流式输出文件；
+    resume=True 时跳过日志中已完成的学生。成绩行按首位学生锁定的列结构追加到列式汇总表，
+    write_excel=True 时最后一次性生成汇总表，对全班统一做数值转换后写出 Excel。
+    archive=True 时把每名学生的原始响应存入 ARCHIVE_DIR；replay 不为 None 时不访问网络，
+    从存档中取该考试（空字符串表示最近一次考试）的原始页面重跑解析。
+    on_rows(考试名称, 列名, 成绩行) 在每名学生整理完成后立即调用（流水线模式由此交付下游阶段）。
+    adapter / limiter 为常驻进程跨多次抓取保持的连接池与限速器，为 None 时本次新建。
+    """
+    from rate_limiter import AdaptiveRateLimiter
+    from scrape_engine import run_scrape_jobs
+    from score_table import ScoreTable
 
+    output_excel = OUTPUT_EXCEL
+    users_df = read_users_from_excel(INPUT_EXCEL, SHEET_USERS)
+    debug_dir = None
+    response_archive = ResponseArchive(ARCHIVE_DIR) if archive or replay is not None else None
+    replay_exam = None
+    if replay is not None:
+        replay_exam = replay or response_archive.latest_exam()
+        if replay_exam not in response_archive.exams():
+            print(f"❌ 原始响应存档({ARCHIVE_DIR})中没有考试: {replay_exam or '(空)'}")
+            return False, None
+        print(f"离线重放模式：从存档解析考试【{replay_exam}】")
+    journal = ScrapeJournal(JOURNAL_FILE, resume=resume)
+    exam_name = journal.exam_name
+    count = len(journal)
+    stream_path = stream_output_path(stream_format)
+    try:
+        stream = RowStreamWriter(stream_path, stream_format)
+    except RuntimeError as e:
+        journal.close()
+        print(f"❌ {e}")
+        return False, None
+    # 列式汇总表：首个成功页面锁定列结构，之后每名学生只追加数值；
+    # 不生成 Excel 时只锁定列结构，成绩行直接交给流式输出，不在内存中累积
+    table = ScoreTable(capacity=len(users_df) + 1, buffer=write_excel)
+    # 续抓时先把日志中已完成的行载入汇总表并写入流式输出
+    for record in journal.iter_records():
+        rows = table.add(record["idx"], record["name"], record["columns"], record["rows"])
+        stream.write_rows(table.columns, rows)
+        if on_rows is not None:
+            on_rows(exam_name, table.columns, rows)
+
+    # 整理抓取任务: (名单序号, (姓名, 登录账号, 密码))
+    jobs = [job for job in roster_jobs(users_df) if job[1][1] not in journal]
+
+    if resume:
+        print(f"从抓取进度恢复：已完成 {len(journal)} 人，剩余 {len(jobs)} 人")
+
+    metrics = current()
+    # 名单序号 -> 抓取耗时，交给 handle 记录逐个学生的结果
+    elapsed: Dict[int, float] = {}
+
+    def fetch(sess: requests.Session, idx: int, job: Tuple[str, str, str]) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """在工作线程中登录抓取单个学生,返回(成绩表, 考试名称)"""
+        name, login_name, pwd = job
         print(f"[{idx+1}/{len(users_df)}] 登录并抓取：{name}")
-
-        with requests.Session() as sess:
+        pages: Optional[List[ArchivedPage]] = [] if response_archive is not None else None
+        start = time.perf_counter()
+        try:
+            df, page_exam_name = scrape_for_user(sess, login_name, pwd, debug_dir=debug_dir, user_idx=idx+1, pages=pages)
+        finally:
+            elapsed[idx] = time.perf_counter() - start
+            metrics.observe("student", elapsed[idx])
+        if pages and page_exam_name:
+            response_archive.record(login_name, page_exam_name, pages)
+        return df, page_exam_name
+
+    def replay_jobs() -> None:
+        """离线重放：按名单顺序从存档解析，不访问网络"""
+        for idx, job in jobs:
+            name, login_name, _ = job
+            print(f"[{idx+1}/{len(users_df)}] 从存档解析：{name}")
+            pages = response_archive.lookup(login_name, replay_exam)
+            if pages is None:
+                handle(idx, job, None, LookupError("存档中没有该学生的原始响应"))
+                continue
             try:
-                df = scrape_for_user(sess, username_value or name, pwd, debug_dir=debug_dir, user_idx=idx+1)
-
-                # 首次成功登录后提取考试名称
-                if df is not None and exam_name is None:
-                    # 重新获取页面来提取考试名称
-                    try:
-                        r = sess.get(LOGIN_URL, headers=HEADERS, timeout=TIMEOUT)
-                        _fix_response_encoding(r)
-                        payload, action, method = build_login_payload(r.text, username_value or name, pwd, None)
-                        submit_url = resolve_url(LOGIN_URL, action) if action else LOGIN_URL
-
-                        from urllib.parse import urlencode
-                        encoded_form = urlencode(payload, encoding="gb18030", doseq=True)
-                        headers = dict(HEADERS)
-                        headers["Referer"] = LOGIN_URL
-                        headers["Content-Type"] = "application/x-www-form-urlencoded; charset=gb18030"
-
-                        r2 = sess.post(submit_url, data=encoded_form, headers=headers, timeout=TIMEOUT, allow_redirects=True)
-                        _fix_response_encoding(r2)
-
-                        exam_name = extract_exam_name_from_page(r2.text)
-                        if exam_name:
-                            print(f"  → 检测到考试名称: {exam_name}")
-                    except Exception as e:
-                        print(f"  → 提取考试名称失败: {e}")
-
-                if df is None or df.empty:
-                    print(f"  - 未获取到表格：{name}")
-                    continue
-
-                # 首位同学保留最后两行(包含表头信息),其余保留最后一行
-                if count == 0 and len(df) >= 2:
-                    df = df.tail(2).reset_index(drop=True)
-                else:
-                    df = pick_score_row(df, mode="last")
-
-                df = coerce_numeric_like(df, exclude_cols=["姓名", "学号", "账号", "准考证号", "考籍号", "用户名"])
-
-                # 如果表格中已经有"姓名"列,直接更新;否则插入
-                if "姓名" in df.columns:
-                    df.loc[:, "姓名"] = name
-                else:
-                    df.insert(0, "姓名", name)
-
-                aligned = ensure_output_columns(template_df, df)
-                if "姓名" not in aligned.columns:
-                    aligned.insert(0, "姓名", name)
-                else:
-                    aligned.loc[:, "姓名"] = name
-                df = aligned
-
-                all_rows.append(df)
-                time.sleep(0.8)
-
-                if debug_dir is not None:
-                    try:
-                        df.to_csv(os.path.join(debug_dir, f"{idx+1:03d}_selected_table.csv"), index=False, encoding="utf-8-sig")
-                    except Exception:
-                        pass
-
+                result = parse_archived_pages(pages)
             except Exception as e:
-                print(f"  - 失败：{name}，{e}")
+                handle(idx, job, None, e)
                 continue
+            handle(idx, job, result, None)
+
+    def handle(idx: int, job: Tuple[str, str, str], result, error: Optional[BaseException]) -> None:
+        """在主线程中按名单顺序处理抓取结果"""
+        nonlocal exam_name, count
+        name = job[0]
+        seconds = elapsed.pop(idx, None)
+        if error is not None:
+            print(f"  - 失败：{name}，{error}")
+            metrics.student(idx, name, "failed", seconds, str(error))
+            return
+        df, page_exam_name = result
+        # 首次成功登录后记录考试名称
+        if df is not None and page_exam_name and exam_name is None:
+            exam_name = page_exam_name
+            print(f"  → 检测到考试名称: {exam_name}")
+
+        if df is None or df.empty:
+            print(f"  - 未获取到表格：{name}")
+            metrics.student(idx, name, "no_table", seconds)
+            return
 
+        try:
+            # 首位同学保留最后两行(包含表头信息),其余保留最后一行
+            rows = list(df.itertuples(index=False, name=None))
+            rows = rows[-2:] if count == 0 and len(rows) >= 2 else rows[-1:]
+
+            # "姓名"列固定在首列并写入姓名，其余列按锁定的列结构排列
+            rows = table.add(idx, name, df.columns, rows)
+
+            journal.append(job[1], idx, name, table.columns, rows, page_exam_name)
+            stream.write_rows(table.columns, rows)
+            if on_rows is not None:
+                on_rows(exam_name, table.columns, rows)
+
+            if debug_dir is not None:
+                try:
+                    pd.DataFrame(rows, columns=table.columns).to_csv(os.path.join(debug_dir, f"{idx+1:03d}_selected_table.csv"), index=False, encoding="utf-8-sig")
+                except Exception:
+                    pass
+
+        except Exception as e:
+            print(f"  - 失败：{name}，{e}")
+            metrics.student(idx, name, "failed", seconds, str(e))
+            return
+
+        metrics.student(idx, name, "ok", seconds)
         count += 1
 
-    if not all_rows:
-        print("未抓取到任何数据，退出。")
+    # 需要手动输入验证码时只能逐个抓取
+    concurrency = 1 if PROMPT_CAPTCHA else SCRAPE_CONCURRENCY
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(RATE_INITIAL, RATE_MIN, RATE_MAX, slow_seconds=SLOW_RESPONSE_SECONDS)
+    try:
+        if replay is not None:
+            replay_jobs()
+        else:
+            run_scrape_jobs(jobs, fetch, handle, concurrency=concurrency, host_budget=HOST_REQUEST_BUDGET,
+                            limiter=limiter, retries=REQUEST_RETRIES, adapter=adapter)
+    except KeyboardInterrupt:
+        print(f"\n用户中断抓取，已完成 {len(journal)} 人的进度保存在 {JOURNAL_FILE}，可使用 --resume 继续。")
         return False, None
+    finally:
+        stream.close()
+        journal.close()
 
-    result = pd.concat(all_rows, ignore_index=True)
-
-    # 写出汇总成绩.xlsx
-    with pd.ExcelWriter(output_excel, engine="openpyxl") as writer:
-        result.to_excel(writer, index=False, sheet_name="汇总")
-    print(f"✅ 已写出：{output_excel}，共 {len(result)} 行。")
+    if not len(table):
+        print("未抓取到任何数据，退出。")
+        return False, None
+    print(f"✅ 已流式写出：{stream_path}，共 {stream.rows_written} 行。")
+    if table.drift:
+        print(f"⚠ 共有 {len(table.drift)} 名学生的成绩表列结构与首位学生不一致，详见上方提示。")
+
+    if write_excel:
+        # 汇总表一次性生成，数值转换在全班数据上统一进行，列类型由全体学生决定
+        result = coerce_numeric_like(table.to_frame(), exclude_cols=NON_NUMERIC_COLS)
+        # 写出汇总成绩.xlsx
+        with stage("excel_write"):
+            rows = write_excel_rows(output_excel, list(result.columns), result.itertuples(index=False, name=None), sheet_name="汇总")
+        current().add_bytes("excel_write", os.path.getsize(output_excel))
+        print(f"✅ 已写出：{output_excel}，共 {rows} 行。")
 
     return True, exam_name
 
 
-def move_exam_file(exam_name: str) -> Optional[str]:
-    """重命名并移动考试文件到历次成绩目录"""
+def move_exam_file(exam_name: str, overwrite: Optional[bool] = None) -> Optional[str]:
+    """重命名并移动考试文件到历次成绩目录；目标已存在时 overwrite 为 None 则询问是否覆盖"""
     if not exam_name:
         print("⚠ 考试名称为空,无法重命名文件!")
         return None
@@ -407,7 +467,10 @@ def move_exam_file(exam_name: str) -> Optional[str]:
     # 检查目标文件是否已存在
     if os.path.exists(target_path):
         print(f"⚠ 目标文件已存在: {target_filename}")
-        while True:
+        if overwrite is False:
+            print("未覆盖（覆盖请加 --overwrite），取消文件移动。")
+            return None
+        while overwrite is None:
             try:
                 choice = input("是否覆盖? (y/n): ").strip().lower()
                 if choice in ['y', 'yes', '是']:
@@ -429,8 +492,25 @@ def move_exam_file(exam_name: str) -> Optional[str]:
         return None
 
 
-def update_summary(exam_file_path: str, exam_name: str) -> bool:
-    """从考试文件更新成绩汇总"""
+@timed("summary_update")
+def update_summary(exam_file_path: str, exam_name: str, students: Optional[Dict[str, str]] = None,
+                   overwrite: Optional[bool] = None) -> bool:
+    """从考试文件更新成绩汇总 - 只修改单元格值,保留格式
+
+    students 为 姓名 -> 汇总文件 时批量更新多名学生：考试文件读取一次，每份汇总打开、保存各一次。
+    汇总中已有该考试时 overwrite 为 None 则询问是否覆盖。
+    """
+    if students:
+        print(f"\n开始从 {exam_file_path} 批量更新 {len(students)} 名学生的成绩汇总...")
+        try:
+            written = batch_update_summaries(students, [exam_file_path],
+                                             overwrite=overwrite if overwrite is not None
+                                             else lambda _student, exam: ask_overwrite(exam))
+        except Exception as e:
+            print(f"更新成绩汇总失败: {e}")
+            return False
+        return any(written.values())
+
     print(f"\n开始从 {exam_file_path} 提取【{TARGET_STUDENT_NAME}】的成绩...")
 
     # 提取学生成绩
@@ -440,66 +520,116 @@ def update_summary(exam_file_path: str, exam_name: str) -> bool:
 
     print(f"✅ 成功提取学生成绩")
 
-    # 检查是否已存在
-    if check_exam_exists(SUMMARY_EXCEL, exam_name):
+    # 打开成绩汇总，检查是否已存在
+    try:
+        book = SummaryWorkbook(SUMMARY_EXCEL)
+    except Exception as e:
+        print(f"读取成绩汇总文件失败: {e}")
+        return False
+    if not book.has_exam(exam_name):
+        overwrite = False
+    elif overwrite is False:
+        print(f"⚠ 成绩汇总中已有【{exam_name}】，未覆盖。")
+        return False
+    elif overwrite is None:
         if not ask_overwrite(exam_name):
             print("❌ 用户取消操作,未更新成绩汇总。")
             return False
         overwrite = True
-    else:
-        overwrite = False
 
     # 更新成绩汇总
-    return update_summary_with_scores(SUMMARY_EXCEL, exam_name, student_scores, overwrite)
+    try:
+        if book.write_scores(exam_name, student_scores, overwrite) is None:
+            return False
+        book.save()
+    except Exception as e:
+        print(f"更新成绩汇总失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    print(f"✅ 已成功更新成绩汇总: {exam_name}")
+    return True
+
+
+def import_records(df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """由考试“汇总”表（列名已去除首尾空白）逐个产出导入记录，各列一次性规范化"""
+    from import_json import numeric_values, text_values
+
+    # 识别科目 (过滤掉姓名、账号、总分等非科目列)
+    EXCLUDE = ['姓名', '账号', '学号', '考籍号', '准考证号', '用户名', '密码', '总分', '名次', '班级', '年级排名', '班级排名']
+    SUBJECTS = [col for col in df.columns if col not in EXCLUDE and '排名' not in col and '均分' not in col]
+
+    # 基础信息各列
+    names = text_values(df, '姓名', '')
+    classes = text_values(df, '班级', '未知')
+    total_scores = numeric_values(df, '总分', None, absent=0)
+    grade_ranks = numeric_values(df, '年级排名', 0)
+    class_ranks = numeric_values(df, '班级排名', 0)
+
+    # 各科成绩列
+    subject_columns = [
+        (sub, numeric_values(df, sub, None, absent=0), numeric_values(df, f'{sub}年级排名', 0),
+         numeric_values(df, f'{sub}班级排名', 0), numeric_values(df, f'{sub}班级均分', 0))
+        for sub in SUBJECTS
+    ]
+
+    for i in range(len(df)):
+        yield {
+            "student_name": names[i],
+            "class_name": classes[i],
+            "total_score": total_scores[i],
+            "grade_rank": grade_ranks[i],
+            "class_rank": class_ranks[i],
+            "subjects": [
+                {
+                    "subject": sub,
+                    "score": scores[i],
+                    "grade_rank": sub_grade[i],
+                    "class_rank": sub_class[i],
+                    "class_avg": sub_avg[i]
+                }
+                for sub, scores, sub_grade, sub_class, sub_avg in subject_columns
+            ]
+        }
+
 
+@timed("json_export")
+def export_to_json(excel_path: str, exam_name: str, compact: bool = JSON_COMPACT,
+                   delta: bool = False, delta_delete: bool = False) -> Optional[str]:
+    """将考试 Excel 转换为 Web 系统所需的 JSON 格式
+
+    按列一次性完成 NaN→null 与整数/小数规范化，逐个学生流式写出；compact=True 时不缩进。
+    delta=True 时只写出相对上次导出清单新增、有变化的学生（按姓名比对）；delta_delete=True 且本次运行
+    没有未取得成绩的学生时，本次未出现的学生写入 deleted。
+    """
+    from exam_cache import read_exam_sheet
+    from import_json import ImportJsonWriter
 
-def export_to_json(excel_path: str, exam_name: str) -> Optional[str]:
-    """将考试 Excel 转换为 Web 系统所需的 JSON 格式"""
     print(f"\n正在生成导入 JSON...")
     try:
-        # 读取 Excel
-        df = pd.read_excel(excel_path, sheet_name="汇总")
-        
-        # 清理列名
-        df.columns = [str(col).strip() for col in df.columns]
-        
-        # 识别科目 (过滤掉姓名、账号、总分等非科目列)
-        EXCLUDE = ['姓名', '账号', '学号', '考籍号', '准考证号', '用户名', '密码', '总分', '名次', '班级', '年级排名', '班级排名']
-        SUBJECTS = [col for col in df.columns if col not in EXCLUDE and '排名' not in col and '均分' not in col]
-        
-        import_data = {
-            "examName": exam_name,
-            "examDate": datetime.now().strftime("%Y-%m-%d"),
-            "data": []
-        }
+        # 读取 Excel（列名已去除首尾空白；文件未变时直接读回解析缓存）
+        df = read_exam_sheet(excel_path)
 
-        for _, row in df.iterrows():
-            # 基础信息
-            student = {
-                "student_name": str(row.get('姓名', '')),
-                "class_name": str(row.get('班级', '未知')),
-                "total_score": float(row.get('总分', 0)),
-                "grade_rank": int(row.get('年级排名', 0)) if pd.notnull(row.get('年级排名')) else 0,
-                "class_rank": int(row.get('班级排名', 0)) if pd.notnull(row.get('班级排名')) else 0,
-                "subjects": []
-            }
-
-            # 提取各科
-            for sub in SUBJECTS:
-                student["subjects"].append({
-                    "subject": sub,
-                    "score": float(row.get(sub, 0)),
-                    "grade_rank": int(row.get(f'{sub}年级排名', 0)) if f'{sub}年级排名' in df.columns else 0,
-                    "class_rank": int(row.get(f'{sub}班级排名', 0)) if f'{sub}班级排名' in df.columns else 0,
-                    "class_avg": float(row.get(f'{sub}班级均分', 0)) if f'{sub}班级均分' in df.columns else 0
-                })
-            
-            import_data["data"].append(student)
-
-        # 保存
+        # 保存：逐个学生写出
         output_path = os.path.join(os.path.dirname(excel_path), f"{exam_name}_import.json")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(import_data, f, ensure_ascii=False, indent=2)
+        exam_date = datetime.now().strftime("%Y-%m-%d")
+        records = import_records(df)
+        tracker = None
+        if delta:
+            tracker = delta_filter(output_path, exam_name,
+                                   deletions=deletions_allowed(delta_delete, current().failed_students()))
+            # 先比对全部学生，写出之前打印未出现（及将删除）的学生
+            records = [record for record in records if tracker.keep(record)]
+            tracker.report_missing()
+        with ImportJsonWriter(output_path, exam_name, exam_date, compact=compact) as writer:
+            for record in records:
+                writer.write(record)
+            if tracker is not None:
+                writer.extra["deleted"] = tracker.deleted
+        if tracker is not None:
+            tracker.write_manifest(manifest_path(output_path), exam_name, exam_date, output_path)
+            print(f"  {tracker.summary()}")
+        current().add_bytes("json_export", os.path.getsize(output_path))
         
         print(f"✅ JSON 生成成功: {os.path.basename(output_path)}")
         return output_path
@@ -508,6 +638,62 @@ def export_to_json(excel_path: str, exam_name: str) -> Optional[str]:
         return None
 
 
+def student_frame(columns: List[str], rows: List[List[Any]]) -> pd.DataFrame:
+    """一名学生的成绩行转为与考试文件“汇总”表读回时一致的 DataFrame（空值为 NaN、数值列转换、列名去除首尾空白）"""
+    df = pd.DataFrame(rows, columns=columns)
+    df = coerce_numeric_like(df.mask(df.isna() | df.isin(["", "nan", "None"])), exclude_cols=NON_NUMERIC_COLS)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df
+
+
+def run_pipeline(args: argparse.Namespace, summary_students: Optional[Dict[str, str]] = None) -> bool:
+    """无交互流水线：抓取的同时生成导入 JSON、更新成绩汇总并写入数据库
+
+    各阶段由内存队列连接（见 pipeline.py），直接使用抓取到的成绩行，不再读取中间 Excel；
+    考试文件仍移入历次成绩目录（--no-excel 时不生成）。已存在的考试文件与汇总考试列不询问，按 --overwrite 处理。
+    """
+    from pipeline import DatabaseStage, JsonExportStage, Pipeline, Stage, SummaryStage
+
+    if PROMPT_CAPTCHA:
+        print("❌ 需要手动输入验证码，无法使用无交互流水线。")
+        return False
+
+    stages: List[Stage] = [
+        JsonExportStage(EXAMS_DIR, import_records, compact=args.compact_json, delta=args.delta,
+                        delta_delete=args.delta_delete),
+        SummaryStage(summary_students or {TARGET_STUDENT_NAME: SUMMARY_EXCEL}, overwrite=args.overwrite),
+    ]
+    if args.db:
+        # --delta --delta-delete 时数据库中已不在抓取结果里的学生同样删除（与逐步执行时一致）
+        stages.append(DatabaseStage(args.db, replace=args.delta and args.delta_delete))
+    print(f"\n无交互流水线执行（边抓取边处理: {'、'.join(stage.name for stage in stages)}）...")
+    pipeline = Pipeline(stages, student_frame)
+    try:
+        success, exam_name = scrape_scores_with_exam_name(resume=args.resume, stream_format=args.stream_format,
+                                                          write_excel=not args.no_excel,
+                                                          archive=not args.no_archive, replay=args.replay,
+                                                          on_rows=pipeline.feed)
+    except BaseException:
+        pipeline.close(abort=True)
+        raise
+    if not success or not exam_name:
+        pipeline.close(abort=True)
+        print("\n❌ 抓取失败,终止流程。" if not success else f"\n⚠ 未能提取考试名称。文件保存在: {OUTPUT_EXCEL}")
+        return False
+
+    moved_file = None if args.no_excel else move_exam_file(exam_name, overwrite=args.overwrite)
+    stages_ok = pipeline.close()
+
+    print(f"\n{'='*60}")
+    print("✅ 流水线执行成功!" if stages_ok else "⚠ 流水线执行完成，部分阶段失败（见上方提示）")
+    if moved_file:
+        print(f"考试文件: {moved_file}")
+    elif not args.no_excel:
+        print(f"考试文件仍在: {OUTPUT_EXCEL}")
+    print(f"{'='*60}")
+    return stages_ok and (moved_file is not None or args.no_excel)
+
+
 def _fix_response_encoding(resp: requests.Response) -> None:
     """确保中文站点编码被正确解码，优先使用apparent_encoding，其次回退gb18030。"""
     try:
@@ -548,8 +734,8 @@ def read_users_from_excel(path: str, sheet_name: str) -> pd.DataFrame:
     return out
 
 
-def detect_form_fields(html: str) -> Dict[str, Optional[str]]:
-    soup = BeautifulSoup(html, "lxml")
+def detect_form_fields(page: Page) -> Dict[str, Optional[str]]:
+    soup = PageSnapshot.of(page).soup
     form = soup.find("form")
     if not form:
         return {"username": None, "password": None, "captcha": None, "action": None, "method": "post"}
@@ -588,8 +774,10 @@ def detect_form_fields(html: str) -> Dict[str, Optional[str]]:
     }
 
 
-def build_login_payload(html: str, username: str, password: str, captcha: Optional[str]) -> (Dict[str, Any], str, str):
-    detected = detect_form_fields(html)
+def extract_login_form(page: Page) -> LoginForm:
+    """从登录页提取可复用的表单结构：字段名、静态隐藏字段、action、method"""
+    snapshot = PageSnapshot.of(page)
+    detected = detect_form_fields(snapshot)
     # 允许通过FORM_FIELD_NAMES覆盖
     username_field = FORM_FIELD_NAMES.get("username") or detected.get("username")
     password_field = FORM_FIELD_NAMES.get("password") or detected.get("password")
@@ -597,8 +785,7 @@ def build_login_payload(html: str, username: str, password: str, captcha: Option
     if not username_field or not password_field:
         raise ValueError("无法从登录页推断用户名/密码字段名，请在脚本顶部显式配置FORM_FIELD_NAMES")
 
-    soup = BeautifulSoup(html, "lxml")
-    form = soup.find("form")
+    form = snapshot.soup.find("form")
     action = detected.get("action")
     method = detected.get("method") or "post"
     # 收集所有隐藏字段
@@ -612,20 +799,44 @@ def build_login_payload(html: str, username: str, password: str, captcha: Option
             val = inp.get("value")
             if itype == "hidden":
                 payload[name_attr] = val if val is not None else ""
+
+    return {
+        "username": username_field,
+        "password": password_field,
+        "captcha": captcha_field,
+        "hidden": payload,
+        "action": action or "",
+        "method": method,
+    }
+
+
+def login_form_changed(page: Page, form: LoginForm) -> bool:
+    """登录失败页面上的登录表单与缓存的表单结构不一致（或找不到可识别的登录表单）"""
+    try:
+        return extract_login_form(page) != form
+    except ValueError:
+        return True
+
+
+def fill_login_payload(form: LoginForm, username: str, password: str, captcha: Optional[str]) -> (Dict[str, Any], str, str):
+    """用表单结构生成某个学生的登录参数"""
+    payload: Dict[str, Any] = dict(form["hidden"])
     # 填入用户字段
-    payload[username_field] = username
-    payload[password_field] = password
-    if captcha_field and captcha is not None:
-        payload[captcha_field] = captcha
+    payload[form["username"]] = username
+    payload[form["password"]] = password
+    if form["captcha"] and captcha is not None:
+        payload[form["captcha"]] = captcha
+
+    return payload, form["action"], form["method"]
 
-    return payload, action or "", method
-def is_login_success(html: str) -> bool:
+
+def is_login_success(page: Page) -> bool:
     """粗略判定是否已登录：页面不再出现密码输入框/登录按钮，且包含成绩相关关键词。"""
-    soup = BeautifulSoup(html, "lxml")
+    snapshot = PageSnapshot.of(page)
     # 若仍有 password 输入，基本可判定未登录
-    if soup.find("input", {"type": "password"}):
+    if snapshot.soup.find("input", {"type": "password"}):
         return False
-    text = soup.get_text(" ", strip=True)
+    text = snapshot.text
     for k in ("成绩", "分数", "课程", "科目", "总分", "试卷"):
         if k in text:
             return True
@@ -700,9 +911,8 @@ def _parse_table_consistent(table_tag) -> Optional[pd.DataFrame]:
     return df
 
 
-def extract_first_table(html: str) -> Optional[pd.DataFrame]:
-    soup = BeautifulSoup(html, "lxml")
-    table = soup.find("table")
+def extract_first_table(page: Page) -> Optional[pd.DataFrame]:
+    table = PageSnapshot.of(page).soup.find("table")
     if not table:
         return None
     df = _parse_table_consistent(table)
@@ -716,69 +926,190 @@ def resolve_url(base_url: str, action: str) -> str:
 
 KEYWORDS = ["成绩", "分数", "分", "科目", "课程", "总分", "平均分", "名次", "班级", "学号"]
 
+# 与 pandas.read_html 一致的空白清理与缺失值约定，保证快速路径与通用路径输出相同
+_CELL_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+_CELL_NA_VALUES = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
 
-def select_best_table(html: str) -> Optional[pd.DataFrame]:
+def _cell_text(cell) -> str:
+    return _CELL_WHITESPACE.sub(" ", cell.text_content().strip())
+
+
+_A2_TABLE_XPATH = '//table[contains(concat(" ", normalize-space(@class), " "), " a2 ")]'
+_CELL_INT = re.compile(r"[+-]?[0-9]+")
+_CELL_FLOAT = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+
+
+def _typed_cell(text: str) -> Any:
+    """单元格文本转为 int / float / str，空值转为 NaN"""
+    if text in _CELL_NA_VALUES:
+        return float("nan")
+    num = text.replace(",", "")
+    if _CELL_INT.fullmatch(num):
+        return int(num)
+    if _CELL_FLOAT.fullmatch(num):
+        return float(num)
+    return text
+
+
+def extract_a2_table(page: Page) -> Optional[pd.DataFrame]:
+    """快速路径：直接在 lxml 树上读取已知的 table.a2 成绩表布局。
+
+    已知布局为一行表头 + 一行成绩，且单元格没有跨行/跨列、列数 > 20。
+    只读取表头与最后一行并直接转为带类型的值，不再序列化为 HTML 交给 read_html。
+    布局不符时返回 None，由调用方退回通用路径。
+    """
+    tables = PageSnapshot.of(page).tree.xpath(_A2_TABLE_XPATH)
+    if not tables:
+        return None
+    rows = tables[0].xpath("./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr")
+    if len(rows) != 2:
+        return None
+    header_cells = rows[0].xpath("./td | ./th")
+    value_cells = rows[-1].xpath("./td | ./th")
+    if len(header_cells) <= 20 or len(header_cells) != len(value_cells):
+        return None
+    for cell in header_cells + value_cells:
+        if cell.get("colspan", "1").strip() != "1" or cell.get("rowspan", "1").strip() != "1":
+            return None
+
+    # 表头：空表头与重名列的命名方式与 read_html 相同
+    columns: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, cell in enumerate(header_cells):
+        name = _cell_text(cell) or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    values = [_typed_cell(_cell_text(cell)) for cell in value_cells]
+    return pd.DataFrame([values], columns=columns)
+
+
+def _table_to_df(table) -> Optional[pd.DataFrame]:
+    """将 lxml 表格元素转为 DataFrame：先用 read_html，失败再按行列手动拼装"""
+    import lxml.html
+    try:
+        tmp = pd.read_html(StringIO(lxml.html.tostring(table, encoding="unicode")), header=0)
+        if tmp and not tmp[0].empty:
+            return tmp[0]
+    except Exception:
+        pass
+    # 简易兜底
+    try:
+        headers: List[str] = []
+        rows: List[List[str]] = []
+        thead = table.find(".//thead")
+        if thead is not None:
+            headers = ["".join(t.strip() for t in th.itertext()) for th in thead.iter("th")]
+        tbody = table.find(".//tbody")
+        if tbody is None:
+            tbody = table
+        for tr in tbody.iter("tr"):
+            cols = list(tr.iter("td", "th"))
+            if not headers:
+                headers = [f"列{i+1}" for i in range(len(cols))]
+            rows.append(["".join(t.strip() for t in c.itertext()) for c in cols])
+        if rows:
+            return pd.DataFrame(rows, columns=headers)
+    except Exception:
+        pass
+    return None
+
+
+def _score_tables(tree) -> List[Tuple[int, int, Any]]:
+    """单次遍历文档树，为每个 <table> 评分，返回 [(分数, 文档序号, 表格元素)]。
+
+    只统计表格自身的行数、最大列数(含 colspan)以及前 4 行(表头+3 行)文本中的关键词命中，
+    嵌套子表的行与文本只计入子表本身，不再对每个表格单独调用 read_html。
+    """
+    from lxml import etree
+    scored: List[Tuple[int, int, Any]] = []
+    stack: List[Dict[str, Any]] = []
+    order = 0
+    for event, el in etree.iterwalk(tree, events=("start", "end")):
+        tag = el.tag if isinstance(el.tag, str) else None
+        if event == "start":
+            if tag == "table":
+                stack.append({"order": order, "rows": 0, "cols": 0, "cur": 0, "text": []})
+                order += 1
+                continue
+            if not stack:
+                continue
+            stat = stack[-1]
+            if tag == "tr":
+                stat["rows"] += 1
+                stat["cur"] = 0
+            elif tag in ("td", "th"):
+                try:
+                    stat["cur"] += max(1, int(el.get("colspan") or 1))
+                except ValueError:
+                    stat["cur"] += 1
+            if tag is not None and stat["rows"] <= 4 and el.text:
+                stat["text"].append(el.text)
+            continue
+
+        if tag == "table":
+            stat = stack.pop()
+            # 首行视为表头，至少要有一行数据
+            rows_n = stat["rows"] - 1
+            if rows_n >= 1:
+                cols_n = stat["cols"]
+                # 评分：优先选择列数多的表格(内层成绩表格列数通常>50)
+                score = cols_n * 100 + rows_n
+                # 关键词匹配加分
+                text_blob = " ".join(stat["text"])
+                score += sum(1 for k in KEYWORDS if k in text_blob) * 10
+                # 列数太少，降权
+                if cols_n <= 5:
+                    score -= 1000
+                scored.append((score, stat["order"], el))
+        elif tag == "tr" and stack:
+            stack[-1]["cols"] = max(stack[-1]["cols"], stack[-1]["cur"])
+        if stack and stack[-1]["rows"] <= 4 and el.tail:
+            stack[-1]["text"].append(el.tail)
+    return scored
+
+
+def select_best_table(page: Page) -> Optional[pd.DataFrame]:
     """在页面中选择最可能是成绩的表格：优先选择class=a2的内层表格"""
-    soup = BeautifulSoup(html, "lxml")
+    snapshot = PageSnapshot.of(page)
+
+    # 已知成绩表布局直接走快速路径
+    try:
+        df = extract_a2_table(snapshot)
+        if df is not None:
+            return df
+    except Exception:
+        pass
+
+    tree = snapshot.tree
 
     # 优先查找class="a2"的表格(内层成绩表格)
-    a2_table = soup.find('table', class_='a2')
-    if a2_table:
+    a2_tables = tree.xpath(_A2_TABLE_XPATH)
+    if a2_tables:
         try:
-            dfs = pd.read_html(StringIO(str(a2_table)), header=0)
+            import lxml.html
+            dfs = pd.read_html(StringIO(lxml.html.tostring(a2_tables[0], encoding="unicode")), header=0)
             if dfs and not dfs[0].empty and len(dfs[0].columns) > 20:
                 return dfs[0]
         except Exception:
             pass
 
-    # 如果找不到a2表格,使用原有逻辑
-    tables = soup.find_all("table")
-    if not tables:
-        return None
-    best_score = -1
-    best_df: Optional[pd.DataFrame] = None
-    for t in tables:
-        df: Optional[pd.DataFrame] = None
-        try:
-            tmp = pd.read_html(StringIO(str(t)), header=0)
-            if tmp:
-                df = tmp[0]
-        except Exception:
-            df = None
-        if df is None or df.empty:
-            # 简易兜底
-            try:
-                headers: List[str] = []
-                rows: List[List[str]] = []
-                thead = t.find("thead")
-                if thead:
-                    headers = [th.get_text(strip=True) for th in thead.find_all("th")]
-                tbody = t.find("tbody") or t
-                for tr in tbody.find_all("tr"):
-                    cols = tr.find_all(["td", "th"])
-                    if not headers:
-                        headers = [f"列{i+1}" for i in range(len(cols))]
-                    rows.append([c.get_text(strip=True) for c in cols])
-                if rows:
-                    df = pd.DataFrame(rows, columns=headers)
-            except Exception:
-                df = None
-        if df is None or df.empty:
-            continue
-        # 评分：优先选择列数多的表格(内层成绩表格列数通常>50)
-        rows_n, cols_n = df.shape
-        score = cols_n * 100 + rows_n
-        # 关键词匹配加分
-        text_blob = " ".join([" ".join(map(str, df.columns.tolist()))] + [" ".join(map(str, r)) for r in df.head(3).values.tolist()])
-        kw_hits = sum(1 for k in KEYWORDS if k in text_blob)
-        score += kw_hits * 10
-        # 列数太少，降权
-        if cols_n <= 5:
-            score -= 1000
-        if score > best_score:
-            best_score = score
-            best_df = df
-    return best_df
+    # 如果找不到a2表格,一次遍历为所有表格评分,只把胜出者转为DataFrame
+    scored = [item for item in _score_tables(tree) if item[0] >= 0]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    for _, _, table in scored:
+        df = _table_to_df(table)
+        if df is not None and not df.empty:
+            return df
+    return None
 
 
 def pick_first_df(*candidates: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
@@ -791,88 +1122,108 @@ def pick_first_df(*candidates: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]
     return None
 
 
-def ensure_output_columns(_: Optional[pd.DataFrame], data_df: pd.DataFrame) -> pd.DataFrame:
-    """不再参考Sheet2：仅将“姓名”列放到首列（如存在）。"""
-    cols = list(data_df.columns)
-    if "姓名" in cols:
-        cols.remove("姓名")
-        cols = ["姓名"] + cols
-    return data_df.reindex(columns=cols)
+# 不尝试转为数值的标识列
+NON_NUMERIC_COLS = ["姓名", "学号", "账号", "准考证号", "考籍号", "用户名"]
+# 数值清洗时删除的字符：中文空格、千分位逗号、空格、“分”字、破折号
+_NUMERIC_JUNK = str.maketrans("", "", "\u3000, 分—")
 
 
-def pick_score_row(data_df: pd.DataFrame, mode: str = "third") -> pd.DataFrame:
-    """根据模式挑选成绩行：
-    - third: 取第3行（0基索引为2），若不足3行则取最后一行
-    - last:  取最后一行
-    - none:  不筛选，返回原表
-    返回仅包含1行的数据框。
-    """
-    if data_df is None or data_df.empty:
-        return data_df
-    if mode == "none":
-        return data_df
-    if mode == "last":
-        return data_df.tail(1).reset_index(drop=True)
-    # default: third
-    if len(data_df) >= 3:
-        return data_df.iloc[[2]].reset_index(drop=True)
-    return data_df.tail(1).reset_index(drop=True)
+def _clean_numeric_text(block: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """对整块数据做一次向量化清洗（展开为一列后单次 translate），返回(清洗后的文本, 是否为非空单元格)"""
+    flat = pd.Series(block.to_numpy(dtype=object).ravel(), dtype=object)
+    cleaned = flat.astype(str).str.translate(_NUMERIC_JUNK)
+    filled = flat.notna() & ~cleaned.isin(["", "nan", "None"])
+    shape = block.shape
+    return (
+        pd.DataFrame(cleaned.to_numpy(dtype=object).reshape(shape), index=block.index, columns=block.columns),
+        pd.DataFrame(filled.to_numpy().reshape(shape), index=block.index, columns=block.columns),
+    )
+
+
+def _to_numeric(cleaned: pd.DataFrame) -> pd.DataFrame:
+    # 按列转换，整数列保持 int64
+    return cleaned.apply(pd.to_numeric, errors="coerce")
+
+
+def _numeric_columns(numeric_count: pd.Series, filled_count: pd.Series, n_rows: int, threshold: float) -> List[str]:
+    """按全体数据决定哪些列转为数值：非空单元格中可转换的比例达到阈值（行数很少时至少有1个可转）"""
+    ratio = numeric_count / filled_count.where(filled_count > 0)
+    if n_rows <= 2:
+        chosen = numeric_count >= 1
+    else:
+        chosen = (numeric_count >= 1) & (ratio >= threshold)
+    return [col for col in numeric_count.index if chosen[col]]
+
 
+@timed("coerce")
 def coerce_numeric_like(df: pd.DataFrame, *, exclude_cols: Optional[List[str]] = None, threshold: float = 0.6) -> pd.DataFrame:
-    """将看起来是数字的列转换为数值类型。
+    """将看起来是数字的列转换为数值类型（整表一次向量化处理）。
     - exclude_cols: 不尝试转换的列名列表（例如 姓名、学号等）
-    - threshold: 可成功转为数值的比例阈值，达到则整列转换，否则保持原样
+    - threshold: 非空单元格中可成功转为数值的比例阈值，达到则整列转换（无法转换的单元格置空），否则保持原样
     """
     if df is None or df.empty:
         return df
     exclude_cols = exclude_cols or []
     out = df.copy()
-    for col in out.columns:
-        if col in exclude_cols:
-            continue
-        series = out[col].astype(str)
-        # 清洗：去掉千分位逗号、空格、中文空格、尾部的“分”字等
-        cleaned = (
-            series.str.replace("\u3000", "", regex=False)
-                  .str.replace(",", "", regex=False)
-                  .str.replace(" ", "", regex=False)
-                  .str.replace("分", "", regex=False)
-                  .str.replace("—", "", regex=False)
-                  .str.replace("-", "-", regex=False)
-        )
-        numeric = pd.to_numeric(cleaned, errors="coerce")
-        ratio = numeric.notna().mean()
-        count_numeric = int(numeric.notna().sum())
-        n_rows = len(numeric)
-        # 行数很少（<=2）且至少有1个可转，则转换
-        if n_rows <= 2 and count_numeric >= 1:
-            out[col] = numeric
-            continue
-        # 常规：多数可转换时整体转换
-        if ratio >= threshold:
-            out[col] = numeric
+    candidates = [col for col in out.columns if col not in exclude_cols]
+    if not candidates:
+        return out
+    cleaned, filled = _clean_numeric_text(out[candidates])
+    numeric = _to_numeric(cleaned)
+    for col in _numeric_columns(numeric.notna().sum(), filled.sum(), len(out), threshold):
+        out[col] = numeric[col]
     return out
 
-def scrape_for_user(session: requests.Session, username: str, password: str, *, debug_dir: Optional[str] = None, user_idx: Optional[int] = None) -> Optional[pd.DataFrame]:
-    r = session.get(LOGIN_URL, headers=HEADERS, timeout=TIMEOUT)
-    r.raise_for_status()
-    _fix_response_encoding(r)
-    if debug_dir is not None and user_idx is not None:
-        try:
-            with open(os.path.join(debug_dir, f"{user_idx:03d}_login_page.html"), "w", encoding=r.encoding or "utf-8") as f:
-                f.write(r.text)
-        except Exception:
-            pass
+
+def extract_score_table(page: Page) -> Optional[pd.DataFrame]:
+    """从页面中取成绩表：优先 select_best_table，取不到时才退回第一个表格"""
+    snapshot = PageSnapshot.of(page)
+    df = pick_first_df(select_best_table(snapshot))
+    if df is not None:
+        return df
+    return pick_first_df(extract_first_table(snapshot))
+
+
+_login_form_cache = LoginFormCache(LOGIN_FORM_REVALIDATE_EVERY)
+
+
+def scrape_for_user(session: requests.Session, username: str, password: str, *, debug_dir: Optional[str] = None, user_idx: Optional[int] = None, use_form_cache: bool = True, pages: Optional[List[ArchivedPage]] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """登录并抓取单个学生，返回(成绩表, 考试名称)。每个响应只解析一次。
+
+    登录表单结构有缓存时跳过登录页 GET 直接登录；缓存登录失败且失败页面上的登录表单与缓存不一致时
+    作废缓存，按完整流程重试一次（密码错误等普通登录失败不影响缓存）。
+    传入 pages 列表时，按顺序追加抓到的原始页面 (页面类型, URL, 正文)，供存档使用。
+    """
     captcha_value: Optional[str] = None
-    if PROMPT_CAPTCHA:
-        # 简易提示：若页面包含“验证码”字样，则提示输入
-        if "验证码" in r.text or "驗證碼" in r.text or "captcha" in r.text.lower():
-            print(f"检测到可能的验证码，账号 {username} 需要手动输入（若无请输入直接回车）：")
+    # 需要验证码时每次都必须获取登录页
+    form = _login_form_cache.get(LOGIN_URL) if use_form_cache and not PROMPT_CAPTCHA else None
+    from_cache = form is not None
+    if form is None:
+        with stage("login_get"):
+            r = session.get(LOGIN_URL, headers=HEADERS, timeout=TIMEOUT)
+            r.raise_for_status()
+            _fix_response_encoding(r)
+        current().add_bytes("login_get", len(r.content))
+        if pages is not None:
+            pages.append(("login", r.url, r.text))
+        if debug_dir is not None and user_idx is not None:
             try:
-                captcha_value = input("请输入验证码: ").strip()
-            except EOFError:
-                captcha_value = None
-    payload, action, method = build_login_payload(r.text, username, password, captcha_value)
+                with open(os.path.join(debug_dir, f"{user_idx:03d}_login_page.html"), "w", encoding=r.encoding or "utf-8") as f:
+                    f.write(r.text)
+            except Exception:
+                pass
+        if PROMPT_CAPTCHA:
+            # 简易提示：若页面包含“验证码”字样，则提示输入
+            if "验证码" in r.text or "驗證碼" in r.text or "captcha" in r.text.lower():
+                print(f"检测到可能的验证码，账号 {username} 需要手动输入（若无请输入直接回车）：")
+                try:
+                    captcha_value = input("请输入验证码: ").strip()
+                except EOFError:
+                    captcha_value = None
+        with stage("parse"):
+            form = extract_login_form(PageSnapshot(r.text))
+        _login_form_cache.store(LOGIN_URL, form)
+    payload, action, method = fill_login_payload(form, username, password, captcha_value)
     submit_url = resolve_url(LOGIN_URL, action) if action else LOGIN_URL
     # 补充常见 Referer
     headers = dict(HEADERS)
@@ -881,12 +1232,16 @@ def scrape_for_user(session: requests.Session, username: str, password: str, *,
     from urllib.parse import urlencode
     encoded_form = urlencode(payload, encoding="gb18030", doseq=True)
     headers["Content-Type"] = "application/x-www-form-urlencoded; charset=gb18030"
-    if method == "post":
-        r2 = session.post(submit_url, data=encoded_form, headers=headers, timeout=TIMEOUT, allow_redirects=True)
-    else:
-        r2 = session.get(submit_url + ("?" + encoded_form if encoded_form else ""), headers=headers, timeout=TIMEOUT, allow_redirects=True)
-    r2.raise_for_status()
-    _fix_response_encoding(r2)
+    with stage("login_post"):
+        if method == "post":
+            r2 = session.post(submit_url, data=encoded_form, headers=headers, timeout=TIMEOUT, allow_redirects=True)
+        else:
+            r2 = session.get(submit_url + ("?" + encoded_form if encoded_form else ""), headers=headers, timeout=TIMEOUT, allow_redirects=True)
+        r2.raise_for_status()
+        _fix_response_encoding(r2)
+    current().add_bytes("login_post", len(r2.content))
+    if pages is not None:
+        pages.append(("after_login", r2.url, r2.text))
     if debug_dir is not None and user_idx is not None:
         try:
             with open(os.path.join(debug_dir, f"{user_idx:03d}_after_login.html"), "w", encoding=r2.encoding or "utf-8") as f:
@@ -895,7 +1250,15 @@ def scrape_for_user(session: requests.Session, username: str, password: str, *,
             pass
 
     # 登录成败快速判定
-    if not is_login_success(r2.text):
+    with stage("parse"):
+        page = PageSnapshot(r2.text)
+        logged_in = is_login_success(page)
+    if not logged_in:
+        if from_cache and login_form_changed(page, form):
+            # 缓存的表单已失效（如隐藏字段变化或需要先建立会话）：作废缓存后按完整流程重试
+            current().count("login_form_stale")
+            _login_form_cache.invalidate(LOGIN_URL)
+            return scrape_for_user(session, username, password, debug_dir=debug_dir, user_idx=user_idx, use_form_cache=False, pages=pages)
         if debug_dir is not None and user_idx is not None:
             try:
                 with open(os.path.join(debug_dir, f"{user_idx:03d}_login_failed.txt"), "w", encoding="utf-8") as f:
@@ -905,31 +1268,469 @@ def scrape_for_user(session: requests.Session, username: str, password: str, *,
                     f.write(f"Final URL: {r2.url}\n")
             except Exception:
                 pass
-        return None
+        current().count("login_failed")
+        return None, None
+
+    # 考试名称与成绩表来自同一个登录后页面，无需再次登录
+    with stage("parse"):
+        exam_name = extract_exam_name_from_page(page)
 
     # 登录后页面直接有表格，或需跳转；先尝试当前页
-    df = pick_first_df(select_best_table(r2.text), extract_first_table(r2.text))
-    if df is not None and not df.empty:
-        return df
+    with stage("table_select"):
+        df = extract_score_table(page)
+    if df is not None:
+        return df, exam_name
     # 若有meta refresh或a链接提示成绩页，尝试跟随
-    soup = BeautifulSoup(r2.text, "lxml")
-    link = soup.find("a")
+    link = page.soup.find("a")
     if link and link.get("href"):
         url = resolve_url(submit_url, link.get("href"))
-        r3 = session.get(url, headers=HEADERS, timeout=TIMEOUT)
+        with stage("score_get"):
+            r3 = session.get(url, headers=HEADERS, timeout=TIMEOUT)
+            if r3.ok:
+                _fix_response_encoding(r3)
+        current().add_bytes("score_get", len(r3.content))
         if r3.ok:
-            _fix_response_encoding(r3)
-            df = pick_first_df(select_best_table(r3.text), extract_first_table(r3.text))
-            if df is not None and not df.empty:
-                return df
-    # 最后兜底
-    return pick_first_df(select_best_table(r2.text), extract_first_table(r2.text))
+            if pages is not None:
+                pages.append(("score", r3.url, r3.text))
+            with stage("table_select"):
+                df = extract_score_table(PageSnapshot(r3.text))
+            if df is not None:
+                return df, exam_name
+    return None, exam_name
+
+
+def parse_archived_pages(pages: List[ArchivedPage]) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """从存档的原始页面离线重跑解析，返回(成绩表, 考试名称)，判定顺序与 scrape_for_user 一致"""
+    after_login = [text for kind, _, text in pages if kind == "after_login"]
+    if not after_login:
+        return None, None
+    # 缓存表单登录失败后会重试，以最后一次登录结果为准
+    page = PageSnapshot(after_login[-1])
+    if not is_login_success(page):
+        return None, None
+    exam_name = extract_exam_name_from_page(page)
+    df = extract_score_table(page)
+    if df is not None:
+        return df, exam_name
+    for kind, _, text in pages:
+        if kind == "score":
+            df = extract_score_table(PageSnapshot(text))
+            if df is not None:
+                return df, exam_name
+    return None, exam_name
+
+
+@timed("db_load")
+def load_exam_into_db(exam_file: str, db_path: str, replace: bool = False) -> bool:
+    """将考试 Excel 直接批量写入成绩数据库；replace=True 时删除数据库中该次考试已不在考试文件里的学生"""
+    from db_loader import load_files
+
+    print(f"\n正在写入数据库: {db_path}")
+    try:
+        load_files([exam_file], db_path, replace=replace)
+        return True
+    except Exception as e:
+        print(f"❌ 写入数据库失败（已回滚）: {e}")
+        return False
+
+
+def init_queue(queue_path: str, shard_size: int = SHARD_SIZE) -> bool:
+    """按名单建立分片抓取队列：跨班级名单按登录账号与密码去重，每 shard_size 名学生一个分片"""
+    users_df = read_users_from_excel(INPUT_EXCEL, SHEET_USERS)
+    jobs, duplicates, conflicts = dedupe_roster(roster_jobs(users_df))
+    if duplicates:
+        print(f"⚠ 名单中有 {len(duplicates)} 条重复的学生记录（登录账号与密码均相同），只保留首次出现")
+    for login in conflicts:
+        print(f"  ⚠ 账号【{login}】在名单中对应多个不同的密码，按不同学生分别抓取，请核对")
+    if not jobs:
+        print("名单中没有可抓取的学生。")
+        return False
+    queue = WorkQueue.create(queue_path, jobs, shard_size)
+    print(f"✅ 已建立抓取队列: {queue_path}，{len(jobs)} 名学生，{queue.progress()['shards']} 个分片")
+    queue.close()
+    return True
+
+
+def run_queue_worker(queue_path: str, archive: bool = True) -> int:
+    """抓取进程：从工作队列逐个领取分片并发抓取，每名学生的成绩行立即写回队列；返回本进程完成的学生数"""
+    import socket
+
+    from rate_limiter import AdaptiveRateLimiter
+    from scrape_engine import run_scrape_jobs
+
+    # 本进程没有在主线程中用过 pandas，先加载完再交给抓取线程
+    load_now(pd, requests)
+    queue = WorkQueue(queue_path)
+    # 队列中不保存密码，领取分片时按名单序号从名单中取
+    roster = dict(roster_jobs(read_users_from_excel(INPUT_EXCEL, SHEET_USERS)))
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    response_archive = ResponseArchive(ARCHIVE_DIR) if archive else None
+    # 每个进程各自限速，对服务器的总请求量随进程数增加
+    limiter = AdaptiveRateLimiter(RATE_INITIAL, RATE_MIN, RATE_MAX, slow_seconds=SLOW_RESPONSE_SECONDS)
+    done = 0
+    metrics = current()
+    elapsed: Dict[int, float] = {}
+
+    def fetch(sess: requests.Session, idx: int, job: Tuple[str, str, str]) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        name, login_name, pwd = job
+        print(f"[{worker}] [{idx+1}] 登录并抓取：{name}")
+        pages: Optional[List[ArchivedPage]] = [] if response_archive is not None else None
+        start = time.perf_counter()
+        try:
+            df, page_exam_name = scrape_for_user(sess, login_name, pwd, user_idx=idx+1, pages=pages)
+        finally:
+            elapsed[idx] = time.perf_counter() - start
+            metrics.observe("student", elapsed[idx])
+        if pages and page_exam_name:
+            response_archive.record(login_name, page_exam_name, pages)
+        return df, page_exam_name
+
+    def handle(idx: int, job: Tuple[str, str, str], result, error: Optional[BaseException]) -> None:
+        nonlocal done
+        name = job[0]
+        seconds = elapsed.pop(idx, None)
+        outcome = "failed"
+        if error is None and (result[0] is None or result[0].empty):
+            error = LookupError("未获取到表格")
+            outcome = "no_table"
+        if error is not None:
+            print(f"  - 失败：{name}，{error}")
+            queue.fail(idx, worker, str(error))
+            metrics.student(idx, name, outcome, seconds, str(error))
+            return
+        df, page_exam_name = result
+        # 合并时名单中第一名学生保留最后两行(包含表头信息)，其余保留最后一行
+        rows = list(df.itertuples(index=False, name=None))[-2:]
+        queue.complete(idx, worker, page_exam_name, list(df.columns), rows)
+        metrics.student(idx, name, "ok", seconds)
+        done += 1
+
+    shard_id = None
+    try:
+        while True:
+            claimed = queue.claim(worker, roster)
+            if claimed is None:
+                break
+            shard_id, jobs = claimed
+            print(f"[{worker}] 领取分片 {shard_id}（{len(jobs)} 人）")
+            run_scrape_jobs(jobs, fetch, handle, concurrency=SCRAPE_CONCURRENCY, host_budget=HOST_REQUEST_BUDGET,
+                            limiter=limiter, retries=REQUEST_RETRIES)
+            queue.finish_shard(shard_id)
+    except KeyboardInterrupt:
+        print(f"\n[{worker}] 用户中断，分片 {shard_id} 保持已领取状态；确认各抓取进程退出后可用 --queue-reset 放回。")
+    finally:
+        queue.close()
+    print(f"[{worker}] 本进程完成 {done} 人")
+    return done
+
+
+def _queue_worker_process(queue_path: str, archive: bool, report: Optional[str], prometheus: Optional[str]) -> None:
+    """本机多进程抓取中的一个进程：运行报告文件名加上进程号，各自写出"""
+    pid = os.getpid()
+    metrics = begin_run(f"worker-{pid}")
+    try:
+        run_queue_worker(queue_path, archive)
+    finally:
+        metrics.finish(*(f"{os.path.splitext(path)[0]}.{pid}{os.path.splitext(path)[1]}" if path else None
+                         for path in (report, prometheus)))
+
+
+def run_queue_workers(queue_path: str, processes: int = 1, archive: bool = True,
+                      report: Optional[str] = None, prometheus: Optional[str] = None) -> None:
+    """在本机启动多个抓取进程，直到队列中没有待领取的分片；多进程时每个进程各自写出运行报告"""
+    import multiprocessing
+
+    if processes <= 1:
+        run_queue_worker(queue_path, archive)
+        return
+    workers = [multiprocessing.Process(target=_queue_worker_process, args=(queue_path, archive, report, prometheus))
+               for _ in range(processes)]
+    for proc in workers:
+        proc.start()
+    for proc in workers:
+        proc.join()
+
+
+def merge_queue(queue_path: str) -> Tuple[bool, Optional[str]]:
+    """按名单顺序把队列中已完成学生的成绩行合并为汇总表，写出 OUTPUT_EXCEL；返回(是否成功, 考试名称)"""
+    from score_table import ScoreTable
+
+    queue = WorkQueue(queue_path)
+    try:
+        progress = queue.progress()
+        if progress["pending"] or progress["failed"]:
+            print(f"⚠ 队列中还有 {progress['pending']} 名学生未抓取、{progress['failed']} 名抓取失败，"
+                  f"只合并已完成的 {progress['done']} 人")
+        for name, error in queue.failures():
+            print(f"  - 失败：{name}，{error}")
+        exam_names = queue.exam_names()
+        if len(exam_names) > 1:
+            print(f"⚠ 各学生页面上的考试名称不一致: {exam_names}，使用 {exam_names[0]}")
+        table = ScoreTable(capacity=progress["done"] + 1)
+        for record in queue.iter_results():
+            rows = record["rows"]
+            rows = rows[-2:] if not len(table) and len(rows) >= 2 else rows[-1:]
+            table.add(record["idx"], record["name"], record["columns"], rows)
+    finally:
+        queue.close()
+
+    if not len(table):
+        print("队列中没有已完成的学生，无法合并。")
+        return False, None
+    if table.drift:
+        print(f"⚠ 共有 {len(table.drift)} 名学生的成绩表列结构与首位学生不一致，详见上方提示。")
+    result = coerce_numeric_like(table.to_frame(), exclude_cols=NON_NUMERIC_COLS)
+    with stage("excel_write"):
+        rows = write_excel_rows(OUTPUT_EXCEL, list(result.columns), result.itertuples(index=False, name=None), sheet_name="汇总")
+    current().add_bytes("excel_write", os.path.getsize(OUTPUT_EXCEL))
+    print(f"✅ 已合并写出：{OUTPUT_EXCEL}，共 {rows} 行。")
+    return True, exam_names[0] if exam_names else None
+
+
+def run_queue_command(args: argparse.Namespace) -> None:
+    """分片抓取：建立队列、运行抓取进程、放回未完成的分片、合并汇总表（可组合，按此顺序执行）"""
+    if args.worker and PROMPT_CAPTCHA:
+        print("❌ 需要手动输入验证码，无法使用分片抓取。")
+        return
+    try:
+        if args.queue_init and not init_queue(args.queue, args.shard_size):
+            return
+        if args.queue_reset:
+            queue = WorkQueue(args.queue)
+            shards, students = queue.reset()
+            queue.close()
+            print(f"✅ 已放回 {shards} 个分片，待抓取 {students} 人")
+        if args.worker:
+            run_queue_workers(args.queue, args.worker, archive=not args.no_archive,
+                              report=args.report, prometheus=args.prometheus)
+        if args.merge:
+            success, exam_name = merge_queue(args.queue)
+            if success and exam_name:
+                moved_file = move_exam_file(exam_name, overwrite=True if args.overwrite else None)
+                if moved_file:
+                    print(f"\n✅ 合并完成! 文件已保存为: {moved_file}")
+            elif success:
+                print(f"\n⚠ 合并完成,但未能提取考试名称。文件保存在: {OUTPUT_EXCEL}")
+        print_queue_progress(args.queue)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+
+
+def print_queue_progress(queue_path: str) -> None:
+    queue = WorkQueue(queue_path)
+    progress = queue.progress()
+    queue.close()
+    print(f"队列进度: 已完成 {progress['done']} 人，失败 {progress['failed']} 人，待抓取 {progress['pending']} 人；"
+          f"分片共 {progress['shards']} 个，待领取 {progress['shards_pending']} 个，已领取未完成 {progress['shards_claimed']} 个")
+
+
+def show_status(args: argparse.Namespace) -> None:
+    """抓取进度日志、分片队列与考试库的概况（只读，抓取进行中也可查看）"""
+    if os.path.exists(JOURNAL_FILE):
+        done, exam_name = journal_progress(JOURNAL_FILE)
+        print(f"抓取进度: 已完成 {done} 人" + (f"，考试【{exam_name}】" if exam_name else "") + f"（{JOURNAL_FILE}）")
+    else:
+        print(f"抓取进度: 无（未找到 {JOURNAL_FILE}）")
+    if os.path.exists(args.queue):
+        print_queue_progress(args.queue)
+    if os.path.exists(EXAMS_DIR):
+        entries = ExamLibrary(EXAMS_DIR).refresh().entries()
+        latest = f"，最近一次: {entries[-1]['name']} ({describe_entry(entries[-1])})" if entries else ""
+        print(f"历次成绩: {len(entries)} 次考试{latest}")
+    else:
+        print(f"历次成绩: 目录不存在 ({EXAMS_DIR})")
+
 
+def serve_daemon(port: int = DAEMON_PORT, report: Optional[str] = RUN_REPORT_FILE,
+                 prometheus: Optional[str] = None) -> None:
+    """常驻进程：依赖只加载一次，连接池、限速器与考试解析缓存跨任务保持（协议见 score_daemon.py）
 
-def main() -> None:
+    每个任务单独计为一次运行，结束后写出运行报告。任务参数中的考试、汇总与数据库路径
+    须分别位于历次成绩目录、成绩汇总目录与默认数据库所在目录内。
+    """
+    from requests.adapters import HTTPAdapter
+    from rate_limiter import AdaptiveRateLimiter
+    from db_loader import DB_PATH
+    from scrape_engine import BudgetedSession, HostBudget
+    from score_daemon import ScoreDaemon, check_within
+    from summary_workbook import SUMMARY_DIR
+
+    load_now(pd, requests)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(SCRAPE_CONCURRENCY, HOST_REQUEST_BUDGET))
+    limiter = AdaptiveRateLimiter(RATE_INITIAL, RATE_MIN, RATE_MAX, slow_seconds=SLOW_RESPONSE_SECONDS)
+
+    def exam_file(params: Dict[str, Any]) -> Tuple[str, str]:
+        exam_name = str(params.get("exam") or "")
+        if not exam_name:
+            raise ValueError("缺少参数 exam（考试名称）")
+        path = check_within(EXAMS_DIR, os.path.join(EXAMS_DIR, f"{exam_name}.xlsx"), "考试")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"历次成绩中没有该考试: {path}")
+        return exam_name, path
+
+    def scrape(params: Dict[str, Any]) -> Dict[str, Any]:
+        if PROMPT_CAPTCHA:
+            raise RuntimeError("需要手动输入验证码，常驻进程无法抓取")
+        success, exam_name = scrape_scores_with_exam_name(resume=bool(params.get("resume", False)),
+                                                          archive=bool(params.get("archive", True)),
+                                                          adapter=adapter, limiter=limiter)
+        if not success:
+            raise RuntimeError("抓取失败")
+        moved = move_exam_file(exam_name, overwrite=bool(params.get("overwrite", False))) if exam_name else None
+        return {"exam_name": exam_name, "exam_file": moved or OUTPUT_EXCEL}
+
+    def scrape_student(params: Dict[str, Any]) -> Dict[str, Any]:
+        if PROMPT_CAPTCHA:
+            raise RuntimeError("需要手动输入验证码，常驻进程无法抓取")
+        if not params.get("login") or "password" not in params:
+            raise ValueError("缺少参数 login / password")
+        with BudgetedSession(HostBudget(HOST_REQUEST_BUDGET), adapter, limiter=limiter,
+                             retries=REQUEST_RETRIES) as sess:
+            df, exam_name = scrape_for_user(sess, str(params["login"]), str(params["password"]))
+        if df is None:
+            return {"exam_name": exam_name, "columns": [], "rows": []}
+        rows = df.astype(object).where(df.notna(), None).values.tolist()
+        return {"exam_name": exam_name, "columns": [str(col) for col in df.columns], "rows": rows}
+
+    def export(params: Dict[str, Any]) -> Dict[str, Any]:
+        exam_name, path = exam_file(params)
+        db = params.get("db")
+        if db:
+            db = check_within(os.path.dirname(DB_PATH) or ".", str(db), "数据库")
+        output = export_to_json(path, exam_name, compact=bool(params.get("compact", JSON_COMPACT)),
+                                delta=bool(params.get("delta", False)),
+                                delta_delete=bool(params.get("delta_delete", False)))
+        if output is None:
+            raise RuntimeError("生成导入 JSON 失败")
+        if db and not load_exam_into_db(path, str(db)):
+            raise RuntimeError(f"写入数据库失败: {db}")
+        return {"json": output, "db": db}
+
+    def summary(params: Dict[str, Any]) -> Dict[str, Any]:
+        exam_name, path = exam_file(params)
+        specs = params.get("student") or []
+        students = dict(parse_student(str(spec)) for spec in ([specs] if isinstance(specs, str) else specs)) or None
+        for summary_path in (students or {}).values():
+            check_within(SUMMARY_DIR, summary_path, "成绩汇总")
+        if not update_summary(path, exam_name, students, overwrite=bool(params.get("overwrite", False))):
+            raise RuntimeError("成绩汇总未更新")
+        return {"exam_name": exam_name, "students": list(students or [TARGET_STUDENT_NAME])}
+
+    def exams(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        library = ExamLibrary(EXAMS_DIR).refresh()
+        entries = library.exams_for_student(str(params["student"])) if params.get("student") else library.entries()
+        return [{key: value for key, value in entry.items() if key != "students"} for entry in entries]
+
+    def reported(name: str, job: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        def run(params: Dict[str, Any]) -> Any:
+            metrics = begin_run(name)
+            try:
+                return job(params)
+            finally:
+                metrics.finish(report, prometheus)
+        return run
+
+    jobs = {"scrape": scrape, "scrape_student": scrape_student, "export": export, "summary": summary, "exams": exams}
+    # 任务中才会用到的模块也在启动时加载，首个任务不再等待导入
+    daemon = ScoreDaemon({name: reported(name, job) for name, job in jobs.items()}, port=port,
+                         preload=["exam_cache", "import_json", "scrape_engine", "score_table", "pipeline",
+                                  "openpyxl", "bs4", "lxml.html"])
+    try:
+        daemon.serve_forever()
+    finally:
+        adapter.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="成绩抓取与汇总系统")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"从抓取进度日志({JOURNAL_FILE})续抓，跳过已完成的学生")
+    parser.add_argument("--stream-format", choices=STREAM_FORMATS, default=STREAM_FORMAT,
+                        help=f"流式输出格式，每名学生完成后立即追加到 {STREAM_OUTPUT_BASENAME}.<格式>")
+    parser.add_argument("--no-excel", action="store_true",
+                        help="仅抓取成绩时不生成汇总 Excel，只保留流式输出文件")
+    parser.add_argument("--no-archive", action="store_true",
+                        help=f"不保存原始响应存档({ARCHIVE_DIR})")
+    parser.add_argument("--replay", nargs="?", const="", metavar="考试名称",
+                        help="离线重放：不访问网络，从原始响应存档重跑解析、导出与汇总（省略考试名称时使用最近一次）")
+    parser.add_argument("--compact-json", action="store_true", default=JSON_COMPACT,
+                        help="导入 JSON 输出紧凑格式（不缩进）")
+    parser.add_argument("--db", metavar="数据库路径",
+                        help="生成导入 JSON 后直接将考试成绩批量写入该 SQLite 数据库，无需网页端导入")
+    parser.add_argument("--summary-student", action="append", default=[], metavar="姓名[=汇总路径]",
+                        help=f"成绩汇总改为批量更新这些学生（可重复指定；省略路径时为 ../成绩汇总_<姓名>.xlsx），"
+                             f"不指定时只更新【{TARGET_STUDENT_NAME}】")
+    parser.add_argument("--delta-delete", action="store_true",
+                        help="增量模式下把上次有、本次未出现的学生写入 deleted 以便删除，流水线写入数据库时同样删除（默认不删除；"
+                             "本次有学生未取得成绩时仍不删除）")
+    parser.add_argument("--delta", action="store_true",
+                        help="增量导入 JSON：只包含相对上次导出新增、有变化的学生，并生成 _import.manifest.json 清单")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="无交互流水线执行（不显示菜单）：抓取的同时生成导入 JSON、更新成绩汇总、写入数据库")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="流水线模式下覆盖已存在的考试文件与成绩汇总中的考试列（默认跳过）；--merge 时不询问直接覆盖考试文件")
+    parser.add_argument("--queue", default=QUEUE_FILE, metavar="队列文件",
+                        help="分片抓取工作队列 (SQLite) 路径，多台机器可共享同一文件 (默认 %(default)s)")
+    parser.add_argument("--queue-init", action="store_true",
+                        help="按名单建立分片抓取队列（跨班级名单按登录账号去重）")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="每个分片的学生数 (默认 %(default)s)")
+    parser.add_argument("--worker", type=int, nargs="?", const=1, default=0, metavar="进程数",
+                        help="作为抓取进程从队列领取分片，可指定本机进程数；其他机器可同时对同一队列运行")
+    parser.add_argument("--queue-reset", action="store_true",
+                        help="把已领取未完成的分片与抓取失败的学生放回队列（确认各抓取进程已退出后使用）")
+    parser.add_argument("--merge", action="store_true",
+                        help="按名单顺序把队列中的成绩合并为汇总表，并移动到历次成绩目录")
+    parser.add_argument("--report", default=RUN_REPORT_FILE, metavar="报告路径",
+                        help="运行结束后写出 JSON 运行报告：各阶段耗时直方图、字节数、重试次数与逐个学生的结果"
+                             "（默认 %(default)s，空字符串不写出）")
+    parser.add_argument("--prometheus", metavar="文件路径",
+                        help="同时写出 Prometheus 文本格式的运行指标（如 node_exporter textfile 目录下的 .prom 文件）")
+    parser.add_argument("--serve", type=int, nargs="?", const=DAEMON_PORT, metavar="端口",
+                        help=f"启动常驻进程 (默认端口 {DAEMON_PORT})，保持依赖、连接池与考试解析缓存，"
+                             f"由 score_daemon.py 提交抓取/导出/汇总任务")
+    # 只读查询子命令：不加载 pandas / requests / openpyxl，适合脚本或定时任务频繁调用
+    commands = parser.add_subparsers(dest="command", metavar="子命令")
+    exams = commands.add_parser("exams", help="按考试库清单列出历次成绩中的考试")
+    exams.add_argument("--student", metavar="姓名或考号", help="只列出该学生参加过的考试")
+    commands.add_parser("status", help="查看抓取进度、分片队列与考试库概况")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """主函数 - 交互式菜单"""
+    args = parse_args(argv)
+    if args.command == "exams":
+        list_exams(EXAMS_DIR, args.student)
+        return
+    if args.command == "status":
+        show_status(args)
+        return
+    if args.serve is not None:
+        serve_daemon(args.serve, args.report, args.prometheus)
+        return
+    summary_students = dict(parse_student(spec) for spec in args.summary_student) or None
+
+    queue_command = args.queue_init or args.queue_reset or args.worker or args.merge
+    metrics = begin_run("queue" if queue_command else "pipeline" if args.pipeline else "menu")
+    try:
+        run_command(args, summary_students)
+    finally:
+        metrics.finish(args.report, args.prometheus)
+
+
+def run_command(args: argparse.Namespace, summary_students: Optional[Dict[str, str]]) -> None:
+    """执行分片抓取命令、无交互流水线或菜单中选择的操作"""
+    if args.queue_init or args.queue_reset or args.worker or args.merge:
+        run_queue_command(args)
+        return
+
+    if args.pipeline:
+        sys.exit(0 if run_pipeline(args, summary_students) else 1)
+
     # 显示菜单并获取用户选择
     choice = show_menu()
+    current().run = {'1': "full", '2': "scrape", '3': "summary", '4': "export"}.get(choice, "menu")
 
     if choice == '0':
         print("退出程序。")
@@ -938,9 +1739,13 @@ def main() -> None:
     elif choice == '2':
         # 仅抓取成绩
         print("\n开始抓取成绩...")
-        success, exam_name = scrape_scores_with_exam_name()
+        success, exam_name = scrape_scores_with_exam_name(resume=args.resume, stream_format=args.stream_format,
+                                                          write_excel=not args.no_excel,
+                                                          archive=not args.no_archive, replay=args.replay)
 
-        if success and exam_name:
+        if success and args.no_excel:
+            print(f"\n✅ 抓取完成! 成绩已流式写出到: {stream_output_path(args.stream_format)}")
+        elif success and exam_name:
             # 移动文件到上级目录
             moved_file = move_exam_file(exam_name)
             if moved_file:
@@ -964,7 +1769,7 @@ def main() -> None:
         print(f"使用考试名称: {exam_name}")
 
         # 更新成绩汇总
-        if update_summary(exam_file, exam_name):
+        if update_summary(exam_file, exam_name, summary_students):
             print(f"\n✅ 成绩汇总更新完成!")
         else:
             print("\n❌ 成绩汇总更新失败!")
@@ -975,7 +1780,9 @@ def main() -> None:
 
         # 步骤1: 抓取成绩
         print("\n[步骤 1/3] 抓取成绩...")
-        success, exam_name = scrape_scores_with_exam_name()
+        # 后续汇总步骤需要 Excel，完整执行时始终生成
+        success, exam_name = scrape_scores_with_exam_name(resume=args.resume, stream_format=args.stream_format,
+                                                          archive=not args.no_archive, replay=args.replay)
 
         if not success:
             print("\n❌ 抓取失败,终止流程。")
@@ -994,18 +1801,28 @@ def main() -> None:
 
         # 步骤3: 更新成绩汇总
         print(f"\n[步骤 3/4] 更新成绩汇总...")
-        update_summary(moved_file, exam_name)
+        update_summary(moved_file, exam_name, summary_students)
 
         # 步骤4: 生成 JSON
         print(f"\n[步骤 4/4] 生成导入 JSON...")
-        json_file = export_to_json(moved_file, exam_name)
+        json_file = export_to_json(moved_file, exam_name, compact=args.compact_json, delta=args.delta,
+                                   delta_delete=args.delta_delete)
+        if args.db:
+            # 增量模式下按 --delta-delete 删除数据库中已不在本次抓取结果里的学生（与流水线一致）
+            load_exam_into_db(moved_file, args.db,
+                              replace=deletions_allowed(args.delta and args.delta_delete, current().failed_students()))
 
         print(f"\n{'='*60}")
         print("✅ 完整执行成功!")
         print(f"考试文件: {moved_file}")
-        if json_file:
+        if args.db:
+            print(f"数据库: {args.db}")
+        elif json_file:
             print(f"导入 JSON: {json_file} (请在网页端导入)")
-        print(f"已更新【{TARGET_STUDENT_NAME}】的成绩到成绩汇总.xlsx")
+        if summary_students:
+            print(f"已更新 {len(summary_students)} 名学生的成绩汇总")
+        else:
+            print(f"已更新【{TARGET_STUDENT_NAME}】的成绩到成绩汇总.xlsx")
         print(f"{'='*60}")
 
     elif choice == '4':
@@ -1016,7 +1833,10 @@ def main() -> None:
             return
         
         exam_name = os.path.basename(exam_file).replace('.xlsx', '')
-        export_to_json(exam_file, exam_name)
+        export_to_json(exam_file, exam_name, compact=args.compact_json, delta=args.delta,
+                       delta_delete=args.delta_delete)
+        if args.db:
+            load_exam_into_db(exam_file, args.db, replace=args.delta and args.delta_delete)
 
 
 # 保留原有的main函数作为兼容性(已废弃)
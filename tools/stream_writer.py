@@ -0,0 +1,137 @@
+"""
+流式写出抓取结果
+
+- RowStreamWriter: 每名学生抓取完成后立即追加写出一行，支持 csv / jsonl / parquet
+  (parquet 按行组缓冲写出，需要安装 pyarrow)
+- write_excel_rows: 以 openpyxl 只写模式逐行写出 Excel，不在内存中拼整张表
+内存占用只与单行或单个行组大小有关，与抓取人数无关。
+"""
+import csv
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+STREAM_FORMATS = ("csv", "jsonl", "parquet")
+
+
+def _plain(value: Any) -> Any:
+    """numpy 标量转 Python 原生类型，NaN 转 None"""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class RowStreamWriter:
+    """逐行追加写出成绩行。首行确定表头，之后出现的新列会打印提示。"""
+
+    def __init__(self, path: str, fmt: str = "csv", *, row_group_size: int = 500):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}，可选 {', '.join(STREAM_FORMATS)}")
+        self.path = path
+        self.fmt = fmt
+        self.row_group_size = max(1, int(row_group_size))
+        self.rows_written = 0
+        self._columns: Optional[List[str]] = None
+        self._dropped: Dict[str, None] = {}
+        self._buffer: List[Dict[str, Any]] = []
+        self._parquet_writer = None
+        self._parquet_schema = None
+        self._fh = None
+        self._csv = None
+        if fmt == "csv":
+            # utf-8-sig 便于直接用 Excel 打开
+            self._fh = open(path, "w", encoding="utf-8-sig", newline="")
+            self._csv = csv.writer(self._fh)
+        elif fmt == "jsonl":
+            self._fh = open(path, "w", encoding="utf-8")
+        else:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("写出 parquet 需要安装 pyarrow: pip install pyarrow")
+
+    @property
+    def columns(self) -> Optional[List[str]]:
+        return self._columns
+
+    def write_rows(self, columns: Iterable[Any], rows: Iterable[Iterable[Any]]) -> None:
+        """追加一名学生的成绩行"""
+        cols = [str(c) for c in columns]
+        if self._columns is None:
+            self._columns = cols
+            if self._csv is not None:
+                self._csv.writerow(cols)
+        elif self.fmt != "jsonl":
+            for col in cols:
+                if col not in self._columns and col not in self._dropped:
+                    self._dropped[col] = None
+                    print(f"  ⚠ 新出现的列【{col}】不在 {self.fmt} 表头中，该列未写入流式输出")
+
+        for row in rows:
+            record = {col: _plain(v) for col, v in zip(cols, row)}
+            if self.fmt == "csv":
+                self._csv.writerow(["" if record.get(col) is None else record.get(col) for col in self._columns])
+            elif self.fmt == "jsonl":
+                self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                self._buffer.append(record)
+                if len(self._buffer) >= self.row_group_size:
+                    self._flush_row_group()
+            self.rows_written += 1
+        if self._fh is not None:
+            self._fh.flush()
+
+    def _parquet_value(self, value: Any, numeric: bool) -> Any:
+        if value is None:
+            return None
+        if numeric:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        return str(value)
+
+    def _flush_row_group(self) -> None:
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self._parquet_schema is None:
+            # 首个行组确定列类型：全部为数值的列存为 double，其余存为字符串
+            fields = []
+            for col in self._columns:
+                values = [r.get(col) for r in self._buffer if r.get(col) is not None]
+                numeric = bool(values) and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+                fields.append(pa.field(col, pa.float64() if numeric else pa.string()))
+            self._parquet_schema = pa.schema(fields)
+            self._parquet_writer = pq.ParquetWriter(self.path, self._parquet_schema)
+        arrays = {}
+        for field in self._parquet_schema:
+            numeric = pa.types.is_floating(field.type)
+            arrays[field.name] = [self._parquet_value(r.get(field.name), numeric) for r in self._buffer]
+        self._parquet_writer.write_table(pa.Table.from_pydict(arrays, schema=self._parquet_schema))
+        self._buffer = []
+
+    def close(self) -> None:
+        if self.fmt == "parquet":
+            self._flush_row_group()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+        if self._fh is not None:
+            self._fh.close()
+
+
+def write_excel_rows(path: str, columns: List[str], rows: Iterable[List[Any]], sheet_name: str = "汇总") -> int:
+    """以只写模式逐行写出 Excel，返回写出的数据行数"""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+    count = 0
+    for row in rows:
+        ws.append([_plain(v) for v in row])
+        count += 1
+    wb.save(path)
+    return count
@@ -0,0 +1,247 @@
+"""
+成绩汇总工作簿批量更新
+
+- SummaryWorkbook: 打开一次成绩汇总工作簿（“考试详情”表），指标行与考试列的索引只建立一次，
+  可连续写入多次考试，最后保存一次；新建考试列时整列复制前一列的样式
+- read_exam_scores: 每个考试文件只读取一次，按姓名与考号建立全班成绩行索引
+- batch_update_summaries: 多名学生 × 多次考试，每个汇总工作簿只打开、保存各一次；
+  各学生的汇总互不相关，可用进程池并行更新（workers > 1）
+
+用法:
+    python summary_workbook.py --exams 历次成绩/某次考试.xlsx ... --student 张三 --student 李四=路径/汇总.xlsx
+    python summary_workbook.py --all --student 张三 --overwrite
+    python summary_workbook.py --exams 某次考试.xlsx --class --template 汇总模板.xlsx --workers 8
+未指定汇总路径时使用 ../成绩汇总_<姓名>.xlsx；--student 也可直接写考号。
+--class 为考试文件中的全部学生各生成一份汇总，汇总文件不存在时从 --template 复制。
+"""
+import argparse
+import glob
+import os
+import shutil
+from copy import copy
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+SUMMARY_SHEET = "考试详情"
+EXAMS_DIR = os.path.join("..", "历次成绩")
+SUMMARY_DIR = ".."
+
+
+def clean_indicator(text: Any) -> str:
+    """指标名称规范化：移除制表符、空格等,并统一字符(其他->其它)"""
+    return str(text).strip().replace('\t', '').replace(' ', '').replace('其他', '其它')
+
+
+def _student_id(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value).split('.')[0]
+
+
+def read_exam_scores(excel_path: str) -> Dict[str, Dict[str, Any]]:
+    """读取考试文件“汇总”表，返回 姓名 / 考号 -> {指标: 成绩}（同名取第一行）"""
+    from exam_cache import read_exam_sheet
+
+    df = read_exam_sheet(excel_path)
+    df.columns = [clean_indicator(col) for col in df.columns]
+    df = df.drop_duplicates(subset="姓名", keep="first")
+    columns = list(df.columns)
+    name_pos = columns.index("姓名")
+    id_pos = columns.index("考号") if "考号" in columns else None
+    index: Dict[str, Dict[str, Any]] = {}
+    for row in df.itertuples(index=False, name=None):
+        scores = dict(zip(columns, row))
+        index[str(row[name_pos])] = scores
+        student_id = _student_id(row[id_pos]) if id_pos is not None else None
+        if student_id:
+            index.setdefault(student_id, scores)
+    return index
+
+
+def class_students(exam_scores: List[Dict[str, Dict[str, Any]]]) -> List[str]:
+    """考试文件中出现过的全部学生姓名（保持首次出现的顺序）"""
+    names: Dict[str, None] = {}
+    for index in exam_scores:
+        for scores in index.values():
+            names.setdefault(str(scores["姓名"]), None)
+    return list(names)
+
+
+class SummaryWorkbook:
+    """单个成绩汇总工作簿，可连续写入多次考试后一次保存"""
+
+    def __init__(self, path: str, sheet_name: str = SUMMARY_SHEET):
+        from openpyxl import load_workbook
+
+        self.path = path
+        # 使用openpyxl打开,保留所有格式
+        self.wb = load_workbook(path)
+        self.ws = self.wb[sheet_name]
+        # 第一列(指标名称) -> 行号
+        self.indicator_to_row: Dict[str, int] = {}
+        for row_idx, (value,) in enumerate(self.ws.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+            if value:
+                self.indicator_to_row[clean_indicator(value)] = row_idx
+        # 第一行(考试名称) -> 列号
+        self.exam_to_col: Dict[str, int] = {}
+        for col_idx, (value,) in enumerate(self.ws.iter_cols(min_row=1, max_row=1, values_only=True), start=1):
+            if value is not None:
+                self.exam_to_col.setdefault(str(value), col_idx)
+        self.dirty = False
+
+    def has_exam(self, exam_name: str) -> bool:
+        return str(exam_name) in self.exam_to_col
+
+    def _add_exam_column(self, exam_name: str) -> int:
+        """在最后一列之后新建考试列，复制前一列的格式(不包括值)"""
+        exam_col = self.ws.max_column + 1
+        prev_col = exam_col - 1
+        for row_idx in range(1, self.ws.max_row + 1):
+            source_cell = self.ws.cell(row=row_idx, column=prev_col)
+            if source_cell.has_style:
+                self.ws.cell(row=row_idx, column=exam_col)._style = copy(source_cell._style)
+        self.ws.cell(row=1, column=exam_col, value=exam_name)
+        self.exam_to_col[str(exam_name)] = exam_col
+        return exam_col
+
+    def write_scores(self, exam_name: str, scores: Mapping[str, Any], overwrite: bool = False,
+                     *, log: Callable[[str], None] = print) -> Optional[int]:
+        """写入一次考试的成绩，返回匹配的指标数；考试已存在且不覆盖时返回 None"""
+        exam_col = self.exam_to_col.get(str(exam_name))
+        if exam_col is None:
+            exam_col = self._add_exam_column(exam_name)
+            log(f"  → 创建新列: 第{exam_col}列(已复制格式)")
+        elif not overwrite:
+            log("  → 考试已存在,跳过")
+            return None
+        else:
+            log(f"  → 覆盖现有列: 第{exam_col}列")
+
+        matched_count = 0
+        for indicator, value in scores.items():
+            row_idx = self.indicator_to_row.get(clean_indicator(indicator))
+            if row_idx is not None:
+                self.ws.cell(row=row_idx, column=exam_col, value=value)
+                matched_count += 1
+        self.dirty = True
+        log(f"  → 匹配了 {matched_count} 个指标")
+        return matched_count
+
+    def save(self) -> None:
+        if self.dirty:
+            self.wb.save(self.path)
+            self.dirty = False
+
+
+def _update_student(student_name: str, summary_path: str, exams: List[Tuple[str, Optional[Dict[str, Any]]]],
+                    overwrite: Union[bool, Callable[[str, str], bool]], template: Optional[str],
+                    log: Callable[[str], None]) -> Optional[int]:
+    """打开一名学生的汇总，写入各次考试后保存一次；返回写入的考试数，汇总不存在时返回 None"""
+    if not os.path.exists(summary_path):
+        if not template:
+            log(f"⚠ 未找到【{student_name}】的成绩汇总文件: {summary_path}，跳过")
+            return None
+        shutil.copyfile(template, summary_path)
+    log(f"\n【{student_name}】{summary_path}")
+    book = SummaryWorkbook(summary_path)
+    written = 0
+    for exam_name, scores in exams:
+        if scores is None:
+            log(f"  ⚠ {exam_name}: 未找到该学生的成绩")
+            continue
+        log(f"  {exam_name}:")
+        allow = overwrite
+        if callable(overwrite):
+            allow = book.has_exam(exam_name) and overwrite(student_name, exam_name)
+        if book.write_scores(exam_name, scores, allow, log=lambda msg: log(f"  {msg}")) is not None:
+            written += 1
+    book.save()
+    return written
+
+
+def _update_student_task(student_name: str, summary_path: str, exams: List[Tuple[str, Optional[Dict[str, Any]]]],
+                         overwrite: bool, template: Optional[str]) -> Tuple[Optional[int], List[str]]:
+    """进程池任务：输出收集后交由主进程按学生顺序打印"""
+    lines: List[str] = []
+    return _update_student(student_name, summary_path, exams, overwrite, template, lines.append), lines
+
+
+def batch_update_summaries(students: Mapping[str, str], exam_files: List[str],
+                           overwrite: Union[bool, Callable[[str, str], bool]] = False, *,
+                           workers: int = 1, template: Optional[str] = None,
+                           whole_class: bool = False) -> Dict[str, int]:
+    """把多次考试中多名学生的成绩写入各自的汇总工作簿
+
+    students 为 姓名或考号 -> 汇总工作簿路径；overwrite 可为 (学生, 考试名称) -> 是否覆盖 的回调
+    （需要交互，此时不使用进程池）。每个考试文件读取一次，每个汇总工作簿打开、保存各一次；
+    workers > 1 时各学生的汇总在进程池中并行更新；whole_class 时再加入考试文件中的全部学生
+    （汇总路径为 ../成绩汇总_<姓名>.xlsx）。返回 学生 -> 写入的考试数。"""
+    exams: List[Tuple[str, Dict[str, Dict[str, Any]]]] = []
+    for exam_file in exam_files:
+        exam_name = os.path.splitext(os.path.basename(exam_file))[0]
+        exams.append((exam_name, read_exam_scores(exam_file)))
+    if whole_class:
+        students = dict(students)
+        for name in class_students([index for _, index in exams]):
+            students.setdefault(*parse_student(name))
+    # 每名学生只携带自己的成绩行
+    jobs = [(student, path, [(exam_name, index.get(student)) for exam_name, index in exams])
+            for student, path in students.items()]
+
+    written: Dict[str, int] = {}
+    if workers <= 1 or callable(overwrite) or len(jobs) <= 1:
+        for student, path, student_exams in jobs:
+            count = _update_student(student, path, student_exams, overwrite, template, print)
+            if count is not None:
+                written[student] = count
+        return written
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(_update_student_task, student, path, student_exams, overwrite, template)
+                   for student, path, student_exams in jobs]
+        for (student, _, _), future in zip(jobs, futures):
+            count, lines = future.result()
+            for line in lines:
+                print(line)
+            if count is not None:
+                written[student] = count
+    return written
+
+
+def parse_student(spec: str) -> Tuple[str, str]:
+    """姓名[=汇总路径]"""
+    name, _, path = spec.partition("=")
+    return name, path or os.path.join(SUMMARY_DIR, f"成绩汇总_{name}.xlsx")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="批量更新多名学生、多次考试的成绩汇总工作簿")
+    parser.add_argument("--exams", nargs="*", default=[], help="考试文件 (.xlsx)")
+    parser.add_argument("--all", action="store_true", help=f"使用 {EXAMS_DIR} 目录下全部考试文件")
+    parser.add_argument("--student", action="append", default=[], metavar="姓名或考号[=汇总路径]",
+                        help="学生及其成绩汇总文件，可重复指定")
+    parser.add_argument("--class", dest="whole_class", action="store_true",
+                        help="为考试文件中的全部学生各更新一份汇总 (../成绩汇总_<姓名>.xlsx)")
+    parser.add_argument("--template", help="汇总文件不存在时复制的模板工作簿（含“考试详情”表的指标列）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行更新的进程数 (默认 %(default)s)")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖汇总中已存在的考试列")
+    args = parser.parse_args(argv)
+
+    exam_files = list(args.exams)
+    if args.all:
+        exam_files += sorted(p for p in glob.glob(os.path.join(EXAMS_DIR, "*.xlsx"))
+                             if not os.path.basename(p).startswith("~$"))
+    if not exam_files or not (args.student or args.whole_class):
+        parser.error("需要至少一个考试文件 (--exams/--all) 和学生 (--student/--class)")
+    if args.template and not os.path.exists(args.template):
+        parser.error(f"未找到模板工作簿: {args.template}")
+
+    students = dict(parse_student(spec) for spec in args.student)
+    written = batch_update_summaries(students, exam_files, args.overwrite, workers=args.workers,
+                                     template=args.template, whole_class=args.whole_class)
+    print(f"\n✅ 已更新 {len(written)} 份成绩汇总，共写入 {sum(written.values())} 次考试")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""tools 下的脚本按目录内模块互相导入（import pipeline 等），测试时同样把 tools 目录加入 sys.path"""
+import os
+import sys
+
+# 测试读取仓库中的样例考试文件，不在其旁边写出解析缓存
+os.environ["EXAM_CACHE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+import pytest
+
+from db_loader import load_files
+from exam_stats import refresh_exam_stats
+
+SAMPLE_EXAM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2025年12月月考.xlsx")
+
+# 网页端 (src/services/scoreService.ts) 无预计算统计时的实时聚合
+LIVE_GRADE_AVG = """
+    SELECT ss.subject, AVG(ss.score) FROM subject_scores ss JOIN exam_results er ON ss.result_id = er.id
+    WHERE er.exam_id = ? GROUP BY ss.subject
+"""
+LIVE_CLASS_AVG = """
+    SELECT ss.subject, AVG(ss.score) FROM subject_scores ss JOIN exam_results er ON ss.result_id = er.id
+    WHERE er.exam_id = ? AND er.class_at_exam = ? GROUP BY ss.subject
+"""
+LIVE_MAX_RANK = """
+    SELECT ss.subject, MAX(ss.grade_rank) FROM subject_scores ss JOIN exam_results er ON ss.result_id = er.id
+    WHERE er.exam_id = ? GROUP BY ss.subject
+"""
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db = str(tmp_path / "scores.db")
+    load_files([SAMPLE_EXAM], db)
+    conn = sqlite3.connect(db)
+    yield conn
+    conn.close()
+
+
+def test_precomputed_stats_match_live_aggregation(conn):
+    exam_id = conn.execute("SELECT id FROM exams").fetchone()[0]
+    # 文本成绩（如“缺考”）：两条路径须按同一规则处理
+    result_id, subject = conn.execute("SELECT result_id, subject FROM subject_scores LIMIT 1").fetchone()
+    conn.execute("UPDATE subject_scores SET score = '缺考' WHERE result_id = ? AND subject = ?", (result_id, subject))
+    refresh_exam_stats(conn, exam_id)
+
+    stats = {(subject, cls): (avg, max_rank) for subject, cls, avg, max_rank in conn.execute(
+        "SELECT subject, class, avg_score, max_grade_rank FROM exam_stats WHERE exam_id = ?", (exam_id,))}
+    for subject, avg in conn.execute(LIVE_GRADE_AVG, (exam_id,)):
+        assert stats[(subject, "")][0] == pytest.approx(avg)
+    for subject, max_rank in conn.execute(LIVE_MAX_RANK, (exam_id,)):
+        assert stats[(subject, "")][1] == max_rank
+    classes = [cls for (cls,) in conn.execute("SELECT DISTINCT class_at_exam FROM exam_results WHERE exam_id = ? "
+                                              "AND class_at_exam IS NOT NULL", (exam_id,))]
+    assert classes
+    for cls in classes:
+        for subject, avg in conn.execute(LIVE_CLASS_AVG, (exam_id, cls)):
+            assert stats[(subject, cls)][0] == pytest.approx(avg)
@@ -0,0 +1,77 @@
+import copy
+import json
+import os
+
+import pytest
+
+from db_loader import load_files
+from exam_cache import read_exam_sheet
+from import_delta import delta_filter, manifest_path
+from import_json import structured_records
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 仓库中的样例考试：两次考试的学生有重叠，后导入的考试会改写共用的 students 行
+SAMPLE_EXAMS = [
+    os.path.join(TOOLS_DIR, "..", "2025-2026学年上学期期终考试.xlsx"),
+    os.path.join(TOOLS_DIR, "2025年12月月考.xlsx"),
+    os.path.join(TOOLS_DIR, "2025-2026学年下学期4月考试.xlsx"),
+]
+
+
+def exam_records(path):
+    return list(structured_records(read_exam_sheet(path)))
+
+
+def exam_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+@pytest.fixture(scope="module")
+def loaded_db(tmp_path_factory):
+    db = str(tmp_path_factory.mktemp("db") / "scores.db")
+    load_files(SAMPLE_EXAMS, db)
+    return db
+
+
+@pytest.mark.parametrize("path", SAMPLE_EXAMS, ids=exam_name)
+def test_db_delta_is_empty_right_after_load(loaded_db, tmp_path, path):
+    tracker = delta_filter(str(tmp_path / "x_import.json"), exam_name(path), loaded_db)
+    records = exam_records(path)
+    kept = [record for record in records if tracker.keep(record)]
+    assert kept == []
+    assert (tracker.new, tracker.changed, tracker.missing) == ([], [], [])
+    assert tracker.unchanged == len({r["student_info"]["id"] for r in records})
+
+
+def test_db_delta_reports_changed_score(loaded_db, tmp_path):
+    path = SAMPLE_EXAMS[0]
+    records = copy.deepcopy(exam_records(path))
+    records[0]["subjects"][0]["score"] = -1
+    tracker = delta_filter(str(tmp_path / "x_import.json"), exam_name(path), loaded_db)
+    kept = [record for record in records if tracker.keep(record)]
+    assert [tracker.changed, len(kept)] == [[records[0]["student_info"]["id"]], 1]
+
+
+def test_missing_students_are_not_deleted_by_default(tmp_path):
+    output = str(tmp_path / "E_import.json")
+    records = exam_records(SAMPLE_EXAMS[1])
+    first = delta_filter(output, "E")
+    for record in records:
+        first.keep(record)
+    first.write_manifest(manifest_path(output), "E", "2026-01-01", output)
+
+    partial = delta_filter(output, "E")
+    for record in records[2:]:
+        partial.keep(record)
+    missing = [r["student_info"]["id"] for r in records[:2]]
+    assert partial.missing == missing and partial.deleted == []
+    manifest = partial.write_manifest(manifest_path(output), "E", "2026-01-01", output)
+    # 未删除的学生沿用上次的哈希，下一次完整导出时不算新增
+    with open(manifest_path(output), encoding="utf-8") as f:
+        assert set(json.load(f)["hashes"]) == {r["student_info"]["id"] for r in records}
+    assert manifest["counts"]["deleted"] == 0
+
+    explicit = delta_filter(output, "E", deletions=True)
+    for record in records[2:]:
+        explicit.keep(record)
+    assert explicit.deleted == missing
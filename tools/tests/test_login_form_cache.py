@@ -0,0 +1,46 @@
+import importlib
+
+import pytest
+import requests
+
+from bench_scraper import VALID_PASSWORD, StandInServer
+from login_cache import LoginFormCache
+
+
+@pytest.fixture(params=["scrape_scores", "scrape_scores_json"])
+def scraper(request, monkeypatch):
+    module = importlib.import_module(request.param)
+    with StandInServer() as server:
+        monkeypatch.setattr(module, "LOGIN_URL", server.login_url)
+        monkeypatch.setattr(module, "PROMPT_CAPTCHA", False)
+        monkeypatch.setattr(module, "_login_form_cache", LoginFormCache())
+        yield module, server
+
+
+def test_wrong_password_keeps_cached_form(scraper):
+    module, server = scraper
+    with requests.Session() as session:
+        df, _ = module.scrape_for_user(session, "学生1", VALID_PASSWORD)
+        assert df is not None
+        cached = module._login_form_cache.get(server.login_url)
+        module._login_form_cache.store(server.login_url, cached)
+        gets = server.counts["GET"]
+        for _ in range(3):
+            assert module.scrape_for_user(session, "学生2", "wrong") == (None, None)
+        # 密码错误：失败页面的登录表单与缓存一致，不重新 GET 登录页，也不作废缓存
+        assert server.counts["GET"] == gets
+        assert module._login_form_cache.get(server.login_url) == cached
+
+
+def test_changed_form_invalidates_and_retries(scraper):
+    module, server = scraper
+    with requests.Session() as session:
+        module.scrape_for_user(session, "学生1", VALID_PASSWORD)
+        fresh = module._login_form_cache.get(server.login_url)
+        # 模拟站点改了密码字段名：按缓存的旧字段名提交会失败，失败页面上的表单与缓存不一致
+        module._login_form_cache.store(server.login_url, dict(fresh, password="oldpwd"))
+        gets = server.counts["GET"]
+        df, _ = module.scrape_for_user(session, "学生1", VALID_PASSWORD)
+        assert df is not None
+        assert server.counts["GET"] == gets + 1
+        assert module._login_form_cache.get(server.login_url) == fresh
@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from pipeline import JsonExportStage, Pipeline, Stage, SummaryStage
+
+EXAM = "测试考试"
+COLUMNS = ["姓名", "考号", "总分"]
+
+
+def frame(columns, rows):
+    return pd.DataFrame(rows, columns=columns)
+
+
+def run(stages, students, abort=False):
+    pipeline = Pipeline(stages, frame)
+    for name, student_id, total in students:
+        pipeline.feed(EXAM, COLUMNS, [[name, student_id, total]])
+    return pipeline, pipeline.close(abort=abort)
+
+
+class RecordingStage(Stage):
+    name = "记录"
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def start(self, exam_name):
+        self.calls.append("start")
+
+    def rows(self, frame):
+        name = frame.iloc[0]["姓名"]
+        if name == self.fail_on:
+            raise RuntimeError("boom")
+        self.calls.append(name)
+
+    def finish(self):
+        self.calls.append("finish")
+
+    def abort(self):
+        self.calls.append("abort")
+
+
+def test_failed_stage_is_aborted_and_others_finish():
+    failing, healthy = RecordingStage(fail_on="乙"), RecordingStage()
+    pipeline, ok = run([failing, healthy], [("甲", "1", 500), ("乙", "2", 480), ("丙", "3", 470)])
+    assert not ok
+    assert failing.calls == ["start", "甲", "abort"]
+    assert healthy.calls == ["start", "甲", "乙", "丙", "finish"]
+    assert str(pipeline.errors["记录"]) == "boom"
+
+
+def failing_records(frame):
+    if frame.iloc[0]["姓名"] == "乙":
+        raise RuntimeError("boom")
+    yield {"name": frame.iloc[0]["姓名"]}
+
+
+def test_json_export_failure_keeps_previous_output(tmp_path):
+    output = tmp_path / f"{EXAM}_import.json"
+    output.write_text("previous", encoding="utf-8")
+    stage = JsonExportStage(str(tmp_path), failing_records)
+    _, ok = run([stage], [("甲", "1", 500), ("乙", "2", 480)])
+    assert not ok
+    assert stage.writer._fh.closed
+    assert not os.path.exists(f"{output}.tmp")
+    assert output.read_text(encoding="utf-8") == "previous"
+
+
+@pytest.fixture
+def summary(tmp_path):
+    path = str(tmp_path / "成绩汇总_甲.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "考试详情"
+    ws.append(["指标"])
+    ws.append(["总分"])
+    wb.save(path)
+    return path
+
+
+def test_summary_is_untouched_when_scrape_aborts(summary):
+    before = open(summary, "rb").read()
+    run([SummaryStage({"甲": summary})], [("甲", "1", 500)], abort=True)
+    assert open(summary, "rb").read() == before
+
+
+def test_summary_is_written_on_finish(summary):
+    stage = SummaryStage({"甲": summary})
+    _, ok = run([stage], [("甲", "1", 500)])
+    assert ok
+    assert stage.updated == ["甲"]
+    ws = load_workbook(summary)["考试详情"]
+    assert ws.cell(row=1, column=2).value == EXAM
+    assert ws.cell(row=2, column=2).value == 500
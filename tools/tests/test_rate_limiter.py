@@ -0,0 +1,17 @@
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_backoffs_count_only_actual_decreases():
+    limiter = AdaptiveRateLimiter(initial_rate=2.0, min_rate=0.5, cooldown=3600.0, log=lambda msg: None)
+    assert limiter.record(0.1, status=503) is False
+    assert limiter.rate == 1.0 and limiter.backoffs == 1
+    # 冷却期内的失败不再回退，也不计数
+    assert limiter.record(0.1, status=503) is False
+    assert limiter.rate == 1.0 and limiter.backoffs == 1
+
+
+def test_backoffs_not_counted_at_min_rate():
+    limiter = AdaptiveRateLimiter(initial_rate=0.5, min_rate=0.5, cooldown=0.0, log=lambda msg: None)
+    for _ in range(3):
+        limiter.record(0.1, status=500)
+    assert limiter.rate == 0.5 and limiter.backoffs == 0
@@ -0,0 +1,76 @@
+import http.client
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+from score_daemon import ScoreDaemon, check_within, send_job
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    calls = []
+    daemon = ScoreDaemon({"echo": lambda params: calls.append(params) or params}, port=0,
+                         token_file=str(tmp_path / "daemon.token"))
+    daemon.calls = calls
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.server.shutdown()
+    thread.join()
+
+
+def post(daemon, headers, body=b'{"x": 1}'):
+    conn = http.client.HTTPConnection(*daemon.server.server_address[:2])
+    try:
+        conn.request("POST", "/echo", body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read().decode("utf-8"))
+    finally:
+        conn.close()
+
+
+def test_token_file_is_private_and_removed_on_exit(tmp_path):
+    path = str(tmp_path / "daemon.token")
+    daemon = ScoreDaemon({}, port=0, token_file=path)
+    assert open(path, encoding="utf-8").read() == daemon.token
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    threading.Timer(0.1, daemon.server.shutdown).start()
+    daemon.serve_forever()
+    assert not os.path.exists(path)
+
+
+def test_simple_cross_site_post_is_rejected(daemon):
+    # 网页无需预检即可发送的 text/plain 请求
+    status, body = post(daemon, {"Content-Type": "text/plain", "X-Score-Token": daemon.token})
+    assert status == 415 and not body["ok"]
+    assert daemon.calls == []
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_post_without_valid_token_is_rejected(daemon, token):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["X-Score-Token"] = token
+    status, body = post(daemon, headers)
+    assert status == 403 and not body["ok"]
+    assert daemon.calls == []
+
+
+def test_client_with_token_runs_job(daemon):
+    host, port = daemon.server.server_address[:2]
+    response = send_job("echo", {"x": 1}, host=host, port=port, token=daemon.token)
+    assert response["ok"] and response["result"] == {"x": 1}
+    assert daemon.calls == [{"x": 1}]
+
+
+def test_check_within(tmp_path):
+    base = tmp_path / "历次成绩"
+    base.mkdir()
+    inside = os.path.join(str(base), "考试.xlsx")
+    assert check_within(str(base), inside, "考试") == inside
+    for escaped in (os.path.join(str(base), "..", "x.xlsx"), str(tmp_path / "x.xlsx"), str(base)):
+        with pytest.raises(ValueError):
+            check_within(str(base), escaped, "考试")
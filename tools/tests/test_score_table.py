@@ -0,0 +1,48 @@
+import pandas as pd
+
+from score_table import ScoreTable
+
+
+def baseline_frame(pages):
+    """原先的做法：每名学生的表把“姓名”列移到首列（ensure_output_columns）后 pd.concat"""
+    frames = []
+    for name, columns, rows in pages:
+        df = pd.DataFrame(rows, columns=columns)
+        if "姓名" in df.columns:
+            df.loc[:, "姓名"] = name
+        else:
+            df.insert(0, "姓名", name)
+        cols = ["姓名"] + [c for c in df.columns if c != "姓名"]
+        frames.append(df.reindex(columns=cols))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_column_order_matches_baseline_concat():
+    pages = [
+        ("甲", ["考号", "姓名", "语文", "数学"], [["1", "x", 90, 80]]),
+        ("乙", ["考号", "姓名", "语文", "数学", "英语"], [["2", "y", 70, 60, 50]]),
+        ("丙", ["考号", "语文"], [["3", 88]]),
+    ]
+    table = ScoreTable(capacity=2, log=lambda msg: None)
+    for idx, (name, columns, rows) in enumerate(pages):
+        table.add(idx, name, columns, rows)
+    expected = baseline_frame(pages)
+    result = table.to_frame()
+    assert list(result.columns) == list(expected.columns) == ["姓名", "考号", "语文", "数学", "英语"]
+    pd.testing.assert_frame_equal(result.astype(object).where(result.notna(), None),
+                                  expected.astype(object).where(expected.notna(), None))
+    assert [d["name"] for d in table.drift] == ["乙", "丙"]
+
+
+def test_rows_ordered_by_roster_index():
+    table = ScoreTable(log=lambda msg: None)
+    table.add(2, "丙", ["语文"], [[1]])
+    table.add(0, "甲", ["语文"], [[2]])
+    table.add(1, "乙", ["语文"], [[3]])
+    assert table.to_frame()["姓名"].tolist() == ["甲", "乙", "丙"]
+
+
+def test_unbuffered_table_aligns_without_keeping_rows():
+    table = ScoreTable(buffer=False, log=lambda msg: None)
+    assert table.add(0, "甲", ["语文", "姓名"], [[90, "x"]]) == [["甲", 90]]
+    assert len(table) == 1
@@ -0,0 +1,66 @@
+import sqlite3
+
+from work_queue import WorkQueue, dedupe_roster
+
+ROSTER = [
+    (0, ("张三", "张三", "p1")),
+    (1, ("李四", "李四", "p2")),
+    (2, ("张三", "张三", "p3")),  # 同名的另一名学生：账号相同、密码不同
+    (3, ("李四", "李四", "p2")),  # 另一份班级名单中的重复记录
+]
+
+
+def test_dedupe_keeps_same_login_with_different_password():
+    jobs, duplicates, conflicts = dedupe_roster(ROSTER)
+    assert [idx for idx, _ in jobs] == [0, 1, 2]
+    assert duplicates == ["李四"]
+    assert conflicts == ["张三"]
+
+
+def test_queue_does_not_store_passwords(tmp_path):
+    path = str(tmp_path / "q.db")
+    jobs, _, _ = dedupe_roster(ROSTER)
+    WorkQueue.create(path, jobs, shard_size=2).close()
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(students)")]
+        dump = "\n".join(conn.iterdump())
+    finally:
+        conn.close()
+    assert "password" not in columns
+    assert "p1" not in dump and "p3" not in dump
+
+
+def test_claim_takes_passwords_from_roster_once(tmp_path):
+    path = str(tmp_path / "q.db")
+    jobs, _, _ = dedupe_roster(ROSTER)
+    roster = dict(ROSTER)
+    WorkQueue.create(path, jobs, shard_size=2).close()
+    a, b = WorkQueue(path), WorkQueue(path)
+    try:
+        first = a.claim("a", roster)
+        second = b.claim("b", roster)
+        assert first == (1, [(0, ("张三", "张三", "p1")), (1, ("李四", "李四", "p2"))])
+        assert second == (2, [(2, ("张三", "张三", "p3"))])
+        # 每个分片最多被领取一次
+        assert a.claim("a", roster) is None
+    finally:
+        a.close()
+        b.close()
+
+
+def test_claim_fails_students_missing_from_changed_roster(tmp_path):
+    path = str(tmp_path / "q.db")
+    jobs, _, _ = dedupe_roster(ROSTER)
+    queue = WorkQueue.create(path, jobs, shard_size=10)
+    try:
+        roster = {0: ROSTER[0][1], 1: ("王五", "王五", "p9")}
+        shard_id, claimed = queue.claim("a", roster)
+        assert claimed == [(0, ("张三", "张三", "p1"))]
+        assert [name for name, _ in queue.failures()] == ["李四", "张三"]
+        # 放回后（含已领取未完成的学生）按原名单重新领取
+        queue.reset()
+        _, claimed = queue.claim("a", dict(ROSTER))
+        assert [idx for idx, _ in claimed] == [0, 1, 2]
+    finally:
+        queue.close()
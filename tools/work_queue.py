@@ -0,0 +1,228 @@
+"""
+分片抓取工作队列 (SQLite)
+
+把名单拆成若干分片写入一个 SQLite 队列文件，多个抓取进程（也可以是共享磁盘上的多台机器）各自领取分片：
+
+- 领取分片在 BEGIN IMMEDIATE 写事务中完成，每个分片最多被一个进程领取（at-most-once）；
+  进程中途退出时分片保持“已领取”，需显式 reset 放回，不会被自动重复抓取
+- 建队时跨班级名单去重：登录账号与密码都相同的重复记录只保留首次出现；同一账号对应不同密码时
+  视为不同的账号全部保留，另行提示核对
+- 队列中只保存名单序号、姓名与登录账号，不保存密码：领取分片时按名单序号从名单中取密码
+- 每名学生整理后的成绩行立即写回队列，全部完成后按名单顺序读出，合并为一张“汇总”表
+
+跨机器共享时队列文件所在的文件系统需支持文件锁；不使用 WAL（WAL 依赖共享内存，不能跨机器）。
+"""
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# 抓取任务: (名单序号, (姓名, 登录账号, 密码))
+Job = Tuple[int, Tuple[str, str, str]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending / claimed / done
+    worker TEXT,
+    claimed_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS students (
+    idx INTEGER PRIMARY KEY, -- 名单序号
+    shard_id INTEGER NOT NULL REFERENCES shards(id),
+    login TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending / done / failed
+    worker TEXT,
+    exam_name TEXT,
+    columns TEXT, -- JSON
+    rows TEXT, -- JSON
+    error TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_students_shard ON students(shard_id);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _json_default(value: Any) -> Any:
+    """numpy 标量等转为 Python 原生类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _clean_value(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    # 只有写回成绩时才用到 pandas，查看队列进度不加载
+    import pandas as pd
+
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def dedupe_roster(jobs: List[Job]) -> Tuple[List[Job], List[str], List[str]]:
+    """按 (登录账号, 密码) 跨名单去重，返回 (去重后的任务, 重复出现的账号, 对应多个不同密码的账号)
+
+    同名学生以姓名登录时账号相同、密码不同，是两个真实账号，都保留。"""
+    seen: Dict[str, List[str]] = {}
+    unique: List[Job] = []
+    duplicates: List[str] = []
+    conflicts: List[str] = []
+    for idx, (name, login, pwd) in jobs:
+        passwords = seen.setdefault(login, [])
+        if pwd in passwords:
+            duplicates.append(login)
+            continue
+        if passwords and login not in conflicts:
+            conflicts.append(login)
+        passwords.append(pwd)
+        unique.append((idx, (name, login, pwd)))
+    return unique, duplicates, conflicts
+
+
+class WorkQueue:
+    """分片抓取工作队列，可被多个进程同时打开"""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到抓取队列: {path}（请先建立队列）")
+        self.path = path
+        self.conn = self._connect(path)
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+        conn.execute("PRAGMA busy_timeout = 60000")
+        return conn
+
+    @classmethod
+    def create(cls, path: str, jobs: List[Job], shard_size: int) -> "WorkQueue":
+        """按名单顺序每 shard_size 名学生建立一个分片；已有的同名队列会被清空"""
+        if os.path.exists(path):
+            print(f"  → 清空旧的抓取队列: {path}")
+            os.remove(path)
+        conn = cls._connect(path)
+        try:
+            conn.executescript(SCHEMA)
+            shard_size = max(1, int(shard_size))
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(jobs), shard_size):
+                shard_id = conn.execute("INSERT INTO shards DEFAULT VALUES").lastrowid
+                conn.executemany(
+                    "INSERT INTO students (idx, shard_id, login, name) VALUES (?, ?, ?, ?)",
+                    [(int(idx), shard_id, login, name) for idx, (name, login, _) in jobs[start:start + shard_size]])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return cls(path)
+
+    def claim(self, worker: str, roster: Mapping[int, Tuple[str, str, str]]) -> Optional[Tuple[int, List[Job]]]:
+        """领取一个待抓取的分片，返回 (分片号, 其中未完成的学生)；没有待领取的分片时返回 None
+
+        roster 为 名单序号 -> (姓名, 登录账号, 密码)，密码由此取得；名单中该序号已不是同一学生时记为失败。"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT id FROM shards WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            shard_id = row[0]
+            self.conn.execute("UPDATE shards SET status = 'claimed', worker = ?, claimed_at = ? WHERE id = ?",
+                              (worker, _now(), shard_id))
+            jobs: List[Job] = []
+            for idx, name, login in self.conn.execute(
+                    "SELECT idx, name, login FROM students WHERE shard_id = ? AND status = 'pending' ORDER BY idx",
+                    (shard_id,)).fetchall():
+                entry = roster.get(idx)
+                if entry is None or tuple(entry[:2]) != (name, login):
+                    self.fail(idx, worker, "名单在建立队列后有变化，找不到该学生的密码")
+                    continue
+                jobs.append((idx, (name, login, entry[2])))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return shard_id, jobs
+
+    def complete(self, idx: int, worker: str, exam_name: Optional[str], columns: List[Any],
+                 rows: List[List[Any]]) -> None:
+        """记录一名学生整理后的成绩行（立即提交）"""
+        self.conn.execute(
+            "UPDATE students SET status = 'done', worker = ?, exam_name = ?, columns = ?, rows = ?, error = NULL, "
+            "finished_at = ? WHERE idx = ?",
+            (worker, exam_name, json.dumps([str(c) for c in columns], ensure_ascii=False),
+             json.dumps([[_clean_value(v) for v in row] for row in rows], ensure_ascii=False, default=_json_default),
+             _now(), int(idx)))
+
+    def fail(self, idx: int, worker: str, error: str) -> None:
+        self.conn.execute("UPDATE students SET status = 'failed', worker = ?, error = ?, finished_at = ? WHERE idx = ?",
+                          (worker, error, _now(), int(idx)))
+
+    def finish_shard(self, shard_id: int) -> None:
+        self.conn.execute("UPDATE shards SET status = 'done', finished_at = ? WHERE id = ?", (_now(), shard_id))
+
+    def reset(self) -> Tuple[int, int]:
+        """把已领取未完成的分片与抓取失败的学生放回待抓取，返回 (放回的分片数, 其中待抓取的学生数)
+
+        只应在确认相关抓取进程已经退出后调用，否则同一分片可能被抓取两次。"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("UPDATE students SET status = 'pending', error = NULL WHERE status = 'failed'")
+            # 学生已全部完成、只是未来得及标记完成的分片
+            self.conn.execute("UPDATE shards SET status = 'done', finished_at = ? WHERE status = 'claimed' "
+                              "AND id NOT IN (SELECT shard_id FROM students WHERE status = 'pending')", (_now(),))
+            self.conn.execute(
+                "UPDATE shards SET status = 'pending', worker = NULL, claimed_at = NULL, finished_at = NULL "
+                "WHERE id IN (SELECT shard_id FROM students WHERE status = 'pending') AND status != 'pending'")
+            shards = self.conn.execute("SELECT changes()").fetchone()[0]
+            students = self.conn.execute(
+                "SELECT COUNT(*) FROM students s JOIN shards h ON h.id = s.shard_id "
+                "WHERE h.status = 'pending' AND s.status = 'pending'").fetchone()[0]
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return shards, students
+
+    def progress(self) -> Dict[str, int]:
+        """各状态的学生数与分片数"""
+        counts = {"pending": 0, "done": 0, "failed": 0}
+        counts.update(dict(self.conn.execute("SELECT status, COUNT(*) FROM students GROUP BY status")))
+        shards = dict(self.conn.execute("SELECT status, COUNT(*) FROM shards GROUP BY status"))
+        counts["shards"] = sum(shards.values())
+        counts["shards_claimed"] = shards.get("claimed", 0)
+        counts["shards_pending"] = shards.get("pending", 0)
+        return counts
+
+    def failures(self) -> List[Tuple[str, str]]:
+        """抓取失败的学生 (姓名, 原因)，按名单顺序"""
+        return self.conn.execute("SELECT name, error FROM students WHERE status = 'failed' ORDER BY idx").fetchall()
+
+    def exam_names(self) -> List[str]:
+        """已完成学生页面上出现过的考试名称，按名单中首次出现的顺序"""
+        rows = self.conn.execute("SELECT exam_name FROM students WHERE status = 'done' AND exam_name IS NOT NULL "
+                                 "GROUP BY exam_name ORDER BY MIN(idx)")
+        return [name for (name,) in rows]
+
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """按名单顺序逐条读出已完成学生的成绩行"""
+        cursor = self.conn.execute(
+            "SELECT idx, name, exam_name, columns, rows FROM students WHERE status = 'done' ORDER BY idx")
+        for idx, name, exam_name, columns, rows in cursor:
+            yield {"idx": idx, "name": name, "exam_name": exam_name,
+                   "columns": json.loads(columns), "rows": json.loads(rows)}
+
+    def close(self) -> None:
+        self.conn.close()